@@ -5,7 +5,7 @@ from typing import Mapping, Sequence
 from shared.metrics import metrics
 from shared.reports.editable import EditableReport
 from shared.reports.resources import Report
-from shared.utils.match import match
+from shared.utils.match import PathMatcher
 from shared.utils.sessions import SessionType
 
 log = logging.getLogger(__name__)
@@ -75,8 +75,9 @@ def generate_carryforward_report(
         totals=None,
     )
     if paths:
+        path_matcher = PathMatcher.for_patterns(paths)
         for filename in new_report.files:
-            if not match(paths, filename):
+            if not path_matcher.match(filename):
                 del new_report[filename]
     sessions_to_delete = []
     for sid, session in new_report.sessions.items():
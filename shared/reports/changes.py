@@ -1,25 +1,47 @@
+from types import SimpleNamespace
+
 from shared import ribs
 from shared.reports.types import Change
 
 
-def run_comparison_using_rust(base_report, head_report, diff):
+def run_comparison_using_rust(base_report, head_report, diff, rust_diff=None):
     return ribs.run_comparison(
         base_report.rust_report.get_report(),
         head_report.rust_report.get_report(),
-        ribs.rustify_diff(diff),
+        rust_diff if rust_diff is not None else ribs.rustify_diff(diff),
+    )
+
+
+def compare_reports_using_rust(base_report, head_report, diff, rust_diff=None):
+    """Same as `run_comparison_using_rust`, but gives back the rustyribs
+    `ChangeAnalysis` object instead of serializing it through JSON
+
+    `rust_diff` is the comparison input `ribs.parse_unified_diff` gave for `diff`,
+        when `diff` wasn't changed since
+    """
+    return ribs.compare_reports(
+        base_report.rust_report.get_report(),
+        head_report.rust_report.get_report(),
+        rust_diff if rust_diff is not None else ribs.rustify_diff(diff),
     )
 
 
-def get_changes_using_rust(base_report, head_report, diff):
-    return _get_changes_from_comparison(
-        run_comparison_using_rust(base_report, head_report, diff)
+def get_changes_using_rust(base_report, head_report, diff, rust_diff=None):
+    return _get_changes_from_file_analyses(
+        compare_reports_using_rust(base_report, head_report, diff, rust_diff).files
     )
 
 
 def _get_changes_from_comparison(data):
+    return _get_changes_from_file_analyses(
+        SimpleNamespace(**found_change) for found_change in data["files"]
+    )
+
+
+def _get_changes_from_file_analyses(file_analyses):
     changes = []
-    for found_change in data["files"]:
-        if found_change["unexpected_line_changes"]:
+    for found_change in file_analyses:
+        if found_change.unexpected_line_changes:
             # temporary logic just to ensure we know all differences between
             # python changes and rust changes
             # on python, two partial lines are not considered unexpected changes
@@ -28,26 +50,26 @@ def _get_changes_from_comparison(data):
             # "unexpected_line_changes": [[[1, "p"], [1, "p"]]],
             # on rust
             has_actual_expected_line_changes = any(
-                b[1] != h[1] for (b, h) in found_change["unexpected_line_changes"]
+                b[1] != h[1] for (b, h) in found_change.unexpected_line_changes
             )
             if has_actual_expected_line_changes:
                 changes.append(
                     Change(
-                        path=found_change["head_name"],
-                        in_diff=bool(found_change["added_diff_coverage"]),
-                        old_path=found_change.get("base_name")
-                        if found_change["base_name"] != found_change["head_name"]
+                        path=found_change.head_name,
+                        in_diff=bool(found_change.added_diff_coverage),
+                        old_path=found_change.base_name
+                        if found_change.base_name != found_change.head_name
                         else None,
                         totals=None,
                         new=(
-                            found_change["head_coverage"] is not None
-                            and found_change["base_coverage"] is None
-                            and not found_change["file_was_added_by_diff"]
+                            found_change.head_coverage is not None
+                            and found_change.base_coverage is None
+                            and not found_change.file_was_added_by_diff
                         ),
                         deleted=(
-                            found_change["base_coverage"] is not None
-                            and found_change["head_coverage"] is None
-                            and not found_change["file_was_removed_by_diff"]
+                            found_change.base_coverage is not None
+                            and found_change.head_coverage is None
+                            and not found_change.file_was_removed_by_diff
                         ),
                     )
                 )
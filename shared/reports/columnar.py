@@ -0,0 +1,332 @@
+"""Columnar encoding for the lines of a report chunk
+
+The legacy chunk format stores one JSON array per line. That is easy to read, but
+parsing it means calling `json.loads` for every line of every file we touch.
+
+This module provides an alternative, versioned encoding where the lines of a file
+are stored as packed little-endian arrays (one array per field), base64 encoded so
+the chunk can still live inside the text archive. A columnar chunk looks like:
+
+    {"present_sessions":[0]}
+    #columnar:v1:<base64 payload>
+
+The payload is laid out as:
+
+    header          <III   n_lines, n_sessions, n_fallback
+    line_number     u32[n_lines]
+    coverage_kind   u8[n_lines]
+    coverage_value  i64[n_lines]   (hits for ints, covered branches for "a/b")
+    coverage_total  i32[n_lines]   (total branches for "a/b")
+    line_type       u8[n_lines]
+    complexity_kind u8[n_lines]
+    complexity      i32[n_lines]
+    complexity_tot  i32[n_lines]
+    session_count   u32[n_lines]
+    session_id      i32[n_sessions]
+    ... session coverage and complexity, same layout as the line ones
+    fallback        JSON list with the legacy encoding of the lines that do not
+                    fit the packed layout (labels, messages, partials, ...)
+
+Readers that find a regular JSON line instead of the prefix keep using the legacy
+parsing, so old archives load just like before.
+"""
+import base64
+import struct
+from json import dumps, loads
+
+from shared.reports.types import EMPTY, LineSession, ReportLine
+from shared.utils.ReportEncoder import ReportEncoder
+
+COLUMNAR_CHUNK_PREFIX = "#columnar:v1:"
+
+COVERAGE_NONE = 0
+COVERAGE_INT = 1
+COVERAGE_BRANCH = 2
+COVERAGE_TRUE = 3
+FALLBACK = 255
+
+COMPLEXITY_NONE = 0
+COMPLEXITY_SINGLE = 1
+COMPLEXITY_TOTAL = 2
+
+LINE_TYPES = (None, "b", "m")
+_LINE_TYPE_CODES = {value: code for code, value in enumerate(LINE_TYPES)}
+
+_HEADER = struct.Struct("<III")
+_INT32_MAX = 2**31 - 1
+_INT32_MIN = -(2**31)
+_INT64_MAX = 2**63 - 1
+_INT64_MIN = -(2**63)
+
+
+class NotPackableError(ValueError):
+    pass
+
+
+def is_columnar_chunk_line(line):
+    return line.startswith(COLUMNAR_CHUNK_PREFIX)
+
+
+def _is_int(value):
+    return type(value) is int
+
+
+def _pack_coverage(coverage):
+    if coverage is None:
+        return COVERAGE_NONE, 0, 0
+    if coverage is True:
+        return COVERAGE_TRUE, 0, 0
+    if _is_int(coverage) and _INT64_MIN <= coverage <= _INT64_MAX:
+        return COVERAGE_INT, coverage, 0
+    if isinstance(coverage, str):
+        hits, separator, total = coverage.partition("/")
+        if separator and _is_canonical_number(hits) and _is_canonical_number(total):
+            hits, total = int(hits), int(total)
+            if hits <= _INT32_MAX and total <= _INT32_MAX:
+                return COVERAGE_BRANCH, hits, total
+    raise NotPackableError(coverage)
+
+
+def _is_canonical_number(value):
+    return value.isascii() and value.isdigit() and str(int(value)) == value
+
+
+def _unpack_coverage(kind, value, total):
+    if kind == COVERAGE_INT:
+        return value
+    if kind == COVERAGE_BRANCH:
+        return "%s/%s" % (value, total)
+    if kind == COVERAGE_TRUE:
+        return True
+    return None
+
+
+def _is_int32(value):
+    return _is_int(value) and _INT32_MIN <= value <= _INT32_MAX
+
+
+def _pack_complexity(complexity):
+    if complexity is None:
+        return COMPLEXITY_NONE, 0, 0
+    if _is_int32(complexity):
+        return COMPLEXITY_SINGLE, complexity, 0
+    if (
+        isinstance(complexity, (list, tuple))
+        and len(complexity) == 2
+        and _is_int32(complexity[0])
+        and _is_int32(complexity[1])
+    ):
+        return COMPLEXITY_TOTAL, complexity[0], complexity[1]
+    raise NotPackableError(complexity)
+
+
+def _unpack_complexity(kind, value, total):
+    if kind == COMPLEXITY_SINGLE:
+        return value
+    if kind == COMPLEXITY_TOTAL:
+        return [value, total]
+    return None
+
+
+def _pack_line(line):
+    """Returns the line columns and the list of its session columns
+
+    Raises NotPackableError if the line has anything the packed layout can't
+        represent exactly
+    """
+    if line.messages is not None or line.datapoints is not None:
+        raise NotPackableError(line)
+    if line.type not in _LINE_TYPE_CODES:
+        raise NotPackableError(line.type)
+    sessions = []
+    for session in line.sessions or []:
+        if (
+            session is None
+            or session.branches is not None
+            or session.partials is not None
+            or not _is_int32(session.id)
+        ):
+            raise NotPackableError(session)
+        sessions.append(
+            (session.id,)
+            + _pack_coverage(session.coverage)
+            + _pack_complexity(session.complexity)
+        )
+    return (
+        _pack_coverage(line.coverage)
+        + (_LINE_TYPE_CODES[line.type],)
+        + _pack_complexity(line.complexity),
+        sessions,
+    )
+
+
+def _dumps_line(line):
+    values = list(line.astuple())
+    while values[-1] is None:
+        values.pop(-1)
+    return dumps(values, cls=ReportEncoder)
+
+
+def _transpose(rows, width):
+    if not rows:
+        return [()] * width
+    return list(zip(*rows))
+
+
+def encode_columnar_lines(lines):
+    """Encodes a sequence of lines (where index `i` holds line number `i + 1`)
+
+    Args:
+        lines: iterable of `ReportLine` or falsy values for lines without coverage
+
+    Returns:
+        str: The line to be written after the details line of the chunk
+    """
+    line_numbers, line_columns, session_counts = [], [], []
+    session_columns, fallback = [], []
+    for ln, line in enumerate(lines, start=1):
+        if not line:
+            continue
+        line_numbers.append(ln)
+        try:
+            columns, sessions = _pack_line(line)
+        except NotPackableError:
+            fallback.append(_dumps_line(line))
+            line_columns.append((FALLBACK, 0, 0, 0, COMPLEXITY_NONE, 0, 0))
+            session_counts.append(0)
+        else:
+            line_columns.append(columns)
+            session_counts.append(len(sessions))
+            session_columns.extend(sessions)
+    n_lines, n_sessions = len(line_numbers), len(session_columns)
+    (
+        coverage_kind,
+        coverage_value,
+        coverage_total,
+        line_type,
+        complexity_kind,
+        complexity,
+        complexity_total,
+    ) = _transpose(line_columns, 7)
+    (
+        session_id,
+        session_coverage_kind,
+        session_coverage_value,
+        session_coverage_total,
+        session_complexity_kind,
+        session_complexity,
+        session_complexity_total,
+    ) = _transpose(session_columns, 7)
+    payload = b"".join(
+        [
+            _HEADER.pack(n_lines, n_sessions, len(fallback)),
+            struct.pack("<%dI" % n_lines, *line_numbers),
+            struct.pack("<%dB" % n_lines, *coverage_kind),
+            struct.pack("<%dq" % n_lines, *coverage_value),
+            struct.pack("<%di" % n_lines, *coverage_total),
+            struct.pack("<%dB" % n_lines, *line_type),
+            struct.pack("<%dB" % n_lines, *complexity_kind),
+            struct.pack("<%di" % n_lines, *complexity),
+            struct.pack("<%di" % n_lines, *complexity_total),
+            struct.pack("<%dI" % n_lines, *session_counts),
+            struct.pack("<%di" % n_sessions, *session_id),
+            struct.pack("<%dB" % n_sessions, *session_coverage_kind),
+            struct.pack("<%dq" % n_sessions, *session_coverage_value),
+            struct.pack("<%di" % n_sessions, *session_coverage_total),
+            struct.pack("<%dB" % n_sessions, *session_complexity_kind),
+            struct.pack("<%di" % n_sessions, *session_complexity),
+            struct.pack("<%di" % n_sessions, *session_complexity_total),
+            dumps(fallback, separators=(",", ":")).encode() if fallback else b"",
+        ]
+    )
+    return COLUMNAR_CHUNK_PREFIX + base64.b64encode(payload).decode("ascii")
+
+
+class _ColumnReader(object):
+    __slots__ = ("payload", "offset")
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.offset = 0
+
+    def read(self, fmt, count):
+        res = struct.unpack_from("<%d%s" % (count, fmt), self.payload, self.offset)
+        self.offset += struct.calcsize("<%d%s" % (count, fmt))
+        return res
+
+    def remaining(self):
+        return self.payload[self.offset :]
+
+
+def decode_columnar_lines(encoded):
+    """Decodes the output of `encode_columnar_lines`
+
+    Returns:
+        list: lines in the same shape `ReportFile._lines` uses. Packed lines come back
+            as `ReportLine`, lines that had to use the fallback come back as their
+            legacy JSON string, and lines without coverage as `EMPTY`
+    """
+    if not is_columnar_chunk_line(encoded):
+        raise ValueError("Not a columnar chunk")
+    payload = base64.b64decode(encoded[len(COLUMNAR_CHUNK_PREFIX) :])
+    n_lines, n_sessions, n_fallback = _HEADER.unpack_from(payload, 0)
+    reader = _ColumnReader(payload)
+    reader.offset = _HEADER.size
+    line_numbers = reader.read("I", n_lines)
+    coverage_kind = reader.read("B", n_lines)
+    coverage_value = reader.read("q", n_lines)
+    coverage_total = reader.read("i", n_lines)
+    line_type = reader.read("B", n_lines)
+    complexity_kind = reader.read("B", n_lines)
+    complexity = reader.read("i", n_lines)
+    complexity_total = reader.read("i", n_lines)
+    session_counts = reader.read("I", n_lines)
+    session_id = reader.read("i", n_sessions)
+    session_coverage_kind = reader.read("B", n_sessions)
+    session_coverage_value = reader.read("q", n_sessions)
+    session_coverage_total = reader.read("i", n_sessions)
+    session_complexity_kind = reader.read("B", n_sessions)
+    session_complexity = reader.read("i", n_sessions)
+    session_complexity_total = reader.read("i", n_sessions)
+    fallback = loads(reader.remaining()) if n_fallback else []
+    if len(fallback) != n_fallback:
+        raise ValueError("Columnar chunk has an inconsistent fallback section")
+
+    lines = [EMPTY] * (line_numbers[-1] if n_lines else 0)
+    session_index, fallback_index = 0, 0
+    for i in range(n_lines):
+        if coverage_kind[i] == FALLBACK:
+            lines[line_numbers[i] - 1] = fallback[fallback_index]
+            fallback_index += 1
+            continue
+        sessions = None
+        if session_counts[i]:
+            sessions = []
+            for j in range(session_index, session_index + session_counts[i]):
+                sessions.append(
+                    LineSession(
+                        session_id[j],
+                        _unpack_coverage(
+                            session_coverage_kind[j],
+                            session_coverage_value[j],
+                            session_coverage_total[j],
+                        ),
+                        complexity=_unpack_complexity(
+                            session_complexity_kind[j],
+                            session_complexity[j],
+                            session_complexity_total[j],
+                        ),
+                    )
+                )
+            session_index += session_counts[i]
+        lines[line_numbers[i] - 1] = ReportLine.create_typed(
+            coverage=_unpack_coverage(
+                coverage_kind[i], coverage_value[i], coverage_total[i]
+            ),
+            type=LINE_TYPES[line_type[i]],
+            sessions=sessions,
+            complexity=_unpack_complexity(
+                complexity_kind[i], complexity[i], complexity_total[i]
+            ),
+        )
+    return lines
@@ -119,6 +119,7 @@ class EditableReport(Report):
                     totals=file_summary.file_totals,
                     lines=chunk,
                     line_modifier=None,
+                    pool=self._pool,
                 )
                 self._chunks[chunk_index] = report_file
             else:
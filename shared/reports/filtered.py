@@ -3,13 +3,14 @@ import logging
 import os
 
 from shared.config import get_config
-from shared.helpers.numeric import ratio
 from shared.metrics import metrics
-from shared.reports.types import EMPTY, ReportTotals
+from shared.reports.types import EMPTY, ReportTotals, SessionTotalsArray
+from shared.utils.diff import get_added_line_intervals
 from shared.utils.make_network_file import make_network_file
-from shared.utils.match import match, match_any
-from shared.utils.merge import get_complexity_from_sessions, line_type, merge_all
-from shared.utils.totals import agg_totals, sum_totals
+from shared.utils.match import PathMatcher, match_any
+from shared.utils.merge import get_complexity_from_sessions, merge_all
+from shared.utils.sessions import parse_totals
+from shared.utils.totals import agg_totals, sum_totals, totals_from_lines
 
 log = logging.getLogger(__name__)
 
@@ -20,16 +21,42 @@ def _contain_any_of_the_flags(expected_flags, actual_flags):
     return len(set(expected_flags) & set(actual_flags)) > 0
 
 
+def _session_mask(session_ids):
+    """returns the ids as a bitmask, or None if some id can't be a bit"""
+    mask = 0
+    try:
+        for sessionid in session_ids:
+            mask |= 1 << sessionid
+    except (TypeError, ValueError):
+        return None
+    return mask
+
+
 class FilteredReportFile(object):
 
-    __slots__ = ["report_file", "session_ids", "_totals"]
+    __slots__ = ["report_file", "session_ids", "_totals", "_session_mask"]
 
     def __init__(self, report_file, session_ids):
         self.report_file = report_file
         self.session_ids = session_ids
         self._totals = None
+        self._session_mask = _session_mask(session_ids)
 
     def line_modifier(self, line):
+        included_mask = self._session_mask
+        if included_mask is not None:
+            line_mask = _session_mask(s.id for s in line.sessions)
+            if line.datapoints and line_mask is not None:
+                datapoints_mask = _session_mask(dp.sessionid for dp in line.datapoints)
+                line_mask = (
+                    line_mask | datapoints_mask if datapoints_mask is not None else None
+                )
+            if line_mask is not None:
+                if not line_mask & included_mask:
+                    return EMPTY
+                if not line_mask & ~included_mask:
+                    # nothing to filter out of this line
+                    return line
         new_sessions = [s for s in line.sessions if s.id in self.session_ids]
         new_datapoints = (
             [dp for dp in line.datapoints if dp.sessionid in self.session_ids]
@@ -74,25 +101,15 @@ class FilteredReportFile(object):
                 yield ln, line
 
     def calculate_diff(self, all_file_segments):
-        fg = self.get
-        lines = []
-        le = lines.extend
-        # add all new lines data to a new file to get totals
-        [
-            le(
-                [
-                    (i, fg(i))
-                    for i, line in enumerate(
-                        [l for l in segment["lines"] if l[0] != "-"],
-                        start=int(segment["header"][2]) or 1,
-                    )
-                    if line[0] == "+"
-                ]
+        intervals = get_added_line_intervals(all_file_segments)
+        return self.calculate_totals_from_lines(
+            (ln, line)
+            for ln, line in (
+                (ln, self.line_modifier(line))
+                for ln, line in self.report_file.lines_in_intervals(intervals)
             )
-            for segment in all_file_segments
-        ]
-        lines = [l for l in lines if l[1] is not None]
-        return self.calculate_totals_from_lines(lines)
+            if line
+        )
 
     def get(self, ln):
         line = self.report_file.get(ln)
@@ -106,58 +123,16 @@ class FilteredReportFile(object):
         """return dict of totals"""
         return self.calculate_totals_from_lines(self.lines)
 
-    @classmethod
-    def sum_of_complexity(cls, l):
-        # (hit, total)
-        c = l[1].complexity
-        if not c:
-            # no coverage data provided
-            return (0, 0)
-        elif type(c) is int:
-            # coverage is of type int
-            return (c, 0)
-        else:
-            # coverage is ratio
-            return c
-
     @classmethod
     def calculate_totals_from_lines(cls, inputted_lines):
-        inputted_lines = list(inputted_lines)
-        cov, types, messages = [], [], []
-        _cov, _types, _messages = cov.append, types.append, messages.append
-        for ln, line in inputted_lines:
-            _cov(line_type(line.coverage))
-            _types(line.type)
-            _messages(len(line.messages or []))
-        hits = cov.count(0)
-        misses = cov.count(1)
-        partials = cov.count(2)
-        lines = hits + misses + partials
-
-        complexity = tuple(
-            map(sum, zip(*map(cls.sum_of_complexity, inputted_lines)))
-        ) or (0, 0)
-
-        return ReportTotals(
-            files=0,
-            lines=lines,
-            hits=hits,
-            misses=misses,
-            partials=partials,
-            coverage=ratio(hits, lines) if lines else None,
-            branches=types.count("b"),
-            methods=types.count("m"),
-            messages=sum(messages),
-            sessions=0,
-            complexity=complexity[0],
-            complexity_total=complexity[1],
-        )
+        return totals_from_lines(inputted_lines)
 
 
 class FilteredReport(object):
     def __init__(self, report, path_patterns, flags):
         self.report = report
         self.path_patterns = path_patterns
+        self._path_matcher = None
         self.flags = flags
         self._totals = None
         self._sessions_to_include = None
@@ -199,11 +174,21 @@ class FilteredReport(object):
     @property
     def session_ids_to_include(self):
         if self._sessions_to_include is None:
-            self._sessions_to_include = self._calculate_sessionids_to_include()
+            if self.flags:
+                # shared by all the reports filtered by these flags
+                self._sessions_to_include = self.report.get_session_ids_by_flags(
+                    self.flags, self._calculate_sessionids_to_include
+                )
+            else:
+                self._sessions_to_include = self._calculate_sessionids_to_include()
         return self._sessions_to_include
 
     def should_include(self, filename):
-        return match(self.path_patterns, filename)
+        if self.path_patterns is None:
+            return True
+        if self._path_matcher is None:
+            self._path_matcher = PathMatcher.for_patterns(self.path_patterns)
+        return self._path_matcher.match(filename)
 
     @property
     def network(self):
@@ -240,34 +225,114 @@ class FilteredReport(object):
         return not any(self.should_include(x) for x in self.report._files.keys())
 
     def _iter_totals(self):
+        use_summaries = bool(self.flags) and get_config(
+            "setup", "use_stored_session_totals", default=False
+        )
         for filename, data in self.report._files.items():
             if self.should_include(filename):
-                res = self.get(filename).totals
+                if use_summaries:
+                    report_file = self.report.get(filename)
+                    res = self._file_totals_from_summary(report_file, data)
+                    if res is None:
+                        res = FilteredReportFile(
+                            report_file, self.session_ids_to_include
+                        ).totals
+                else:
+                    res = self.get(filename).totals
                 if res and res.lines > 0:
                     yield res
 
-    def _can_use_session_totals(self):
+    def _file_totals_from_summary(self, report_file, file_summary):
+        """Totals of the file filtered by the flags, from the totals stored in its
+        summary, when the sessions present in the file make it possible:
+            - none of them is included: nothing
+            - all of them are included: the totals of the whole file
+        The present sessions are only relied on when they are the same sessions the
+            file has stored totals for (merges that don't keep them up to date still
+            add to those), and all of them were processed after
+            `CORRECT_SESSION_TOTALS_SINCE`
+        returns None when the lines have to be filtered instead
+        """
+        details = report_file.details
+        present_sessions = details.get("present_sessions") if details else None
+        session_totals = file_summary.session_totals
+        if present_sessions is None or not isinstance(
+            session_totals, SessionTotalsArray
+        ):
+            return None
+        present_sessions = set(present_sessions)
+        if present_sessions != set(session_totals.non_null_items.keys()):
+            return None
+        if not all(self._is_trusted_session(sid) for sid in present_sessions):
+            return None
+        included = self.session_ids_to_include
+        if present_sessions.isdisjoint(included):
+            return ReportTotals.default_totals()
+        if present_sessions.issubset(included):
+            return parse_totals(file_summary.file_totals)
+        return None
+
+    def _is_trusted_session(self, session_id):
+        """Whether the session was processed after `CORRECT_SESSION_TOTALS_SINCE`,
+        so the totals stored for it are right
+        """
         a = os.getenv("CORRECT_SESSION_TOTALS_SINCE")
         if a is None:
             return False
+        session = self.report.sessions.get(session_id)
+        return (
+            session is not None and session.time is not None and session.time > int(a)
+        )
+
+    def _only_trusted_session_id(self):
+        """The id of the only session included, if the totals stored for it are right"""
         if len(self.session_ids_to_include) != 1:
-            return False
+            return None
         if self.path_patterns:
-            return False
+            return None
         only_session_id = list(self.session_ids_to_include)[0]
-        only_session_to_use = self.report.sessions[only_session_id]
-        if only_session_to_use is not None and only_session_to_use.time is not None:
-            return (
-                only_session_to_use.time > int(a)
-                and only_session_to_use.totals is not None
+        if self._is_trusted_session(only_session_id):
+            return only_session_id
+        return None
+
+    def _can_use_session_totals(self):
+        only_session_id = self._only_trusted_session_id()
+        return (
+            only_session_id is not None
+            and self.report.sessions[only_session_id].totals is not None
+        )
+
+    def _stored_session_totals(self):
+        """Totals of the only session included as stored when it was processed,
+        instead of going through the lines again. None when they can't be used
+        """
+        try:
+            only_session_id = self._only_trusted_session_id()
+            if only_session_id is None:
+                return None
+            session_totals = parse_totals(self.report.sessions[only_session_id].totals)
+            if session_totals is None:
+                return None
+            return dataclasses.replace(session_totals, sessions=1)
+        except Exception:
+            log.warning(
+                "Unable to use stored single-session totals",
+                extra=dict(flags=self.flags),
+                exc_info=True,
             )
-        return False
+            return None
 
     @metrics.timer("shared.reports.filtered._process_totals")
     def _process_totals(self):
         """Runs through the file network to aggregate totals
         returns <ReportTotals>
         """
+        if get_config("setup", "use_stored_session_totals", default=False):
+            stored_totals = self._stored_session_totals()
+            if stored_totals is not None:
+                metrics.incr("shared.reports.filtered.stored_session_totals.hits")
+                return stored_totals
+            metrics.incr("shared.reports.filtered.stored_session_totals.misses")
         totals = agg_totals(self._iter_totals())
         totals.sessions = len(self.session_ids_to_include)
         res = ReportTotals(*tuple(totals))
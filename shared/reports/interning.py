@@ -0,0 +1,58 @@
+from shared.reports.types import LineSession
+
+# Upper bound of distinct sessions a pool keeps, values past that are just not reused
+MAX_POOL_SIZE = 100_000
+
+
+class InterningPool(object):
+    """Reuses the values that repeat across the lines of a report while parsing them
+
+    Most lines share a handful of coverage values ("1/2", 0, 1...) and session ids,
+    so instead of allocating a new `LineSession` and coverage string for each line,
+    the lines parsed with the same pool point to the same objects.
+
+    The pooled `LineSession`s are shared between lines, so they must not be mutated.
+    Sessions carrying branches, partials or complexity are never pooled.
+    """
+
+    __slots__ = ("_sessions", "_coverages")
+
+    def __init__(self):
+        self._sessions = {}
+        self._coverages = {}
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def coverage(self, value):
+        if type(value) is not str:
+            return value
+        cached = self._coverages.get(value)
+        if cached is not None:
+            return cached
+        if len(self._coverages) < MAX_POOL_SIZE:
+            self._coverages[value] = value
+        return value
+
+    def session(self, session):
+        """returns the LineSession for a JSON decoded session `[id, coverage, ...]`"""
+        if len(session) != 2 and (
+            len(session) < 2 or any(v is not None for v in session[2:])
+        ):
+            session = list(session)
+            if len(session) > 1:
+                session[1] = self.coverage(session[1])
+            return LineSession(*session)
+        sessionid, coverage = session[0], session[1]
+        # the type is part of the key so that 1, 1.0 and True are kept apart
+        key = (sessionid, type(coverage), coverage)
+        try:
+            line_session = self._sessions.get(key)
+        except TypeError:
+            # unhashable values
+            return LineSession(sessionid, coverage)
+        if line_session is None:
+            line_session = LineSession(sessionid, self.coverage(coverage))
+            if len(self._sessions) < MAX_POOL_SIZE:
+                self._sessions[key] = line_session
+        return line_session
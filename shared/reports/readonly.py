@@ -1,15 +1,91 @@
+import dataclasses
 import logging
+import mmap
 import os
 import random
+import tempfile
 
 from shared.helpers.flag import Flag
+from shared.helpers.numeric import ratio
 from shared.metrics import metrics
 from shared.reports.resources import Report, ReportTotals
-from shared.ribs import FilterAnalyzer, SimpleAnalyzer, parse_report
-from shared.utils.match import match
+from shared.ribs import (
+    FilterAnalyzer,
+    SimpleAnalyzer,
+    parse_report,
+    parse_report_from_buffer,
+    rustify_diff,
+)
+from shared.utils.match import PathMatcher
+from shared.utils.totals import sum_totals
 
 log = logging.getLogger(__name__)
 
+MMAP_WRITE_SIZE = 1024 * 1024
+
+
+def mmap_chunks(chunks):
+    """Writes the chunks to an anonymous temporary file and maps it in memory
+
+    The pages of the map are backed by the file, so the OS can drop them instead of
+        them counting towards the memory of the process, and the rust parser can read
+        them through the buffer protocol without copying them into a string first
+    """
+    with tempfile.TemporaryFile() as f:
+        if isinstance(chunks, str):
+            # encoding a piece at a time, so we don't hold two copies of the archive
+            for start in range(0, len(chunks), MMAP_WRITE_SIZE):
+                f.write(chunks[start : start + MMAP_WRITE_SIZE].encode())
+        else:
+            f.write(chunks)
+        f.flush()
+        # the map keeps its own reference to the file, it outlives closing it
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _totals_from_rust(res):
+    return ReportTotals(
+        files=res.files,
+        lines=res.lines,
+        hits=res.hits,
+        misses=res.misses,
+        partials=res.partials,
+        coverage=res.coverage,
+        branches=res.branches,
+        methods=res.methods,
+        messages=0,
+        sessions=res.sessions,
+        complexity=res.complexity,
+        complexity_total=res.complexity_total,
+        diff=0,
+    )
+
+
+def _file_diff_totals_from_rust(summary):
+    lines = summary.lines
+    return ReportTotals(
+        files=0,
+        lines=lines,
+        hits=summary.hits,
+        misses=summary.misses,
+        partials=summary.partials,
+        coverage=ratio(summary.hits, lines) if lines else None,
+        branches=summary.branches,
+        methods=summary.methods,
+        messages=0,
+        sessions=0,
+        complexity=summary.complexity,
+        complexity_total=summary.complexity_total,
+    )
+
+
+class ReadOnlyFlag(Flag):
+    @property
+    def totals(self):
+        if not self._totals:
+            self._totals = self._report.get_flag_totals(self.name)
+        return self._totals
+
 
 class LazyRustReport(object):
     def __init__(self, filename_mapping, chunks, session_mapping):
@@ -20,7 +96,12 @@ class LazyRustReport(object):
 
     def get_report(self):
         if self._actual_report is None:
-            self._actual_report = parse_report(
+            parse = (
+                parse_report
+                if isinstance(self._chunks, str)
+                else parse_report_from_buffer
+            )
+            self._actual_report = parse(
                 self._filename_mapping, self._chunks, self._session_mapping
             )
             self._chunks = None  # Free the memory
@@ -32,6 +113,15 @@ class ReadOnlyReport(object):
     def should_load_rust_version(cls):
         return random.random() < float(os.getenv("RUST_ENABLE_RATE", "1.0"))
 
+    @classmethod
+    def should_mmap_chunks(cls, chunks):
+        """Whether chunks this big should be kept in a memory map instead of memory
+
+        Disabled unless `RUST_MMAP_CHUNKS_THRESHOLD` (in bytes) is set
+        """
+        threshold = os.getenv("RUST_MMAP_CHUNKS_THRESHOLD")
+        return bool(chunks) and threshold is not None and len(chunks) >= int(threshold)
+
     def __init__(self, rust_analyzer, rust_report, inner_report, totals=None):
         self.rust_analyzer = rust_analyzer
         self.rust_report = rust_report
@@ -39,11 +129,14 @@ class ReadOnlyReport(object):
         self._totals = totals
         self._flags = None
         self._uploaded_flags = None
+        self._flag_totals = None
 
     @classmethod
     @metrics.timer("shared.reports.readonly.from_chunks")
     def from_chunks(cls, files=None, sessions=None, totals=None, chunks=None):
         rust_analyzer = SimpleAnalyzer()
+        if cls.should_mmap_chunks(chunks):
+            chunks = mmap_chunks(chunks)
         inner_report = Report(
             files=files, sessions=sessions, totals=totals, chunks=chunks
         )
@@ -81,7 +174,7 @@ class ReadOnlyReport(object):
         if self._flags is None:
             self._flags = {}
             for flag_name, flag in self.inner_report.flags.items():
-                self._flags[flag_name] = Flag(
+                self._flags[flag_name] = ReadOnlyFlag(
                     self,
                     flag_name,
                     carriedforward=flag.carriedforward,
@@ -94,8 +187,13 @@ class ReadOnlyReport(object):
         return self.inner_report.sessions
 
     @metrics.timer("shared.reports.readonly.apply_diff")
-    def apply_diff(self, *args, **kwargs):
-        return self.inner_report.apply_diff(*args, **kwargs)
+    def apply_diff(self, diff, _save=True):
+        if not diff or not diff.get("files"):
+            return None
+        totals = self.calculate_diff(diff)
+        if _save and totals:
+            self.inner_report.save_diff_calculation(diff, totals)
+        return totals.get("general")
 
     def append(self, *args, **kwargs):
         log.warning("Modifying report that is read only")
@@ -112,11 +210,34 @@ class ReadOnlyReport(object):
             filename_mapping, self.inner_report.to_archive(), session_mapping
         )
         self._totals = None
+        self._flag_totals = None
         return res
 
     @metrics.timer("shared.reports.readonly.calculate_diff")
-    def calculate_diff(self, *args, **kwargs):
-        return self.inner_report.calculate_diff(*args, **kwargs)
+    def calculate_diff(self, diff):
+        """Same as `Report.calculate_diff`, but all the files are done in a single
+        call to the rust report when there is one
+        """
+        if not self.rust_report or not diff or not diff.get("files"):
+            return self.inner_report.calculate_diff(diff)
+        rust_analyzer = self.rust_analyzer
+        if not isinstance(rust_analyzer, FilterAnalyzer):
+            rust_analyzer = FilterAnalyzer(files=None, flags=None)
+        _, rust_files = rust_analyzer.calculate_diff(
+            self.rust_report.get_report(), rustify_diff(diff)
+        )
+        # keeping the order of the files in the diff, like the python version does
+        file_dict = {
+            path: _file_diff_totals_from_rust(rust_files[path].summary)
+            for path in diff["files"]
+            if path in rust_files
+        }
+        totals = sum_totals(list(file_dict.values()))
+        if totals.lines == 0:
+            totals = dataclasses.replace(
+                totals, coverage=None, complexity=None, complexity_total=None
+            )
+        return {"general": totals, "files": file_dict}
 
     def get(self, *args, **kwargs):
         return self.inner_report.get(*args, **kwargs)
@@ -127,21 +248,7 @@ class ReadOnlyReport(object):
             return self.inner_report.totals
         if self.rust_report:
             res = self.rust_analyzer.get_totals(self.rust_report.get_report())
-            return ReportTotals(
-                files=res.files,
-                lines=res.lines,
-                hits=res.hits,
-                misses=res.misses,
-                partials=res.partials,
-                coverage=res.coverage,
-                branches=res.branches,
-                methods=res.methods,
-                messages=0,
-                sessions=res.sessions,
-                complexity=res.complexity,
-                complexity_total=res.complexity_total,
-                diff=0,
-            )
+            return _totals_from_rust(res)
         return self.inner_report.totals
 
     @property
@@ -150,15 +257,73 @@ class ReadOnlyReport(object):
             self._totals = self._process_totals()
         return self._totals
 
+    @metrics.timer("shared.reports.readonly.get_group_totals")
+    def get_group_totals(self, groups):
+        """Totals for each `(flags, paths)` pair of `groups`
+
+        Same as `[self.filter(paths=paths, flags=flags).totals for ...]`, but the
+            rust report computes all of them in a single pass over its files
+        """
+        groups = [
+            (list(flags) if flags else None, list(paths) if paths else None)
+            for (flags, paths) in groups
+        ]
+        if self.rust_report:
+            try:
+                return [
+                    _totals_from_rust(res)
+                    for res in self.rust_report.get_report().get_group_totals(groups)
+                ]
+            except ValueError:
+                # some python regexes are not supported by the rust regex crate
+                log.info("Unable to calculate group totals in rust", exc_info=True)
+        return [
+            self.filter(paths=paths, flags=flags).totals for (flags, paths) in groups
+        ]
+
+    def get_flag_totals(self, flag_name):
+        """Totals of the report filtered by the flag
+
+        The totals of all the flags are calculated at once the first time
+        """
+        if self._flag_totals is None:
+            flag_names = list(self.flags.keys())
+            self._flag_totals = dict(
+                zip(
+                    flag_names,
+                    self.get_group_totals([([name], None) for name in flag_names]),
+                )
+            )
+        if flag_name not in self._flag_totals:
+            return self.filter(flags=[flag_name]).totals
+        return self._flag_totals[flag_name]
+
+    def get_component_totals(self, components):
+        """Totals of the report filtered by each of the `components`"""
+        flag_names = list(self.flags.keys())
+        return self.get_group_totals(
+            [
+                (component.get_matching_flags(flag_names), component.paths)
+                for component in components
+            ]
+        )
+
     def filter(self, paths=None, flags=None):
         if paths is None and flags is None:
             return self
-        matching_files = (
-            set(f for f in self.files if match(paths, f)) if paths else None
-        )
-        rust_analyzer = FilterAnalyzer(
-            files=matching_files, flags=flags if flags else None
-        )
+        try:
+            rust_analyzer = FilterAnalyzer(
+                files=None,
+                flags=flags if flags else None,
+                paths=list(paths) if paths else None,
+            )
+        except ValueError:
+            # some python regexes are not supported by the rust regex crate
+            path_matcher = PathMatcher.for_patterns(paths)
+            matching_files = set(f for f in self.files if path_matcher.match(f))
+            rust_analyzer = FilterAnalyzer(
+                files=matching_files, flags=flags if flags else None
+            )
         return ReadOnlyReport(
             rust_analyzer,
             rust_report=self.rust_report,
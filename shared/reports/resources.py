@@ -1,29 +1,45 @@
+import codecs
 import dataclasses
 import logging
+import mmap
+import os
+import sys
+import zlib
+from collections.abc import MutableSequence
+from concurrent.futures import ProcessPoolExecutor
 from copy import copy
 from itertools import filterfalse, zip_longest
 from json import JSONEncoder, dumps, loads
 from typing import Dict, List, Optional
 
+from shared.config import get_config
 from shared.helpers.flag import Flag
 from shared.helpers.numeric import ratio
 from shared.helpers.yaml import walk
+from shared.reports.columnar import (
+    decode_columnar_lines,
+    encode_columnar_lines,
+    is_columnar_chunk_line,
+)
 from shared.reports.filtered import FilteredReport
+from shared.reports.interning import InterningPool
 from shared.reports.types import (
     EMPTY,
     TOTALS_MAP,
+    CoverageDatapoint,
     LineSession,
     ReportFileSummary,
     ReportLine,
     ReportTotals,
 )
+from shared.utils.diff import get_added_line_intervals
 from shared.utils.flare import report_to_flare
 from shared.utils.make_network_file import make_network_file
-from shared.utils.merge import line_type, merge_all, merge_line
+from shared.utils.merge import merge_all, merge_line
 from shared.utils.migrate import migrate_totals
 from shared.utils.ReportEncoder import ReportEncoder
 from shared.utils.sessions import Session, SessionType
-from shared.utils.totals import agg_totals, sum_totals
+from shared.utils.totals import agg_totals, sum_totals, totals_from_lines
 
 log = logging.getLogger(__name__)
 
@@ -40,6 +56,149 @@ def unique_everseen(iterable):
 
 
 END_OF_CHUNK = "\n<<<<< end_of_chunk >>>>>\n"
+# ReportTotals fields that Report._process_totals sums up over the files
+AGGREGATED_TOTALS_FIELDS = (
+    "lines",
+    "hits",
+    "misses",
+    "partials",
+    "branches",
+    "methods",
+    "messages",
+    "complexity",
+    "complexity_total",
+    "diff",
+)
+STREAM_READ_SIZE = 1024 * 1024
+# Minimum number of files to merge before Report.merge uses a process pool
+PARALLEL_MERGE_THRESHOLD = 1000
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class ArchiveChunks(MutableSequence):
+    """List of the chunks of an archive, sliced out of the archive only when needed
+
+    Splitting the whole archive costs as much as loading every file in it, even
+    when we only want a couple of them. Here the start offset of each chunk is
+    found (and remembered) the first time a chunk at or past it is requested, so
+    the work done is proportional to the chunks actually used.
+
+    Chunks that were set (or already sliced) are kept in `_items`, keyed by index.
+
+    The archive can also be utf-8 `bytes` or a `mmap`, in which case chunks are
+    decoded as they get sliced.
+    """
+
+    __slots__ = ("_archive", "_separator", "_offsets", "_items", "_length")
+
+    def __init__(self, archive):
+        self._archive = archive
+        self._separator = (
+            END_OF_CHUNK if isinstance(archive, str) else END_OF_CHUNK.encode()
+        )
+        # start offsets of the chunks found so far
+        self._offsets = [0]
+        self._items = {}
+        self._length = None
+
+    @property
+    def archive(self):
+        return self._archive
+
+    def _chunk_start(self, index):
+        offsets = self._offsets
+        while len(offsets) <= index:
+            position = self._archive.find(self._separator, offsets[-1])
+            if position == -1:
+                raise IndexError("chunk index out of range")
+            offsets.append(position + len(self._separator))
+        return offsets[index]
+
+    def _slice_chunk(self, index):
+        start = self._chunk_start(index)
+        try:
+            end = self._chunk_start(index + 1) - len(self._separator)
+        except IndexError:
+            end = len(self._archive)
+        chunk = self._archive[start:end]
+        if isinstance(chunk, bytes):
+            return chunk.decode()
+        return chunk
+
+    def _normalize_index(self, index):
+        if index < 0:
+            index += len(self)
+            if index < 0:
+                raise IndexError("chunk index out of range")
+        elif self._length is not None and index >= self._length:
+            raise IndexError("chunk index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self._normalize_index(index)
+        if index not in self._items:
+            self._items[index] = self._slice_chunk(index)
+        return self._items[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            chunks = list(self)
+            chunks[index] = value
+            self._reset(chunks)
+            return
+        index = self._normalize_index(index)
+        if index not in self._items:
+            # makes sure the index exists
+            self._chunk_start(index)
+        self._items[index] = value
+
+    def __delitem__(self, index):
+        chunks = list(self)
+        del chunks[index]
+        self._reset(chunks)
+
+    def insert(self, index, value):
+        if index >= len(self):
+            self._items[self._length] = value
+            self._length += 1
+            return
+        chunks = list(self)
+        chunks.insert(index, value)
+        self._reset(chunks)
+
+    def _reset(self, chunks):
+        self._archive = ""
+        self._separator = END_OF_CHUNK
+        self._offsets = [0]
+        self._items = dict(enumerate(chunks))
+        self._length = len(chunks)
+
+    def __len__(self):
+        if self._length is None:
+            try:
+                self._chunk_start(sys.maxsize)
+            except IndexError:
+                pass
+            self._length = len(self._offsets)
+        return self._length
+
+    def __bool__(self):
+        # an archive always has at least one chunk, like `str.split` would give
+        return self._length is None or self._length > 0
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (ArchiveChunks, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return "<%s chunks=%s>" % (self.__class__.__name__, len(self))
 
 
 class ReportFile(object):
@@ -51,6 +210,7 @@ class ReportFile(object):
         "_ignore",
         "_totals",
         "_session_totals",
+        "_pool",
     ]
 
     def __init__(
@@ -61,6 +221,7 @@ class ReportFile(object):
         lines=None,
         line_modifier=None,
         ignore=None,
+        pool=None,
     ):
         """
         name = string, filename. "folder/name.py"
@@ -69,10 +230,13 @@ class ReportFile(object):
         lines = [] or string
            if [] then [null, line@1, null, line@3, line@4]
            if str then "\nline@1\n\nline@3"
+               or "\n#columnar:v1:..." (see shared.reports.columnar)
            a line is [] that maps to ReportLine:obj
         line_modifier = function, filter lines by sessions.
         ignore is for report buildling only, it filters out lines that should be not covered
             {eof:N, lines:[1,10]}
+        pool = <InterningPool> shared by the files of a report, reuses the sessions
+            and coverage values of the lines parsed from JSON
         """
         self.name = name
         # lines = [<details dict()>, <Line #1>, ....]
@@ -84,6 +248,8 @@ class ReportFile(object):
             else:
                 lines = lines.splitlines()
                 self._details = loads(lines.pop(0) or "null")
+                if len(lines) == 1 and is_columnar_chunk_line(lines[0]):
+                    lines = decode_columnar_lines(lines[0])
                 self._lines = lines
         else:
             self._details = {}
@@ -103,6 +269,7 @@ class ReportFile(object):
                 self._totals = ReportTotals(*totals) if totals else None
 
         self._session_totals = session_totals
+        self._pool = pool
 
     def __repr__(self):
         try:
@@ -125,11 +292,21 @@ class ReportFile(object):
         else:
             # these are old versions
             line = loads(line)
-            if len(line) > 2 and line[2]:
+            pool = self._pool
+            if pool is not None and line:
+                line[0] = pool.coverage(line[0])
+                if len(line) > 2 and line[2]:
+                    line[2] = [pool.session(session) for session in line[2] if session]
+            elif len(line) > 2 and line[2]:
                 line[2] = [
                     LineSession(*tuple(session)) for session in line[2] if session
                 ]
-            return ReportLine.create(*line)
+            if len(line) > 5 and line[5]:
+                line[5] = [
+                    CoverageDatapoint(*datapoint) if datapoint is not None else None
+                    for datapoint in line[5]
+                ]
+            return ReportLine.create_typed(*line)
 
     @property
     def lines(self):
@@ -148,24 +325,26 @@ class ReportFile(object):
                 yield ln, line
 
     def calculate_diff(self, all_file_segments):
-        fg = self.get
-        lines = []
-        le = lines.extend
-        # add all new lines data to a new file to get totals
-        [
-            le(
-                [
-                    fg(i)
-                    for i, line in enumerate(
-                        [l for l in segment["lines"] if l[0] != "-"],
-                        start=int(segment["header"][2]) or 1,
-                    )
-                    if line[0] == "+"
-                ]
-            )
-            for segment in all_file_segments
-        ]
-        return ReportFile(name=None, totals=None, lines=lines).totals
+        """returns the totals of the lines the segments of a diff add to this file"""
+        intervals = get_added_line_intervals(all_file_segments)
+        return totals_from_lines(self.lines_in_intervals(intervals))
+
+    def lines_in_intervals(self, intervals):
+        """Iter through the lines with coverage within the sorted `(first, last)`
+        line number intervals, returning (ln, line)
+        """
+        func = self._line_modifier
+        _lines = self._lines
+        for first, last in intervals:
+            for ln in range(max(first, 1), min(last, len(_lines)) + 1):
+                line = _lines[ln - 1]
+                if line:
+                    line = self._line(line)
+                    if func:
+                        line = func(line)
+                        if not line:
+                            continue
+                    yield ln, line
 
     def delete_session(self, sessionid: int):
         self.delete_multiple_sessions([sessionid])
@@ -393,22 +572,60 @@ class ReportFile(object):
 
         else:
             # set new lines object
-            self._lines = [
-                merge_line(before, after, joined)
-                for before, after in zip_longest(self, other_file)
-            ]
+            if (
+                self._line_modifier is None
+                and other_file._line_modifier is None
+                and get_config("setup", "rust_merge_lines", default=False)
+            ):
+                self._lines = self._rust_merge_lines(other_file, joined)
+            else:
+                self._lines = [
+                    merge_line(before, after, joined)
+                    for before, after in zip_longest(self, other_file)
+                ]
 
         self._totals = None
         return True
 
+    def _rust_merge_lines(self, other_file, joined):
+        """Merges the lines of both files in rustyribs, in one call
+
+        Gives the same lines `merge_line` would. The lines rustyribs doesn't know how
+            to merge exactly like it are merged by `merge_line` instead
+        """
+        # rustyribs is only needed by reports that opt into this
+        from shared.ribs import merge_report_lines
+
+        lines, other_lines = self._lines, other_file._lines
+        merged, unmerged_indexes = merge_report_lines(
+            list(map(_encode_line_for_rust_merge, lines)),
+            list(map(_encode_line_for_rust_merge, other_lines)),
+            joined,
+        )
+        for index in unmerged_indexes:
+            before = lines[index] if index < len(lines) else None
+            after = other_lines[index] if index < len(other_lines) else None
+            merged[index] = merge_line(
+                self._line(before) if before else None,
+                other_file._line(after) if after else None,
+                joined,
+            )
+        return merged
+
     @property
     def details(self):
         return self._details
 
-    def _encode(self):
+    def _encode(self, columnar=False):
+        if columnar:
+            encoded_lines = encode_columnar_lines(
+                self._line(line) if line else None for line in self._lines
+            )
+        else:
+            encoded_lines = "\n".join(map(_dumps_not_none, self._lines))
         return "%s\n%s" % (
             dumps(self.details, separators=(",", ":")),
-            "\n".join(map(_dumps_not_none, self._lines)),
+            encoded_lines,
         )
 
     @property
@@ -419,46 +636,7 @@ class ReportFile(object):
 
     def _process_totals(self):
         """return dict of totals"""
-        cov, types, messages = [], [], []
-        _cov, _types, _messages = cov.append, types.append, messages.append
-        for ln, line in self.lines:
-            _cov(line_type(line.coverage))
-            _types(line.type)
-            _messages(len(line.messages or []))
-        hits = cov.count(0)
-        misses = cov.count(1)
-        partials = cov.count(2)
-        lines = hits + misses + partials
-
-        def sum_of_complexity(l):
-            # (hit, total)
-            c = l[1].complexity
-            if not c:
-                # no coverage data provided
-                return (0, 0)
-            elif type(c) is int:
-                # coverage is of type int
-                return (c, 0)
-            else:
-                # coverage is ratio
-                return c
-
-        complexity = tuple(map(sum, zip(*map(sum_of_complexity, self.lines)))) or (0, 0)
-
-        return ReportTotals(
-            files=0,
-            lines=lines,
-            hits=hits,
-            misses=misses,
-            partials=partials,
-            coverage=ratio(hits, lines) if lines else None,
-            branches=types.count("b"),
-            methods=types.count("m"),
-            messages=sum(messages),
-            sessions=0,
-            complexity=complexity[0],
-            complexity_total=complexity[1],
-        )
+        return totals_from_lines(self.lines)
 
     def apply_line_modifier(self, line_modifier):
         if line_modifier is None and self._line_modifier is None:
@@ -492,7 +670,14 @@ class ReportFile(object):
 
         Given coverage info for commit A (report._lines), and a diff from A to B (diff),
         adjust coverage info so that it works AS IF it was uploaded for commit B.
+
+        The new lines are built in a single pass: the lines that end up before
+            the current position are moved to `shifted`, and the ones after it are
+            `lines[consumed:]`, so no line is moved more than once.
         """
+        lines = self._lines
+        shifted = []
+        consumed = 0
         try:
             removed = "-"
             added = "+"
@@ -500,19 +685,34 @@ class ReportFile(object):
             for segment in diff["segments"]:
                 # Header is [pos_in_base, lines_len_base, pos_in_head, lines_len_head]
                 pos = (int(segment["header"][2]) or 1) - 1
+                if pos < 0:
+                    raise ValueError("Negative line position in diff header")
+                if pos < len(shifted):
+                    # segments out of order, starting over from what is done so far
+                    lines = shifted + lines[consumed:]
+                    shifted = []
+                    consumed = 0
                 # loop through each line in segment
                 for line in segment["lines"]:
                     if line[0] == removed:
-                        if len(self._lines) > pos:
-                            self._lines.pop(pos)
+                        if len(shifted) + len(lines) - consumed > pos:
+                            # move the lines up to pos, and skip the one at pos
+                            missing = pos - len(shifted)
+                            shifted.extend(lines[consumed : consumed + missing])
+                            consumed += missing + 1
                     elif line[0] == added:
-                        self._lines.insert(pos, "")
+                        # lines added past the end are appended to it
+                        missing = min(pos - len(shifted), len(lines) - consumed)
+                        shifted.extend(lines[consumed : consumed + missing])
+                        consumed += missing
+                        shifted.append("")
                         pos += 1
                     else:
                         pos += 1
         except (ValueError, KeyError, TypeError, IndexError):
             log.exception("Failed to shift lines by diff")
-            pass
+        shifted.extend(lines[consumed:])
+        self._lines[:] = shifted
 
     @classmethod
     def line_without_labels(cls, line, session_ids_to_delete, labels):
@@ -608,9 +808,9 @@ class Report(object):
         )
 
         # ["<json>", ...]
-        if isinstance(chunks, str):
-            # came from archive
-            chunks = chunks.split(END_OF_CHUNK)
+        if isinstance(chunks, (str, bytes, mmap.mmap)):
+            # came from archive, only the chunks we use get sliced out of it
+            chunks = ArchiveChunks(chunks)
         self._chunks = chunks or []
 
         # <ReportTotals>
@@ -622,10 +822,16 @@ class Report(object):
 
         else:
             self._totals = None
+        # the last totals aggregated from the files, which can be kept up to date
+        # as files get appended without going through all of them again
+        self._aggregated_totals = None
 
+        self._pool = _interning_pool()
         self._path_filter = None
         self._line_modifier = None
         self._filter_cache = (None, None)
+        # {flags: session ids}, valid while the sessions don't change
+        self._session_ids_by_flags = (None, {})
         self.diff_totals = diff_totals
         self.yaml = yaml  # ignored
 
@@ -633,6 +839,31 @@ class Report(object):
     def from_chunks(cls, *args, **kwargs):
         return cls(*args, **kwargs)
 
+    @classmethod
+    def iter_chunks_from_stream(cls, fileobj, files, read_size=STREAM_READ_SIZE):
+        """Yields (filename, ReportFile) for each file of an archive, reading it
+            from `fileobj` a piece at a time
+
+        Only one chunk is in memory at any point, so very large archives can be
+            walked over without ever holding them whole
+
+        :fileobj binary file object with the archive, plain or gzipped
+        :files the `files` of the report, {"filename": <ReportFileSummary>}
+        """
+        filename_mapping = {}
+        for filename, file_summary in files.items():
+            if not isinstance(file_summary, ReportFileSummary):
+                file_summary = ReportFileSummary(*file_summary)
+            filename_mapping[file_summary.file_index] = (filename, file_summary)
+        pool = _interning_pool()
+        for chunk_index, chunk in enumerate(_iter_archive_chunks(fileobj, read_size)):
+            if chunk_index not in filename_mapping or not chunk or chunk == "null":
+                continue
+            filename, file_summary = filename_mapping[chunk_index]
+            yield filename, cls.file_class(
+                name=filename, totals=file_summary.file_totals, lines=chunk, pool=pool
+            )
+
     def get_session_from_session(self, sess):
         if isinstance(sess, Session):
             return copy(sess)
@@ -733,15 +964,11 @@ class Report(object):
         if index:
             # existing file
             # =============
-            index.session_totals.append(copy(_file.totals))
             #  merge old report chunk
             cur_file = self[_file.name]
             # merge it
             cur_file.merge(_file, joined)
-            # set totals
-            index.file_totals = cur_file.totals
-            # update chunk in report
-            self._chunks[index.file_index] = cur_file
+            self._set_merged_file(index, _file, cur_file)
         else:
             # new file
             # ========
@@ -761,11 +988,43 @@ class Report(object):
 
             # add file in chunks
             self._chunks.append(_file)
-
-        self._totals = None
+            self._update_aggregated_totals(None, _file.totals)
 
         return True
 
+    def _update_aggregated_totals(self, old_file_totals, new_file_totals):
+        """Moves the report totals from including `old_file_totals` to including
+            `new_file_totals` instead, so one file changing doesn't mean going through
+            all of them again
+
+        If the totals were not aggregated from the files, or can't be updated to match
+            exactly what `_process_totals` would return, they are dropped instead
+        """
+        totals = self._totals
+        if (
+            totals is None
+            or totals is not self._aggregated_totals
+            or self._line_modifier
+            or (self._filter_cache and self._filter_cache[1])
+        ):
+            self._totals = None
+            return
+        changes = {}
+        for field in AGGREGATED_TOTALS_FIELDS:
+            current = getattr(totals, field)
+            old = getattr(old_file_totals, field) if old_file_totals else 0
+            new = getattr(new_file_totals, field) if new_file_totals else 0
+            if type(current) is not int or type(old) is not int or type(new) is not int:
+                self._totals = None
+                return
+            changes[field] = current - old + new
+        changes["files"] = totals.files - bool(old_file_totals) + bool(new_file_totals)
+        changes["coverage"] = (
+            ratio(changes["hits"], changes["lines"]) if changes["lines"] else None
+        )
+        changes["sessions"] = len(self.sessions)
+        self._totals = self._aggregated_totals = dataclasses.replace(totals, **changes)
+
     def get(self, filename, _else=None, bind=False):
         """
         returns <ReportFile>
@@ -800,6 +1059,7 @@ class Report(object):
                 totals=_file.file_totals,
                 lines=lines,
                 line_modifier=self._line_modifier,
+                pool=self._pool,
             )
             if bind:
                 self._chunks[_file[0]] = report_file
@@ -881,7 +1141,7 @@ class Report(object):
     def totals(self):
         if not self._totals:
             # reprocess totals
-            self._totals = self._process_totals()
+            self._totals = self._aggregated_totals = self._process_totals()
         return self._totals
 
     def _process_totals(self):
@@ -931,12 +1191,33 @@ class Report(object):
             start_number += 1
         return start_number
 
+    def get_session_ids_by_flags(self, flags, calculate):
+        """returns the session ids `calculate()` finds for `flags`, memoized while
+        the ids and flags of the sessions stay the same
+        """
+        # sessions get added, replaced and have their flags changed in place,
+        # so the memo is keyed by what `calculate` looks at
+        sessions_key = tuple(
+            (sid, tuple(session.flags or ())) for sid, session in self.sessions.items()
+        )
+        cached_key, session_ids_by_flags = self._session_ids_by_flags
+        if cached_key != sessions_key:
+            session_ids_by_flags = {}
+            self._session_ids_by_flags = (sessions_key, session_ids_by_flags)
+        flags_key = frozenset(flags)
+        if flags_key not in session_ids_by_flags:
+            session_ids_by_flags[flags_key] = frozenset(calculate())
+        return session_ids_by_flags[flags_key]
+
     def add_session(self, session):
         sessionid = self.next_session_number()
         self.sessions[sessionid] = session
         if self._totals:
             # add session to totals
+            aggregated = self._totals is self._aggregated_totals
             self._totals = dataclasses.replace(self._totals, sessions=sessionid + 1)
+            if aggregated:
+                self._aggregated_totals = self._totals
         return sessionid, session
 
     def __iter__(self):
@@ -962,6 +1243,7 @@ class Report(object):
                     else None,
                     lines=report,
                     line_modifier=self._line_modifier,
+                    pool=self._pool,
                 )
 
     def __contains__(self, filename):
@@ -979,11 +1261,92 @@ class Report(object):
             return
 
         # merge files
-        for _file in new_report:
-            if _file.name:
+        files = [_file for _file in new_report if _file.name]
+        merged_files = self._parallel_merge_files(files, joined)
+        for _file in files:
+            merged_file = merged_files.get(_file.name)
+            if merged_file is not None:
+                self._set_merged_file(self._files[_file.name], _file, merged_file)
+            else:
                 self.append(_file, joined)
 
-        self._totals = self._process_totals()
+        if self._totals is None or self._totals is not self._aggregated_totals:
+            self._totals = self._aggregated_totals = self._process_totals()
+        else:
+            self._totals = self._aggregated_totals = dataclasses.replace(
+                self._totals, sessions=len(self.sessions)
+            )
+
+    def _set_merged_file(self, index, _file, merged_file):
+        """replaces the chunk of an existing file with the result of merging _file into it"""
+        index.session_totals.append(copy(_file.totals))
+        old_file_totals = index.file_totals
+        # set totals
+        index.file_totals = merged_file.totals
+        # update chunk in report
+        self._chunks[index.file_index] = merged_file
+        if old_file_totals is None:
+            # the aggregated totals used the lines of the file instead
+            self._totals = None
+        self._update_aggregated_totals(old_file_totals, index.file_totals)
+
+    def _parallel_merge_files(self, files, joined):
+        """merges the files that already exist in this report in a process pool
+        returning {filename: <ReportFile>} with the merged files
+
+        Only kicks in when `setup.parallel_report_merge.workers` is above 1 and at least
+        `setup.parallel_report_merge.threshold` files need merging, otherwise returns {}
+        """
+        workers = get_config("setup", "parallel_report_merge", "workers", default=0)
+        if not workers or workers < 2 or self._line_modifier or self._path_filter:
+            return {}
+        threshold = get_config(
+            "setup",
+            "parallel_report_merge",
+            "threshold",
+            default=PARALLEL_MERGE_THRESHOLD,
+        )
+        jobs = []
+        for _file in files:
+            if _file.name in self._files and not _file._line_modifier and len(_file):
+                cur_file = self[_file.name]
+                jobs.append(
+                    (
+                        _file.name,
+                        cur_file._encode(),
+                        cur_file.totals,
+                        _file._encode(),
+                        _file.totals,
+                        joined,
+                        self.file_class,
+                    )
+                )
+        if not jobs or len(jobs) < threshold:
+            return {}
+        try:
+            # executor.map keeps the order of the jobs, so the result doesn't depend on scheduling
+            merged = list(
+                _get_merge_executor(workers).map(
+                    _merge_file_chunks,
+                    jobs,
+                    chunksize=max(1, len(jobs) // (workers * 4)),
+                )
+            )
+        except Exception:
+            # like a BrokenProcessPool, or a worker not allowed to start processes
+            log.warning(
+                "Unable to merge files in a process pool, merging them serially",
+                extra=dict(number_files=len(jobs), workers=workers),
+                exc_info=True,
+            )
+            _shutdown_merge_executor()
+            return {}
+        return {
+            name: self.file_class(
+                name=name, totals=totals, lines=chunk, pool=self._pool
+            )
+            for name, chunk, totals in merged
+        }
 
     def is_empty(self):
         """returns boolean if the report has no content"""
@@ -992,9 +1355,18 @@ class Report(object):
     def __bool__(self):
         return self.is_empty() is False
 
-    def to_archive(self):
+    def to_archive(self, columnar=None):
+        """Encodes the chunks of this report
+
+        :columnar uses the columnar line encoding (see shared.reports.columnar)
+            instead of one JSON array per line. Defaults to `setup.columnar_report_chunks`
+        """
+        if columnar is None:
+            columnar = get_config("setup", "columnar_report_chunks", default=False)
         # TODO: confirm removing encoding here is fine
-        return END_OF_CHUNK.join(map(_encode_chunk, self._chunks))
+        return END_OF_CHUNK.join(
+            _encode_chunk(chunk, columnar=columnar) for chunk in self._chunks
+        )
 
     def to_database(self):
         """returns (totals, report) to be stored in database"""
@@ -1372,6 +1744,67 @@ def _dumps_not_none(value):
     return value if value and value != "null" else ""
 
 
+def _encode_line_for_rust_merge(line):
+    """Encodes a line the way the chunks do, for `merge_report_lines`
+
+    Lines with values JSON can't hold as is (like `Fraction`s) become "null", which
+        rustyribs refuses to merge, so they get merged by `merge_line`
+    """
+    if not line:
+        return None
+    if isinstance(line, str):
+        return line
+    try:
+        return dumps(line if type(line) is list else list(line.astuple()))
+    except (TypeError, ValueError):
+        return "null"
+
+
+def _interning_pool():
+    """returns a new InterningPool when `setup.intern_report_lines` is enabled"""
+    if get_config("setup", "intern_report_lines", default=False):
+        return InterningPool()
+    return None
+
+
+_merge_executor = None
+
+
+def _get_merge_executor(workers):
+    """returns the process pool of Report.merge, created once per process and
+    number of workers instead of on every merge
+    """
+    global _merge_executor
+    key = (os.getpid(), workers)
+    if _merge_executor is None or _merge_executor[0] != key:
+        _shutdown_merge_executor()
+        _merge_executor = (key, ProcessPoolExecutor(max_workers=workers))
+    return _merge_executor[1]
+
+
+def _shutdown_merge_executor():
+    """drops the process pool of Report.merge, so the next merge starts a new one"""
+    global _merge_executor
+    if _merge_executor is not None:
+        key, executor = _merge_executor
+        _merge_executor = None
+        if key[0] == os.getpid():
+            executor.shutdown(wait=False)
+
+
+def _merge_file_chunks(job):
+    """merges two encoded file chunks, runs in the Report.merge process pool
+
+    The merge is done with the `file_class` of the report, so the details it keeps
+        about the lines (like the present sessions of an `EditableReportFile`) are
+        updated the same way they would be by a serial merge
+    """
+    name, chunk, totals, other_chunk, other_totals, joined, file_class = job
+    report_file = file_class(name, totals=totals, lines=chunk)
+    report_file.merge(file_class(name, totals=other_totals, lines=other_chunk), joined)
+    return name, report_file._encode(), report_file.totals
+
+
 def _rstrip_none(lst):
     while lst[-1] is None:
         lst.pop(-1)
@@ -1385,12 +1818,50 @@ class EnhancedJSONEncoder(JSONEncoder):
         return super().default(o)
 
 
-def _encode_chunk(chunk):
+def _iter_archive_chunks(fileobj, read_size=STREAM_READ_SIZE):
+    """Yields the chunks of the archive in `fileobj`, decompressing it if needed"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    decompressor = None
+    buffer = ""
+    first_read = True
+    while True:
+        data = fileobj.read(read_size)
+        if first_read:
+            first_read = False
+            if data.startswith(GZIP_MAGIC):
+                decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        final = not data
+        if decompressor is not None:
+            data = decompressor.flush() if final else decompressor.decompress(data)
+        # the separator could have started in the end of the previous buffer
+        search_start = max(len(buffer) - len(END_OF_CHUNK) + 1, 0)
+        buffer += decoder.decode(data, final=final)
+        chunk_start = 0
+        position = buffer.find(END_OF_CHUNK, search_start)
+        while position != -1:
+            yield buffer[chunk_start:position]
+            chunk_start = position + len(END_OF_CHUNK)
+            position = buffer.find(END_OF_CHUNK, chunk_start)
+        buffer = buffer[chunk_start:]
+        if final:
+            yield buffer
+            return
+
+
+def _is_columnar_chunk(chunk):
+    _, _, lines = chunk.partition("\n")
+    return is_columnar_chunk_line(lines)
+
+
+def _encode_chunk(chunk, columnar=False):
     if chunk is None:
         return "null"
     elif isinstance(chunk, ReportFile):
-        return chunk._encode()
+        return chunk._encode(columnar=columnar)
     elif isinstance(chunk, (list, dict)):
         return dumps(chunk, separators=(",", ":"), cls=EnhancedJSONEncoder)
+    elif chunk and chunk != "null" and _is_columnar_chunk(chunk) != columnar:
+        # raw chunk that was never loaded and is in the other format, converting it
+        return ReportFile(name=None, lines=chunk)._encode(columnar=columnar)
     else:
         return chunk
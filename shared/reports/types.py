@@ -7,6 +7,8 @@ from shared.config import get_config
 
 log = logging.getLogger(__name__)
 
+_new_object = object.__new__
+
 
 @dataclass
 class ReportTotals(object):
@@ -148,6 +150,29 @@ class ReportLine(object):
             datapoints=datapoints,
         )
 
+    @classmethod
+    def create_typed(
+        cls,
+        coverage=None,
+        type=None,
+        sessions=None,
+        messages=None,
+        complexity=None,
+        datapoints=None,
+    ):
+        """Same as `create`, for sessions and datapoints that are already
+        `LineSession` and `CoverageDatapoint` objects.
+        Skips `__init__` and the conversions of `__post_init__`
+        """
+        line = _new_object(cls)
+        line.coverage = coverage
+        line.type = type
+        line.sessions = sessions
+        line.messages = messages
+        line.complexity = complexity
+        line.datapoints = datapoints
+        return line
+
     def astuple(self):
         return (
             self.coverage,
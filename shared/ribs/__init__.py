@@ -4,9 +4,13 @@ from shared.rustyribs import (
     FilterAnalyzer,
     ProfilingData,
     SimpleAnalyzer,
+    compare_reports,
+    merge_report_lines,
     parse_report,
+    parse_report_from_buffer,
     run_comparison_as_json,
 )
+from shared.rustyribs import parse_unified_diff as _parse_unified_diff
 
 
 def run_comparison(*args, **kwargs):
@@ -17,6 +21,32 @@ def load_profiling_data(data_string):
     return ProfilingData.load_from_json(data_string)
 
 
+def parse_unified_diff(diff):
+    """Same as `TorngitBaseAdapter.diff_to_json`, parsing the diff (str or bytes) in rust
+
+    Returns the `diff_to_json` dict along with the diff input of the rust comparison,
+        which callers comparing the diff as parsed can pass on instead of going
+        through `rustify_diff`
+    """
+    if isinstance(diff, str):
+        diff = diff.encode()
+    files, rust_diff = _parse_unified_diff(diff)
+    if not files:
+        return None, {}
+    results = {}
+    for filename, _type, before, segments, added, removed in files:
+        _file = dict(type=_type)
+        if _type != "binary":
+            _file["before"] = before
+        if segments is not None:
+            _file["segments"] = [
+                dict(header=header, lines=lines) for (header, lines) in segments
+            ]
+        _file["stats"] = dict(added=added, removed=removed)
+        results[filename] = _file
+    return dict(files=results), rust_diff
+
+
 def rustify_diff(diff):
     if diff is None or "files" not in diff:
         return {}
@@ -4,6 +4,7 @@ from typing import Dict, List, Optional, Tuple
 
 import httpx
 
+from shared.config import get_config
 from shared.torngit.cache import torngit_cache
 from shared.torngit.enums import Endpoints
 from shared.typings.oauth_token_types import OauthConsumerToken, OnRefreshCallback
@@ -11,6 +12,27 @@ from shared.typings.oauth_token_types import OauthConsumerToken, OnRefreshCallba
 get_start_of_line = re.compile(r"@@ \-(\d+),?(\d*) \+(\d+),?(\d*).*").match
 
 
+def _iter_diff_files(diff):
+    """Yields what follows each "diff --git a/" of `diff`, one file at a time, so only
+    the lines of a single file are split at once
+    """
+    header = "diff --git a/"
+    separator = "\n" + header
+    if diff.startswith(header):
+        start = len(header)
+    else:
+        start = diff.find(separator)
+        if start != -1:
+            start += len(separator)
+    while start != -1:
+        end = diff.find(separator, start)
+        if end == -1:
+            yield diff[start:]
+            return
+        yield diff[start:end]
+        start = end + len(separator)
+
+
 class TokenType(Enum):
     read = auto()
     admin = auto()
@@ -134,15 +156,30 @@ class TorngitBaseAdapter(object):
             parents.append(self.build_tree_from_commits(p, commit_mapping))
         return {"commitid": start, "parents": parents}
 
-    def diff_to_json(self, diff):
+    def diff_to_json(self, diff, full_lines=True):
         """
         Processes a full diff (multiple files) into the object pattern below
         docs/specs/diff.json
+
+        Files are processed one at a time, counting their added and removed lines
+            as they go. With `full_lines=False` the `lines` of each segment are a
+            string with the first character of each line ("+", "-", " "...) instead
+            of a list with the whole lines, which is all that is needed to map
+            coverage to the diff, without keeping a copy of the diff in memory
+
+        Setups with `setup.rust_diff_parser` enabled parse full diffs in rust
         """
+        if full_lines and get_config("setup", "rust_diff_parser", default=False):
+            # rustyribs is only needed by setups that opt into this
+            from shared.ribs import parse_unified_diff
+
+            return parse_unified_diff(diff)[0]
         results = {}
-        diff = ("\n%s" % diff).split("\ndiff --git a/")
         segment = None
-        for _diff in diff[1:]:
+        # the counts of the file the current segment belongs to
+        segment_stats = None
+        compact_segments = []
+        for _diff in _iter_diff_files(diff):
             _diff = _diff.replace("\r\n", "\n").split("\n")
             if _diff[-1] == "":
                 # if the diff ends in a '\n' character then we'll have an extra
@@ -150,26 +187,18 @@ class TorngitBaseAdapter(object):
                 _diff.pop()
 
             try:
-                before, after = _diff.pop(0).split(" b/", 1)
+                before, after = _diff[0].split(" b/", 1)
             except IndexError:
-                before, after = None, None
-                # find the --- a
-                for source in _diff:
-                    if source.startswith("--- a/"):
-                        before = source[6:]
-                    elif source.startswith("+++ b/"):
-                        after = source[6:]
-                        break
-
-            if after is None:
                 continue
 
             # Is the file empty, skipped, etc
             # -------------------------------
+            stats = dict(added=0, removed=0)
             _file = dict(
                 type="new" if before == "/dev/null" else "modified",
                 before=None if before == after or before == "/dev/null" else before,
                 segments=[],
+                stats=stats,
             )
 
             results[after] = _file
@@ -177,8 +206,15 @@ class TorngitBaseAdapter(object):
             # Get coverage data on each line
             # ------------------------------
             # make file, this is ONE file not multiple
-            for source in _diff:
-                if source == "\ No newline at end of file":
+            for index in range(1, len(_diff)):
+                source = _diff[index]
+                sol = source[:1]
+                if sol == " " and segment:
+                    # context line, the most common kind
+                    segment["lines"].append(source if full_lines else sol)
+                    continue
+
+                elif source == "\\ No newline at end of file":
                     continue
 
                 sol4 = source[:4]
@@ -187,6 +223,9 @@ class TorngitBaseAdapter(object):
                     _file["before"] = after
                     _file["type"] = "deleted"
                     _file.pop("segments")
+                    if segment_stats is stats:
+                        segment_stats = None
+                    _file["stats"] = dict(added=0, removed=0)
                     break
 
                 elif sol4 == "new " and not source.startswith("new mode "):
@@ -196,6 +235,9 @@ class TorngitBaseAdapter(object):
                     _file["type"] = "binary"
                     _file.pop("before")
                     _file.pop("segments")
+                    if segment_stats is stats:
+                        segment_stats = None
+                    _file["stats"] = dict(added=0, removed=0)
                     break
 
                 elif sol4 in ("--- ", "+++ ", "inde", "diff", "old ", "new "):
@@ -212,20 +254,26 @@ class TorngitBaseAdapter(object):
                     l = get_start_of_line(source).groups()
                     segment = dict(header=[l[0], l[1], l[2], l[3]], lines=[])
                     _file["segments"].append(segment)
+                    segment_stats = stats
+                    if not full_lines:
+                        compact_segments.append(segment)
 
                 elif source == "":
                     continue
 
                 elif segment:
                     # actual lines
-                    segment["lines"].append(source)
-
-                # else:
-                #     results.pop(fname)
-                #     break
-
+                    segment["lines"].append(source if full_lines else sol)
+                    if segment_stats is not None:
+                        if sol == "+":
+                            segment_stats["added"] += 1
+                        elif sol == "-":
+                            segment_stats["removed"] += 1
+
+        for compact_segment in compact_segments:
+            compact_segment["lines"] = "".join(compact_segment["lines"])
         if results:
-            return dict(files=self._add_diff_totals(results))
+            return dict(files=results)
 
     def _add_diff_totals(self, diff):
         for fname, data in diff.items():
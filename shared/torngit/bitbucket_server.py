@@ -119,7 +119,7 @@ class BitbucketServer(TorngitBaseAdapter):
         else:
             return "/projects/%s" % self.data["owner"]["username"].upper()
 
-    def diff_to_json(self, diff_json):
+    def diff_to_json(self, diff_json, full_lines=True):
         results = {}
         for _diff in diff_json:
             if not _diff.get("destination"):
@@ -149,11 +149,13 @@ class BitbucketServer(TorngitBaseAdapter):
                     _file["segments"].append(segment)
                     for seg in hunk["segments"]:
                         t = seg["type"][0]
+                        sol = "-" if t == "R" else "+" if t == "A" else " "
                         for l in seg["lines"]:
                             segment["lines"].append(
-                                ("-" if t == "R" else "+" if t == "A" else " ")
-                                + l["line"]
+                                sol + l["line"] if full_lines else sol
                             )
+                    if not full_lines:
+                        segment["lines"] = "".join(segment["lines"])
 
         if results:
             return dict(files=self._add_diff_totals(results))
@@ -320,7 +320,7 @@ class Gitlab(TorngitBaseAdapter):
             raise
         return True
 
-    def diff_to_json(self, diff):
+    def diff_to_json(self, diff, full_lines=True):
         if type(diff) is list:
             for d in diff:
                 mode = ""
@@ -331,9 +331,11 @@ class Gitlab(TorngitBaseAdapter):
                     + mode
                     + d["diff"]
                 )
-            return super().diff_to_json("\n".join(map(lambda a: a["diff"], diff)))
+            return super().diff_to_json(
+                "\n".join(map(lambda a: a["diff"], diff)), full_lines=full_lines
+            )
         else:
-            return super().diff_to_json(self, diff)
+            return super().diff_to_json(diff, full_lines=full_lines)
 
     async def get_owner_info_from_repo(self, repo, token=None):
         if repo.get("owner"):
@@ -0,0 +1,33 @@
+def get_added_line_intervals(segments):
+    """Returns the lines a diff adds to a file, as sorted `(first, last)` intervals
+
+    segments = the "segments" of a file in a diff, as in `TorngitBaseAdapter.diff_to_json`
+        each line only matters by its first character, so `lines` can be a string of them
+    """
+    intervals = []
+    for segment in segments:
+        # position in the head of the first line of the segment
+        pos = int(segment["header"][2]) or 1
+        start = None
+        for line in segment["lines"]:
+            line_type = line[0]
+            if line_type == "-":
+                continue
+            if line_type == "+":
+                if start is None:
+                    start = pos
+            elif start is not None:
+                intervals.append((start, pos - 1))
+                start = None
+            pos += 1
+        if start is not None:
+            intervals.append((start, pos - 1))
+    intervals.sort()
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
@@ -1,34 +1,87 @@
 import re
+from functools import lru_cache
 
 
-def match(patterns, string):
-    if patterns is None or string in patterns:
-        return True
+def _compile_any(patterns):
+    """Compiles `patterns` into a list of regexes, any of which has to match
 
-    patterns = set([_f for _f in patterns if _f])
-    negatives = [a for a in patterns if a.startswith(("^!", "!"))]
-    positives = patterns - set(negatives)
+    Patterns without groups are joined in a single alternation, the ones with groups
+        are kept apart so their backreferences and group names keep working
+    """
+    combinable, compiled = [], []
+    for pattern in patterns:
+        regex = re.compile(pattern)
+        if regex.groups or regex.flags & ~re.UNICODE:
+            compiled.append(regex)
+        else:
+            combinable.append(pattern)
+    if combinable:
+        compiled.insert(
+            0, re.compile("|".join("(?:%s)" % pattern for pattern in combinable))
+        )
+    return compiled
 
-    # must not match
-    for pattern in negatives:
-        # matched a negative search
-        if re.match(pattern.replace("!", ""), string):
-            return False
 
-    if positives:
-        for pattern in positives:
-            # match was found
-            if re.match(pattern, string):
-                return True
+class PathMatcher(object):
+    """Precompiled version of `match(patterns, string)`
+
+    Use `PathMatcher.for_patterns` to reuse the matcher of the same patterns
+    """
+
+    __slots__ = ("patterns", "_negatives", "_positives")
+
+    def __init__(self, patterns):
+        self.patterns = frozenset(patterns)
+        # compiled on the first string that isn't one of the patterns, so literal
+        # paths keep matching even if they aren't valid regexes
+        self._negatives = None
+        self._positives = None
+
+    def _compile(self):
+        patterns = set([_f for _f in self.patterns if _f])
+        negatives = [a for a in patterns if a.startswith(("^!", "!"))]
+        positives = patterns - set(negatives)
+        self._negatives = _compile_any(
+            sorted(pattern.replace("!", "") for pattern in negatives)
+        )
+        self._positives = _compile_any(sorted(positives))
+
+    @classmethod
+    def for_patterns(cls, patterns):
+        return _cached_path_matcher(tuple(patterns))
+
+    def match(self, string):
+        if string in self.patterns:
+            return True
 
-        # did not match any required paths
-        return False
+        if self._positives is None:
+            self._compile()
+
+        # must not match
+        for regex in self._negatives:
+            # matched a negative search
+            if regex.match(string):
+                return False
+
+        if self._positives:
+            # did not match any required paths otherwise
+            return any(regex.match(string) for regex in self._positives)
 
-    else:
         # no positives: everyting else is ok
         return True
 
 
+@lru_cache(maxsize=256)
+def _cached_path_matcher(patterns):
+    return PathMatcher(patterns)
+
+
+def match(patterns, string):
+    if patterns is None:
+        return True
+    return PathMatcher.for_patterns(patterns).match(string)
+
+
 def match_any(patterns, match_any_of_these):
     if match_any_of_these:
         for string in match_any_of_these:
@@ -2,6 +2,7 @@ from operator import attrgetter
 
 from shared.helpers.numeric import ratio
 from shared.reports.types import ReportTotals
+from shared.utils.merge import LineType, line_type
 
 
 def agg_totals(totals):
@@ -49,3 +50,57 @@ def _sum(array):
                 # https://sentry.io/codecov/v4/issues/159966549/
                 return sum([a if type(a) is int else 0 for a in array])
     return None
+
+
+def totals_from_lines(lines):
+    """Builds the totals of a file out of its `(line number, ReportLine)` pairs
+
+    Everything is counted in a single pass over the lines. The same coverage values
+        show up over and over, so `line_type` is only called once for each of them
+    """
+    # hits, misses, partials, indexed by LineType
+    line_types = [0, 0, 0]
+    branches = methods = messages = complexity = complexity_total = 0
+    coverage_line_types = {}
+    for _, line in lines:
+        coverage = line.coverage
+        # `True` and `1` are equal as keys, but not the same kind of coverage
+        key = (coverage.__class__, coverage)
+        try:
+            cov_type = coverage_line_types[key]
+        except KeyError:
+            cov_type = coverage_line_types[key] = line_type(coverage)
+        except TypeError:
+            cov_type = line_type(coverage)
+        if cov_type is not None and cov_type != LineType.skipped:
+            line_types[cov_type] += 1
+        if line.type == "b":
+            branches += 1
+        elif line.type == "m":
+            methods += 1
+        if line.messages:
+            messages += len(line.messages)
+        c = line.complexity
+        if c:
+            if type(c) is int:
+                complexity += c
+            else:
+                # (hit, total)
+                complexity += c[0]
+                complexity_total += c[1]
+    hits, misses, partials = line_types
+    n_lines = hits + misses + partials
+    return ReportTotals(
+        files=0,
+        lines=n_lines,
+        hits=hits,
+        misses=misses,
+        partials=partials,
+        coverage=ratio(hits, n_lines) if n_lines else None,
+        branches=branches,
+        methods=methods,
+        messages=messages,
+        sessions=0,
+        complexity=complexity,
+        complexity_total=complexity_total,
+    )
@@ -1,25 +1,46 @@
 use std::collections::HashMap;
 use std::collections::HashSet;
 
+use pyo3::exceptions::PyValueError;
 use pyo3::prelude::*;
+use rayon::prelude::*;
 
 use crate::cov;
 use crate::diff;
 use crate::file;
 use crate::line;
+use crate::matching;
 use crate::report;
 
 #[pyclass]
 pub struct FilterAnalyzer {
     files: Option<HashSet<String>>,
     flags: Option<Vec<String>>,
+    paths: Option<matching::PathMatcher>,
 }
 
 #[pymethods]
 impl FilterAnalyzer {
+    /// `paths` are patterns with the semantics of shared.utils.match, matched
+    /// natively. Raises ValueError on patterns the regex crate doesn't support
     #[new]
-    fn new(files: Option<HashSet<String>>, flags: Option<Vec<String>>) -> Self {
-        FilterAnalyzer { files, flags }
+    #[args(paths = "None")]
+    fn new(
+        files: Option<HashSet<String>>,
+        flags: Option<Vec<String>>,
+        paths: Option<Vec<String>>,
+    ) -> PyResult<Self> {
+        let paths = match paths {
+            Some(p) if !p.is_empty() => Some(
+                matching::PathMatcher::new(&p).map_err(|e| PyValueError::new_err(e.to_string()))?,
+            ),
+            _ => None,
+        };
+        Ok(FilterAnalyzer {
+            files,
+            flags,
+            paths,
+        })
     }
 
     pub fn get_totals(&self, report: &report::Report) -> PyResult<report::ReportTotals> {
@@ -34,7 +55,7 @@ impl FilterAnalyzer {
                 session_count = sess.len() as i32;
                 let filtered_totals: Vec<file::FileTotals> = report
                     .report_files
-                    .iter()
+                    .par_iter()
                     .filter(|(x, _)| self.should_include(x))
                     .map(|(_, y)| y.get_filtered_totals(sess))
                     .collect();
@@ -46,7 +67,7 @@ impl FilterAnalyzer {
                 session_count = report.session_mapping.len() as i32;
                 let filtered_totals: Vec<file::FileTotals> = report
                     .report_files
-                    .iter()
+                    .par_iter()
                     .filter(|(x, _)| self.should_include(x))
                     .map(|(_, y)| y.get_totals())
                     .collect();
@@ -60,12 +81,19 @@ impl FilterAnalyzer {
     }
 
     pub fn should_include(&self, filename: &str) -> bool {
-        match &self.files {
-            Some(f) => return f.contains(filename),
+        if let Some(f) = &self.files {
+            if !f.contains(filename) {
+                return false;
+            }
+        }
+        match &self.paths {
+            Some(m) => return m.matches(filename),
             None => return true,
         }
     }
 
+    /// Only the "modified" and "new" files of the diff are considered, like in
+    /// `Report.calculate_diff`. The files are analyzed in parallel
     pub fn calculate_diff(
         &self,
         report: &report::Report,
@@ -78,20 +106,23 @@ impl FilterAnalyzer {
             Some(actual_flags) => Some(report.get_sessions_from_flags(&actual_flags)),
             None => None,
         };
+        let mapping: HashMap<String, diff::FileDiffAnalysis> = diff
+            .par_iter()
+            .filter(|(filename, diff_data)| {
+                (diff_data.0 == "modified" || diff_data.0 == "new") && self.should_include(filename)
+            })
+            .filter_map(|(filename, diff_data)| {
+                report.get_by_filename(filename).map(|file_report| {
+                    (
+                        filename.to_string(),
+                        self.calculate_reportfile_diff(file_report, diff_data, &sessions),
+                    )
+                })
+            })
+            .collect();
         let mut res = report::ReportTotals::new();
-        let mut mapping: HashMap<String, diff::FileDiffAnalysis> = HashMap::new();
-        for (filename, diff_data) in diff.iter() {
-            if self.should_include(filename) {
-                match report.get_by_filename(filename) {
-                    None => {}
-                    Some(file_report) => {
-                        let file_res =
-                            self.calculate_reportfile_diff(file_report, diff_data, &sessions);
-                        res.add_up(&file_res.summary);
-                        mapping.insert(filename.to_string(), file_res);
-                    }
-                }
-            }
+        for file_res in mapping.values() {
+            res.add_up(&file_res.summary);
         }
         return (res, mapping);
     }
@@ -175,6 +206,7 @@ mod tests {
                             complexity: None,
                         }],
                         complexity: None,
+                        datapoints: None,
                     },
                 ),
                 (
@@ -195,6 +227,7 @@ mod tests {
                             },
                         ],
                         complexity: None,
+                        datapoints: None,
                     },
                 ),
             ]
@@ -229,6 +262,7 @@ mod tests {
         let analyzer_unit = FilterAnalyzer {
             files: Some(vec!["file1.go".to_string()].into_iter().collect()),
             flags: Some(vec!["unit".to_string()]),
+            paths: None,
         };
         let unit_res = analyzer_unit.get_totals(&report).unwrap();
         assert_eq!(unit_res.files, 1);
@@ -240,6 +274,7 @@ mod tests {
         let analyzer_integration = FilterAnalyzer {
             files: Some(vec!["file1.go".to_string()].into_iter().collect()),
             flags: Some(vec!["integration".to_string()]),
+            paths: None,
         };
         let integration_res = analyzer_integration.get_totals(&report).unwrap();
         assert_eq!(integration_res.files, 1);
@@ -251,6 +286,7 @@ mod tests {
         let analyzer_unit_and_integration = FilterAnalyzer {
             files: Some(vec!["file1.go".to_string()].into_iter().collect()),
             flags: Some(vec!["integration".to_string(), "unit".to_string()]),
+            paths: None,
         };
         let integration_and_unit_res = analyzer_unit_and_integration.get_totals(&report).unwrap();
         assert_eq!(integration_and_unit_res.files, 1);
@@ -262,6 +298,7 @@ mod tests {
         let analyzer_apple_and_banana = FilterAnalyzer {
             files: Some(vec!["file1.go".to_string()].into_iter().collect()),
             flags: Some(vec!["banana".to_string(), "apple".to_string()]),
+            paths: None,
         };
         let apple_and_banana_res = analyzer_apple_and_banana.get_totals(&report).unwrap();
         assert_eq!(apple_and_banana_res.files, 0);
@@ -287,6 +324,7 @@ mod tests {
                             complexity: None,
                         }],
                         complexity: None,
+                        datapoints: None,
                     },
                 ),
                 (
@@ -307,6 +345,7 @@ mod tests {
                             },
                         ],
                         complexity: None,
+                        datapoints: None,
                     },
                 ),
             ]
@@ -341,6 +380,7 @@ mod tests {
         let analyzer = FilterAnalyzer {
             files: Some(vec!["file1.go".to_string()].into_iter().collect()),
             flags: None,
+            paths: None,
         };
         let unit_res = analyzer.get_totals(&report).unwrap();
         assert_eq!(unit_res.files, 1);
@@ -350,4 +390,100 @@ mod tests {
         assert_eq!(unit_res.partials, 0);
         assert_eq!(unit_res.sessions, 2);
     }
+
+    #[test]
+    fn filtered_by_paths_works() {
+        let analyzer = FilterAnalyzer::new(
+            None,
+            None,
+            Some(vec!["src/".to_string(), "!src/vendor/".to_string()]),
+        )
+        .unwrap();
+        assert!(analyzer.should_include("src/a.py"));
+        assert!(!analyzer.should_include("src/vendor/b.py"));
+        assert!(!analyzer.should_include("tests/c.py"));
+        let with_files = FilterAnalyzer::new(
+            Some(vec!["src/vendor/b.py".to_string()].into_iter().collect()),
+            Some(vec!["unit".to_string()]),
+            Some(vec!["src/".to_string()]),
+        )
+        .unwrap();
+        assert!(with_files.should_include("src/vendor/b.py"));
+        assert!(!with_files.should_include("src/a.py"));
+        assert!(FilterAnalyzer::new(None, None, Some(vec!["(?!src)".to_string()])).is_err());
+    }
+
+    #[test]
+    fn calculate_diff_works() {
+        let line = |session_id: i32, coverage: cov::Coverage| line::ReportLine {
+            coverage: coverage.clone(),
+            coverage_type: line::CoverageType::Standard,
+            sessions: vec![line::LineSession {
+                id: session_id,
+                coverage: coverage,
+                complexity: None,
+            }],
+            complexity: None,
+            datapoints: None,
+        };
+        let file_with_lines = |lines: Vec<(i32, line::ReportLine)>| file::ReportFile {
+            lines: lines.into_iter().collect(),
+        };
+        let report = report::Report {
+            report_files: vec![
+                (
+                    "a.py".to_string(),
+                    file_with_lines(vec![
+                        (1, line(0, cov::Coverage::Hit)),
+                        (2, line(1, cov::Coverage::Miss)),
+                        (4, line(0, cov::Coverage::Miss)),
+                    ]),
+                ),
+                (
+                    "deleted.py".to_string(),
+                    file_with_lines(vec![(1, line(0, cov::Coverage::Hit))]),
+                ),
+            ]
+            .into_iter()
+            .collect(),
+            session_mapping: vec![
+                (0, vec!["unit".to_string()]),
+                (1, vec!["integration".to_string()]),
+            ]
+            .into_iter()
+            .collect(),
+        };
+        let diff: diff::DiffInput = vec![
+            (
+                "a.py".to_string(),
+                (
+                    "modified".to_string(),
+                    None,
+                    vec![(
+                        (1, 2, 1, 3),
+                        vec!["+".to_string(), "+".to_string(), " ".to_string()],
+                    )],
+                ),
+            ),
+            (
+                "deleted.py".to_string(),
+                ("deleted".to_string(), None, vec![]),
+            ),
+            ("missing.py".to_string(), ("new".to_string(), None, vec![])),
+        ]
+        .into_iter()
+        .collect();
+        let analyzer = FilterAnalyzer::new(None, None, None).unwrap();
+        let (totals, files) = analyzer.calculate_diff(&report, diff.clone());
+        assert_eq!(files.len(), 1);
+        assert_eq!(files["a.py"].summary.hits, 1);
+        assert_eq!(files["a.py"].summary.misses, 1);
+        assert_eq!(totals.files, 1);
+        assert_eq!(totals.lines, 2);
+        let unit_analyzer =
+            FilterAnalyzer::new(None, Some(vec!["unit".to_string()]), None).unwrap();
+        let (unit_totals, _) = unit_analyzer.calculate_diff(&report, diff);
+        assert_eq!(unit_totals.lines, 1);
+        assert_eq!(unit_totals.hits, 1);
+    }
 }
@@ -40,6 +40,7 @@ mod tests {
                             complexity: None,
                         }],
                         complexity: None,
+                        datapoints: None,
                     },
                 ),
                 (
@@ -60,6 +61,7 @@ mod tests {
                             },
                         ],
                         complexity: None,
+                        datapoints: None,
                     },
                 ),
             ]
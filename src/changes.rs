@@ -2,6 +2,7 @@ use std::collections::HashMap;
 use std::collections::HashSet;
 use std::iter::FromIterator;
 
+use pyo3::prelude::*;
 use rayon::prelude::*;
 use serde::Serialize;
 
@@ -12,37 +13,95 @@ use crate::report;
 
 type LineChange = ((i32, Option<cov::Coverage>), (i32, Option<cov::Coverage>));
 
-#[derive(Debug, Serialize)]
+#[pyclass]
+#[derive(Debug, Clone, Serialize)]
 pub struct FileChangesAnalysis {
+    #[pyo3(get)]
     pub base_name: String,
+    #[pyo3(get)]
     pub head_name: String,
+    #[pyo3(get)]
     pub file_was_added_by_diff: bool,
+    #[pyo3(get)]
     pub file_was_removed_by_diff: bool,
+    #[pyo3(get)]
     pub base_coverage: Option<file::FileTotals>,
+    #[pyo3(get)]
     pub head_coverage: Option<file::FileTotals>,
     pub removed_diff_coverage: Option<Vec<(i32, cov::Coverage)>>,
     pub added_diff_coverage: Option<Vec<(i32, cov::Coverage)>>,
     pub unexpected_line_changes: Vec<LineChange>,
+    #[pyo3(get)]
     pub lines_only_on_base: Vec<i32>,
+    #[pyo3(get)]
     pub lines_only_on_head: Vec<i32>,
 }
 
-#[derive(Debug, Serialize, PartialEq)]
+fn coverage_as_str(coverage: &cov::Coverage) -> String {
+    coverage.as_char().to_string()
+}
+
+fn line_coverages_as_str(lines: &Option<Vec<(i32, cov::Coverage)>>) -> Option<Vec<(i32, String)>> {
+    lines.as_ref().map(|v| {
+        v.iter()
+            .map(|(line_number, coverage)| (*line_number, coverage_as_str(coverage)))
+            .collect()
+    })
+}
+
+/// Line coverages are given the way they get serialized to JSON ("h", "m", "p" or "i")
+#[pymethods]
+impl FileChangesAnalysis {
+    #[getter(removed_diff_coverage)]
+    fn get_removed_diff_coverage(&self) -> Option<Vec<(i32, String)>> {
+        line_coverages_as_str(&self.removed_diff_coverage)
+    }
+
+    #[getter(added_diff_coverage)]
+    fn get_added_diff_coverage(&self) -> Option<Vec<(i32, String)>> {
+        line_coverages_as_str(&self.added_diff_coverage)
+    }
+
+    #[getter(unexpected_line_changes)]
+    fn get_unexpected_line_changes(&self) -> Vec<((i32, Option<String>), (i32, Option<String>))> {
+        self.unexpected_line_changes
+            .iter()
+            .map(|((base_line, base_coverage), (head_line, head_coverage))| {
+                (
+                    (*base_line, base_coverage.as_ref().map(coverage_as_str)),
+                    (*head_line, head_coverage.as_ref().map(coverage_as_str)),
+                )
+            })
+            .collect()
+    }
+}
+
+#[pyclass]
+#[derive(Debug, Clone, Serialize, PartialEq)]
 pub struct ChangePatchTotals {
+    #[pyo3(get)]
     hits: i32,
+    #[pyo3(get)]
     misses: i32,
+    #[pyo3(get)]
     partials: i32,
+    #[pyo3(get)]
     coverage: Option<f32>,
 }
 
-#[derive(Debug, Serialize, PartialEq)]
+#[pyclass]
+#[derive(Debug, Clone, Serialize, PartialEq)]
 pub struct ChangeAnalysisSummary {
+    #[pyo3(get)]
     patch_totals: ChangePatchTotals,
 }
 
+#[pyclass]
 #[derive(Serialize, Debug)]
 pub struct ChangeAnalysis {
+    #[pyo3(get)]
     pub files: Vec<FileChangesAnalysis>,
+    #[pyo3(get)]
     changes_summary: ChangeAnalysisSummary,
 }
 
@@ -334,6 +393,7 @@ mod tests {
                     complexity: None,
                 }],
                 complexity: None,
+                datapoints: None,
             },
         )
     }
@@ -367,6 +427,7 @@ mod tests {
                                         },
                                     ],
                                     complexity: None,
+                                    datapoints: None,
                                 },
                             ),
                         ]
@@ -388,6 +449,7 @@ mod tests {
                                     complexity: None,
                                 }],
                                 complexity: None,
+                                datapoints: None,
                             },
                         )]
                         .into_iter()
@@ -422,6 +484,7 @@ mod tests {
                                         complexity: None,
                                     }],
                                     complexity: None,
+                                    datapoints: None,
                                 },
                             ),
                         ]
@@ -449,6 +512,7 @@ mod tests {
                                     complexity: None,
                                 }],
                                 complexity: None,
+                                datapoints: None,
                             },
                         )]
                         .into_iter()
@@ -1083,4 +1147,42 @@ mod tests {
             ])
         );
     }
+
+    #[test]
+    fn python_getters_use_coverage_chars() {
+        let analysis = FileChangesAnalysis {
+            base_name: "a.py".to_string(),
+            head_name: "a.py".to_string(),
+            file_was_added_by_diff: false,
+            file_was_removed_by_diff: false,
+            base_coverage: None,
+            head_coverage: None,
+            removed_diff_coverage: None,
+            added_diff_coverage: Some(vec![
+                (3, cov::Coverage::Hit),
+                (4, cov::Coverage::Partial(GenericFraction::new(1, 2))),
+            ]),
+            unexpected_line_changes: vec![
+                (
+                    (1, Some(cov::Coverage::Miss)),
+                    (1, Some(cov::Coverage::Hit)),
+                ),
+                ((5, None), (7, Some(cov::Coverage::Ignore))),
+            ],
+            lines_only_on_base: vec![],
+            lines_only_on_head: vec![3, 4],
+        };
+        assert_eq!(analysis.get_removed_diff_coverage(), None);
+        assert_eq!(
+            analysis.get_added_diff_coverage(),
+            Some(vec![(3, "h".to_string()), (4, "p".to_string())])
+        );
+        assert_eq!(
+            analysis.get_unexpected_line_changes(),
+            vec![
+                ((1, Some("m".to_string())), (1, Some("h".to_string()))),
+                ((5, None), (7, Some("i".to_string()))),
+            ]
+        );
+    }
 }
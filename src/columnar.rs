@@ -0,0 +1,251 @@
+use std::convert::TryInto;
+
+use fraction::GenericFraction;
+
+use crate::cov;
+use crate::line;
+use crate::parser;
+use crate::parser::ParsingError;
+
+// Mirrors shared/reports/columnar.py
+pub const COLUMNAR_CHUNK_PREFIX: &str = "#columnar:v1:";
+
+const COVERAGE_INT: u8 = 1;
+const COVERAGE_BRANCH: u8 = 2;
+const COVERAGE_TRUE: u8 = 3;
+const FALLBACK: u8 = 255;
+
+const COMPLEXITY_SINGLE: u8 = 1;
+const COMPLEXITY_TOTAL: u8 = 2;
+
+struct ColumnReader<'a> {
+    data: &'a [u8],
+    offset: usize,
+}
+
+impl<'a> ColumnReader<'a> {
+    fn take(&mut self, size: usize) -> Result<&'a [u8], ParsingError> {
+        let end = self
+            .offset
+            .checked_add(size)
+            .ok_or(ParsingError::UnexpectedValue)?;
+        if end > self.data.len() {
+            return Err(ParsingError::UnexpectedValue);
+        }
+        let res = &self.data[self.offset..end];
+        self.offset = end;
+        return Ok(res);
+    }
+
+    fn read_u8s(&mut self, count: usize) -> Result<Vec<u8>, ParsingError> {
+        Ok(self.take(count)?.to_vec())
+    }
+
+    fn read_u32s(&mut self, count: usize) -> Result<Vec<u32>, ParsingError> {
+        Ok(self
+            .take(count * 4)?
+            .chunks_exact(4)
+            .map(|c| u32::from_le_bytes(c.try_into().unwrap()))
+            .collect())
+    }
+
+    fn read_i32s(&mut self, count: usize) -> Result<Vec<i32>, ParsingError> {
+        Ok(self
+            .take(count * 4)?
+            .chunks_exact(4)
+            .map(|c| i32::from_le_bytes(c.try_into().unwrap()))
+            .collect())
+    }
+
+    fn read_i64s(&mut self, count: usize) -> Result<Vec<i64>, ParsingError> {
+        Ok(self
+            .take(count * 8)?
+            .chunks_exact(8)
+            .map(|c| i64::from_le_bytes(c.try_into().unwrap()))
+            .collect())
+    }
+
+    fn remaining(&self) -> &'a [u8] {
+        &self.data[self.offset..]
+    }
+}
+
+fn unpack_coverage(kind: u8, value: i64, total: i32) -> Result<cov::Coverage, ParsingError> {
+    match kind {
+        COVERAGE_INT => {
+            if value > 0 {
+                Ok(cov::Coverage::Hit)
+            } else if value == -1 {
+                Ok(cov::Coverage::Ignore)
+            } else {
+                Ok(cov::Coverage::Miss)
+            }
+        }
+        COVERAGE_BRANCH => {
+            let num = value as i32;
+            if num == total {
+                return Ok(cov::Coverage::Hit);
+            }
+            if num == 0 {
+                return Ok(cov::Coverage::Miss);
+            }
+            Ok(cov::Coverage::Partial(GenericFraction::new(num, total)))
+        }
+        COVERAGE_TRUE => Ok(cov::Coverage::Partial(GenericFraction::new(1, 2))),
+        0 => Ok(cov::Coverage::Ignore),
+        _ => Err(ParsingError::UnexpectedValue),
+    }
+}
+
+fn unpack_complexity(
+    kind: u8,
+    value: i32,
+    total: i32,
+) -> Result<Option<line::Complexity>, ParsingError> {
+    match kind {
+        COMPLEXITY_SINGLE => Ok(Some(line::Complexity::SingleComplexity(value))),
+        COMPLEXITY_TOTAL => Ok(Some(line::Complexity::TotalComplexity((value, total)))),
+        0 => Ok(None),
+        _ => Err(ParsingError::UnexpectedValue),
+    }
+}
+
+fn unpack_coverage_type(code: u8) -> Result<line::CoverageType, ParsingError> {
+    match code {
+        0 => Ok(line::CoverageType::Standard),
+        1 => Ok(line::CoverageType::Branch),
+        2 => Ok(line::CoverageType::Method),
+        _ => Err(ParsingError::UnexpectedValue),
+    }
+}
+
+pub fn decode_lines(encoded: &str) -> Result<Vec<(i32, line::ReportLine)>, ParsingError> {
+    let payload = base64::decode(&encoded[COLUMNAR_CHUNK_PREFIX.len()..])
+        .map_err(|_| ParsingError::UnexpectedValue)?;
+    let mut reader = ColumnReader {
+        data: &payload,
+        offset: 0,
+    };
+    let header = reader.read_u32s(3)?;
+    let (n_lines, n_sessions, n_fallback) =
+        (header[0] as usize, header[1] as usize, header[2] as usize);
+    let line_numbers = reader.read_u32s(n_lines)?;
+    let coverage_kind = reader.read_u8s(n_lines)?;
+    let coverage_value = reader.read_i64s(n_lines)?;
+    let coverage_total = reader.read_i32s(n_lines)?;
+    let line_type = reader.read_u8s(n_lines)?;
+    let complexity_kind = reader.read_u8s(n_lines)?;
+    let complexity = reader.read_i32s(n_lines)?;
+    let complexity_total = reader.read_i32s(n_lines)?;
+    let session_counts = reader.read_u32s(n_lines)?;
+    let session_id = reader.read_i32s(n_sessions)?;
+    let session_coverage_kind = reader.read_u8s(n_sessions)?;
+    let session_coverage_value = reader.read_i64s(n_sessions)?;
+    let session_coverage_total = reader.read_i32s(n_sessions)?;
+    let session_complexity_kind = reader.read_u8s(n_sessions)?;
+    let session_complexity = reader.read_i32s(n_sessions)?;
+    let session_complexity_total = reader.read_i32s(n_sessions)?;
+    let fallback: Vec<String> = if n_fallback > 0 {
+        serde_json::from_slice(reader.remaining()).map_err(|_| ParsingError::UnexpectedValue)?
+    } else {
+        Vec::new()
+    };
+    if fallback.len() != n_fallback {
+        return Err(ParsingError::UnexpectedValue);
+    }
+    let mut res: Vec<(i32, line::ReportLine)> = Vec::with_capacity(n_lines);
+    let mut session_index: usize = 0;
+    let mut fallback_index: usize = 0;
+    for i in 0..n_lines {
+        let line_number = line_numbers[i] as i32;
+        if coverage_kind[i] == FALLBACK {
+            match parser::parse_line(&fallback[fallback_index])? {
+                parser::LineType::Content(report_line) => res.push((line_number, report_line)),
+                _ => return Err(ParsingError::UnexpectedValue),
+            }
+            fallback_index += 1;
+            continue;
+        }
+        let session_end = session_index + session_counts[i] as usize;
+        if session_end > n_sessions {
+            return Err(ParsingError::UnexpectedValue);
+        }
+        let mut sessions: Vec<line::LineSession> = Vec::with_capacity(session_end - session_index);
+        for j in session_index..session_end {
+            sessions.push(line::LineSession {
+                id: session_id[j],
+                coverage: unpack_coverage(
+                    session_coverage_kind[j],
+                    session_coverage_value[j],
+                    session_coverage_total[j],
+                )?,
+                complexity: unpack_complexity(
+                    session_complexity_kind[j],
+                    session_complexity[j],
+                    session_complexity_total[j],
+                )?,
+            });
+        }
+        session_index = session_end;
+        res.push((
+            line_number,
+            line::ReportLine {
+                coverage: unpack_coverage(coverage_kind[i], coverage_value[i], coverage_total[i])?,
+                coverage_type: unpack_coverage_type(line_type[i])?,
+                sessions: sessions,
+                complexity: unpack_complexity(
+                    complexity_kind[i],
+                    complexity[i],
+                    complexity_total[i],
+                )?,
+                datapoints: None,
+            },
+        ));
+    }
+    return Ok(res);
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    // Generated with shared.reports.columnar.encode_columnar_lines
+    const ENCODED: &str = "#columnar:v1:BAAAAAQAAAABAAAAAQAAAAMAAAAEAAAABQAAAAECAf8BAAAAAAAAAAEAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAACAAAAAAAAAAAAAAAAAQIAAAACAAAAAAAAAAAAAgAAAAAAAAAAAAAAAAAAAAMAAAAAAAAAAQAAAAIAAAABAAAAAAAAAAAAAAAAAAAAAQAAAAEAAAABAgIBAQAAAAAAAAABAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAgAAAAIAAAAAAAAAAAAAAgAAAAAAAAAAAAAAAAIAAAAAAAAAAAAAAAAAAAADAAAAWyJbMSwgbnVsbCwgW1swLCAxXV0sIG51bGwsIG51bGwsIFtbMCwgMSwgbnVsbCwgW1wibGFiXCJdXV1dIl0=";
+
+    #[test]
+    fn decodes_columnar_lines() {
+        let res = decode_lines(ENCODED).expect("Unable to decode lines");
+        assert_eq!(res.len(), 4);
+        let line_numbers: Vec<i32> = res.iter().map(|(n, _)| *n).collect();
+        assert_eq!(line_numbers, vec![1, 3, 4, 5]);
+        let (_, first) = &res[0];
+        assert_eq!(first.coverage, cov::Coverage::Hit);
+        assert_eq!(first.coverage_type, line::CoverageType::Standard);
+        assert_eq!(first.sessions.len(), 1);
+        let (_, second) = &res[1];
+        assert_eq!(
+            second.coverage,
+            cov::Coverage::Partial(GenericFraction::new(1, 2))
+        );
+        assert_eq!(second.coverage_type, line::CoverageType::Branch);
+        assert_eq!(second.sessions.len(), 2);
+        assert_eq!(second.sessions[1].id, 1);
+        assert_eq!(second.sessions[1].coverage, cov::Coverage::Miss);
+        let (_, third) = &res[2];
+        assert_eq!(third.coverage, cov::Coverage::Miss);
+        assert_eq!(third.coverage_type, line::CoverageType::Method);
+        match third.complexity {
+            Some(line::Complexity::TotalComplexity((2, 3))) => {}
+            _ => panic!("Bad complexity"),
+        }
+        // line that went through the JSON fallback
+        let (_, fourth) = &res[3];
+        assert_eq!(fourth.coverage, cov::Coverage::Hit);
+        assert_eq!(fourth.sessions.len(), 1);
+    }
+
+    #[test]
+    fn decode_rejects_truncated_payload() {
+        decode_lines("#columnar:v1:BAAAAAQAAAAB").expect_err("Payload is truncated");
+    }
+}
@@ -11,7 +11,7 @@ pub enum Coverage {
 }
 
 impl Coverage {
-    fn as_char(&self) -> char {
+    pub fn as_char(&self) -> char {
         return match self {
             Coverage::Hit => 'h',
             Coverage::Miss => 'm',
@@ -1,4 +1,5 @@
 use pyo3::prelude::*;
+use regex::Regex;
 use std::collections::HashMap;
 use std::collections::HashSet;
 
@@ -47,3 +48,262 @@ pub fn get_exclusions_from_diff(diff: Option<&Vec<DiffSegment>>) -> (HashSet<i32
         }
     }
 }
+
+/// A segment of a file in a diff: its header and its lines, as they are in the diff
+pub type ParsedSegment = (Vec<String>, Vec<String>);
+
+/// (filename, type, before, segments, added, removed) of a file in a diff, the same
+/// data `TorngitBaseAdapter.diff_to_json` gives. Deleted and binary files have no segments
+pub type ParsedFileDiff = (
+    String,
+    String,
+    Option<String>,
+    Option<Vec<ParsedSegment>>,
+    i32,
+    i32,
+);
+
+const FILE_HEADER: &str = "diff --git a/";
+
+fn parse_file_diff(content: &str, segment_header: &Regex) -> Option<ParsedFileDiff> {
+    let mut lines: Vec<&str> = content
+        .split('\n')
+        .map(|l| l.strip_suffix('\r').unwrap_or(l))
+        .collect();
+    if lines.last() == Some(&"") {
+        lines.pop();
+    }
+    let mut names = lines.first()?.splitn(2, " b/");
+    let before = names.next()?.to_string();
+    let after = names.next()?.to_string();
+    let mut diff_type = if before == "/dev/null" {
+        "new"
+    } else {
+        "modified"
+    };
+    let before = if before == after || before == "/dev/null" {
+        None
+    } else {
+        Some(before)
+    };
+    let mut segments: Vec<ParsedSegment> = Vec::new();
+    let (mut added, mut removed) = (0, 0);
+    for source in lines.iter().skip(1) {
+        if *source == "\\ No newline at end of file" || source.is_empty() {
+            continue;
+        }
+        let sol4 = source.get(..4).unwrap_or(source);
+        if sol4 == "dele" {
+            // deleted file mode 100644
+            return Some((
+                after.clone(),
+                "deleted".to_string(),
+                Some(after),
+                None,
+                0,
+                0,
+            ));
+        } else if sol4 == "Bina" {
+            return Some((after, "binary".to_string(), None, None, 0, 0));
+        } else if sol4 == "new " && !source.starts_with("new mode ") {
+            diff_type = "new";
+        } else if ["--- ", "+++ ", "inde", "diff", "old ", "new "].contains(&sol4) {
+            continue;
+        } else if sol4 == "@@ -" {
+            // ex: "@@ -31,8 +31,8 @@ blah blah blah"
+            if let Some(groups) = segment_header.captures(source) {
+                let header = (1..5)
+                    .map(|i| groups.get(i).map_or("", |m| m.as_str()).to_string())
+                    .collect();
+                segments.push((header, Vec::new()));
+            }
+        } else if let Some((_, segment_lines)) = segments.last_mut() {
+            // actual lines
+            if source.starts_with('+') {
+                added += 1;
+            } else if source.starts_with('-') {
+                removed += 1;
+            }
+            segment_lines.push(source.to_string());
+        }
+    }
+    Some((
+        after,
+        diff_type.to_string(),
+        before,
+        Some(segments),
+        added,
+        removed,
+    ))
+}
+
+/// Parses a unified diff (multiple files), the way `TorngitBaseAdapter.diff_to_json`
+/// does, except that lines found before the first segment of a file are ignored
+/// instead of going to the last segment of the previous file
+pub fn parse_unified_diff(content: &str) -> Vec<ParsedFileDiff> {
+    let segment_header = Regex::new(r"^@@ -(\d+),?(\d*) \+(\d+),?(\d*)").unwrap();
+    let mut chunks = content.split("\ndiff --git a/");
+    let mut res = Vec::new();
+    if let Some(first) = chunks.next() {
+        if let Some(file_content) = first.strip_prefix(FILE_HEADER) {
+            res.extend(parse_file_diff(file_content, &segment_header));
+        }
+    }
+    for file_content in chunks {
+        res.extend(parse_file_diff(file_content, &segment_header));
+    }
+    return res;
+}
+
+/// The input of the comparison for the files of `parse_unified_diff`, the same as
+/// `shared.ribs.rustify_diff` gives
+pub fn to_diff_input(files: &Vec<ParsedFileDiff>) -> DiffInput {
+    files
+        .iter()
+        .map(|(filename, diff_type, before, segments, _, _)| {
+            let segments = match segments {
+                Some(s) => s
+                    .iter()
+                    .map(|(header, lines)| {
+                        let h: Vec<i32> = header.iter().map(|x| x.parse().unwrap_or(0)).collect();
+                        (
+                            (h[0], h[1], h[2], h[3]),
+                            lines
+                                .iter()
+                                .map(|l| l.get(..1).unwrap_or(" ").to_string())
+                                .collect(),
+                        )
+                    })
+                    .collect(),
+                None => Vec::new(),
+            };
+            (
+                filename.clone(),
+                (diff_type.clone(), before.clone(), segments),
+            )
+        })
+        .collect()
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn parse_unified_diff_works() {
+        let content = "diff --git a/a.py b/a.py\r
+index 8695aedf2b..e0d2b1e89d 100644\r
+--- a/a.py\r
++++ b/a.py\r
+@@ -2,3 +2,4 @@ def f():\r
+ first line\r
+-before\r
++after\r
++more\r
+\\ No newline at end of file\r
+@@ -20 +21,0 @@\r
+-gone\r
+diff --git a/old.py b/new.py
+similarity index 90%
+rename from old.py
+rename to new.py
+@@ -1 +1 @@
+-a
++b
+diff --git a/removed.py b/removed.py
+deleted file mode 100644
+--- a/removed.py
++++ /dev/null
+@@ -1 +0,0 @@
+-removed
+diff --git a/added.py b/added.py
+new file mode 100644
+--- /dev/null
++++ b/added.py
+@@ -0,0 +1 @@
++added
+diff --git a/image.png b/image.png
+Binary files a/image.png and b/image.png differ
+";
+        let files = parse_unified_diff(content);
+        assert_eq!(files.len(), 5);
+        assert_eq!(
+            files[0],
+            (
+                "a.py".to_string(),
+                "modified".to_string(),
+                None,
+                Some(vec![
+                    (
+                        vec!["2", "3", "2", "4"]
+                            .into_iter()
+                            .map(|x| x.to_string())
+                            .collect(),
+                        vec![" first line", "-before", "+after", "+more"]
+                            .into_iter()
+                            .map(|x| x.to_string())
+                            .collect()
+                    ),
+                    (
+                        vec!["20", "", "21", "0"]
+                            .into_iter()
+                            .map(|x| x.to_string())
+                            .collect(),
+                        vec!["-gone".to_string()]
+                    )
+                ]),
+                2,
+                2
+            )
+        );
+        assert_eq!(files[1].0, "new.py");
+        assert_eq!(files[1].2, Some("old.py".to_string()));
+        assert_eq!(files[1].3.as_ref().unwrap()[0].1, vec!["-a", "+b"]);
+        assert_eq!(
+            files[2],
+            (
+                "removed.py".to_string(),
+                "deleted".to_string(),
+                Some("removed.py".to_string()),
+                None,
+                0,
+                0
+            )
+        );
+        assert_eq!((files[3].1.as_str(), &files[3].2), ("new", &None));
+        assert_eq!(
+            files[4],
+            (
+                "image.png".to_string(),
+                "binary".to_string(),
+                None,
+                None,
+                0,
+                0
+            )
+        );
+        let diff_input = to_diff_input(&files);
+        assert_eq!(
+            diff_input["a.py"].2,
+            vec![
+                (
+                    (2, 3, 2, 4),
+                    vec![" ", "-", "+", "+"]
+                        .into_iter()
+                        .map(|x| x.to_string())
+                        .collect()
+                ),
+                ((20, 0, 21, 0), vec!["-".to_string()])
+            ]
+        );
+        assert_eq!(
+            diff_input["removed.py"],
+            (
+                "deleted".to_string(),
+                Some("removed.py".to_string()),
+                vec![]
+            )
+        );
+        assert!(parse_unified_diff("not a diff").is_empty());
+    }
+}
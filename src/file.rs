@@ -1,6 +1,7 @@
 use pyo3::prelude::*;
 use serde::Serialize;
 use std::collections::HashMap;
+use std::collections::HashSet;
 
 use crate::cov;
 use crate::line;
@@ -17,7 +18,9 @@ pub struct FileTotals {
     #[pyo3(get)]
     pub branches: i32,
     pub sessions: i32,
+    #[pyo3(get)]
     pub complexity: i32,
+    #[pyo3(get)]
     pub complexity_total: i32,
     #[pyo3(get)]
     pub methods: i32,
@@ -93,10 +96,43 @@ impl FileTotals {
     }
 }
 
+#[pyclass]
+#[derive(Clone)]
 pub struct ReportFile {
     pub lines: HashMap<i32, line::ReportLine>,
 }
 
+/// Line coverages are given the way they get serialized to JSON ("h", "m", "p" or "i")
+#[pymethods]
+impl ReportFile {
+    #[getter(eof)]
+    fn eof(&self) -> i32 {
+        self.get_eof()
+    }
+
+    #[getter(totals)]
+    fn totals(&self) -> FileTotals {
+        self.get_totals()
+    }
+
+    /// (line_number, coverage) of every line with coverage, sorted by line number
+    fn get_lines(&self) -> Vec<(i32, String)> {
+        let mut res: Vec<(i32, String)> = self
+            .lines
+            .iter()
+            .map(|(line_number, line)| (*line_number, line.coverage.as_char().to_string()))
+            .collect();
+        res.sort_by_key(|x| x.0);
+        return res;
+    }
+
+    fn get_line_coverage(&self, line_number: i32) -> Option<String> {
+        self.lines
+            .get(&line_number)
+            .map(|line| line.coverage.as_char().to_string())
+    }
+}
+
 impl ReportFile {
     pub fn get_eof(&self) -> i32 {
         return match self.lines.keys().max() {
@@ -114,6 +150,15 @@ impl ReportFile {
         return FileTotals::from_lines(all_lines.iter().collect());
     }
 
+    pub fn get_label_filtered_totals(&self, labels: &HashSet<String>) -> FileTotals {
+        let all_lines: Vec<line::ReportLine> = self
+            .lines
+            .values()
+            .filter_map(|x| x.filter_by_labels(labels))
+            .collect();
+        return FileTotals::from_lines(all_lines.iter().collect());
+    }
+
     pub fn calculate_per_flag_totals(
         &self,
         flag_mapping: &HashMap<i32, Vec<String>>,
@@ -172,6 +217,7 @@ mod tests {
                     complexity: None,
                 }],
                 complexity: None,
+                datapoints: None,
             },
         )
     }
@@ -211,24 +257,28 @@ mod tests {
                 coverage_type: line::CoverageType::Standard,
                 sessions: vec![],
                 complexity: None,
+                datapoints: None,
             },
             &line::ReportLine {
                 coverage: cov::Coverage::Miss,
                 coverage_type: line::CoverageType::Branch,
                 sessions: vec![],
                 complexity: None,
+                datapoints: None,
             },
             &line::ReportLine {
                 coverage: cov::Coverage::Partial(GenericFraction::new(3, 10)),
                 coverage_type: line::CoverageType::Standard,
                 sessions: vec![],
                 complexity: None,
+                datapoints: None,
             },
             &line::ReportLine {
                 coverage: cov::Coverage::Ignore,
                 coverage_type: line::CoverageType::Standard,
                 sessions: vec![],
                 complexity: None,
+                datapoints: None,
             },
         ]);
         assert_eq!(expected_result, result);
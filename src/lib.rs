@@ -1,3 +1,4 @@
+use pyo3::buffer::PyBuffer;
 use pyo3::exceptions::PyException;
 use pyo3::prelude::*;
 use pyo3::wrap_pyfunction;
@@ -9,51 +10,145 @@ static ALLOC: jemallocator::Jemalloc = jemallocator::Jemalloc;
 
 mod analyzers;
 mod changes;
+mod columnar;
 mod cov;
 mod diff;
 mod file;
 mod line;
+mod matching;
+mod merge;
 mod parser;
 mod profiling;
 mod report;
 
+/// Parses the report without holding the GIL, python strings are immutable so
+/// `chunks` can't change while other threads run
 #[pyfunction]
 fn parse_report(
+    py: Python,
     filenames: HashMap<String, i32>,
     chunks: &str,
     session_mapping: HashMap<i32, Vec<String>>,
 ) -> PyResult<report::Report> {
-    let res = parser::parse_report_from_str(filenames, chunks, session_mapping);
+    let res =
+        py.allow_threads(|| parser::parse_report_from_str(filenames, chunks, session_mapping));
     match res {
         Ok(val) => return Ok(val),
         Err(_) => return Err(PyException::new_err("Unable to parse rust report")),
     }
 }
 
+/// Same as `parse_report`, but reads the chunks from any object exposing the buffer
+/// protocol (bytes, mmap, ...) without copying them into a `str` first
+///
+/// Writable buffers (bytearray, ...) are copied, since other threads could change
+/// them once the GIL is released
+#[pyfunction]
+fn parse_report_from_buffer(
+    py: Python,
+    filenames: HashMap<String, i32>,
+    chunks: &PyAny,
+    session_mapping: HashMap<i32, Vec<String>>,
+) -> PyResult<report::Report> {
+    let buffer = PyBuffer::<u8>::get(chunks)?;
+    if !buffer.is_c_contiguous() {
+        return Err(PyException::new_err("Report buffer is not contiguous"));
+    }
+    // `buffer` keeps the exporting object alive (and its memory in place) until
+    // it is dropped at the end of this function
+    let bytes: &[u8] =
+        unsafe { std::slice::from_raw_parts(buffer.buf_ptr() as *const u8, buffer.len_bytes()) };
+    let owned_bytes: Vec<u8>;
+    let bytes = if buffer.readonly() {
+        bytes
+    } else {
+        owned_bytes = bytes.to_vec();
+        &owned_bytes
+    };
+    let res = py.allow_threads(|| match std::str::from_utf8(bytes) {
+        Ok(chunks) => parser::parse_report_from_str(filenames, chunks, session_mapping)
+            .map_err(|_| "Unable to parse rust report"),
+        Err(_) => Err("Report buffer is not valid utf-8"),
+    });
+    match res {
+        Ok(val) => return Ok(val),
+        Err(message) => return Err(PyException::new_err(message)),
+    }
+}
+
+/// Merges the lines of two files, the same way `shared.utils.merge.merge_line` does
+///
+/// Lines are encoded the way they are in the report chunks (`None` for empty ones).
+/// Returns the merged lines and the indexes of the lines that couldn't be merged here
+#[pyfunction]
+fn merge_report_lines(
+    lines: Vec<Option<String>>,
+    other_lines: Vec<Option<String>>,
+    joined: bool,
+) -> (Vec<Option<String>>, Vec<usize>) {
+    merge::merge_line_lists(&lines, &other_lines, joined)
+}
+
 #[pyfunction]
 fn run_comparison_as_json(
+    py: Python,
     base_report: &report::Report,
     head_report: &report::Report,
     diff: diff::DiffInput,
 ) -> PyResult<String> {
-    return match serde_json::to_string(&changes::run_comparison_analysis(
-        base_report,
-        head_report,
-        &diff,
-    )) {
+    let res = py.allow_threads(|| {
+        serde_json::to_string(&changes::run_comparison_analysis(
+            base_report,
+            head_report,
+            &diff,
+        ))
+    });
+    return match res {
         Ok(value) => Ok(value),
         Err(_) => Err(PyException::new_err("Error serializing changes")),
     };
 }
 
+/// Same as `run_comparison_as_json`, but hands the results over as python objects
+#[pyfunction]
+fn compare_reports(
+    py: Python,
+    base_report: &report::Report,
+    head_report: &report::Report,
+    diff: diff::DiffInput,
+) -> changes::ChangeAnalysis {
+    py.allow_threads(|| changes::run_comparison_analysis(base_report, head_report, &diff))
+}
+
+/// Parses a unified diff like `TorngitBaseAdapter.diff_to_json` does
+///
+/// Returns the files of the diff as (filename, type, before, segments, added, removed)
+/// and the diff input of `run_comparison_as_json` / `compare_reports` for them
+#[pyfunction]
+fn parse_unified_diff(py: Python, data: &[u8]) -> (Vec<diff::ParsedFileDiff>, diff::DiffInput) {
+    py.allow_threads(|| {
+        let content = String::from_utf8_lossy(data);
+        let files = diff::parse_unified_diff(&content);
+        let diff_input = diff::to_diff_input(&files);
+        (files, diff_input)
+    })
+}
+
 /// A Python module implemented in Rust.
 #[pymodule]
 fn rustyribs(_py: Python, m: &PyModule) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(parse_report, m)?)?;
+    m.add_function(wrap_pyfunction!(parse_report_from_buffer, m)?)?;
+    m.add_function(wrap_pyfunction!(merge_report_lines, m)?)?;
     m.add_function(wrap_pyfunction!(run_comparison_as_json, m)?)?;
+    m.add_function(wrap_pyfunction!(compare_reports, m)?)?;
+    m.add_function(wrap_pyfunction!(parse_unified_diff, m)?)?;
     m.add_class::<analyzers::filter::FilterAnalyzer>()?;
     m.add_class::<analyzers::simple::SimpleAnalyzer>()?;
     m.add_class::<profiling::ProfilingData>()?;
+    m.add_class::<changes::ChangeAnalysis>()?;
+    m.add_class::<changes::FileChangesAnalysis>()?;
+    m.add_class::<file::ReportFile>()?;
 
     Ok(())
 }
@@ -1,3 +1,5 @@
+use std::collections::HashSet;
+
 use crate::cov;
 
 #[derive(Debug, Clone, PartialEq)]
@@ -20,12 +22,21 @@ pub struct LineSession {
     pub complexity: Option<Complexity>,
 }
 
+#[derive(Debug, Clone)]
+pub struct CoverageDatapoint {
+    pub session_id: i32,
+    pub coverage: cov::Coverage,
+    pub coverage_type: Option<CoverageType>,
+    pub labels: Vec<String>,
+}
+
 #[derive(Debug, Clone)]
 pub struct ReportLine {
     pub coverage: cov::Coverage,
     pub coverage_type: CoverageType,
     pub sessions: Vec<LineSession>,
     pub complexity: Option<Complexity>,
+    pub datapoints: Option<Vec<CoverageDatapoint>>,
 }
 
 impl ReportLine {
@@ -48,9 +59,58 @@ impl ReportLine {
             coverage_type: self.coverage_type.clone(),
             complexity: self.calculate_sessions_complexity(&valid_sessions),
             sessions: valid_sessions,
+            datapoints: self.datapoints.as_ref().map(|datapoints| {
+                datapoints
+                    .iter()
+                    .filter(|k| session_ids.contains(&k.session_id))
+                    .map(|x| x.clone())
+                    .collect()
+            }),
+        })
+    }
+
+    /// Keeps only what the datapoints carrying any of `labels` covered
+    ///
+    /// The coverage of the line comes from those datapoints, and only the sessions
+    /// they belong to are kept. Lines without matching datapoints are dropped
+    pub fn filter_by_labels(&self, labels: &HashSet<String>) -> Option<ReportLine> {
+        let valid_datapoints: Vec<CoverageDatapoint> = self
+            .datapoints
+            .as_ref()?
+            .iter()
+            .filter(|k| k.labels.iter().any(|label| labels.contains(label)))
+            .map(|x| x.clone())
+            .collect();
+        if valid_datapoints.is_empty() {
+            return None;
+        }
+        let coverage =
+            cov::Coverage::join_coverages(valid_datapoints.iter().map(|k| &k.coverage).collect());
+        if let cov::Coverage::Ignore = coverage {
+            return None;
+        }
+        let valid_sessions: Vec<LineSession> = self
+            .sessions
+            .iter()
+            .filter(|k| valid_datapoints.iter().any(|d| d.session_id == k.id))
+            .map(|x| x.clone())
+            .collect();
+        Some(ReportLine {
+            coverage: coverage,
+            coverage_type: self.coverage_type.clone(),
+            complexity: self.calculate_sessions_complexity(&valid_sessions),
+            sessions: valid_sessions,
+            datapoints: Some(valid_datapoints),
         })
     }
 
+    pub fn get_labels(&self) -> Vec<&String> {
+        match &self.datapoints {
+            Some(datapoints) => datapoints.iter().flat_map(|k| k.labels.iter()).collect(),
+            None => Vec::new(),
+        }
+    }
+
     pub fn calculate_sessions_coverage(&self, sessions: &Vec<LineSession>) -> cov::Coverage {
         let valid_sessions: Vec<&cov::Coverage> = sessions.iter().map(|k| &k.coverage).collect();
         return cov::Coverage::join_coverages(valid_sessions);
@@ -114,6 +174,7 @@ mod tests {
                 },
             ],
             complexity: None,
+            datapoints: None,
         };
         let res_only_zero = a.filter_by_session_ids(&vec![0]).unwrap();
         assert_eq!(res_only_zero.coverage, cov::Coverage::Miss);
@@ -159,4 +220,66 @@ mod tests {
         assert!(a.filter_by_session_ids(&vec![5]).is_none());
         assert!(a.filter_by_session_ids(&vec![1, 5]).is_none());
     }
+
+    #[test]
+    fn filter_by_labels_works() {
+        let a = ReportLine {
+            coverage: cov::Coverage::Hit,
+            coverage_type: CoverageType::Branch,
+            sessions: vec![
+                LineSession {
+                    id: 0,
+                    coverage: cov::Coverage::Hit,
+                    complexity: None,
+                },
+                LineSession {
+                    id: 1,
+                    coverage: cov::Coverage::Partial(GenericFraction::new(1, 2)),
+                    complexity: Some(Complexity::SingleComplexity(3)),
+                },
+            ],
+            complexity: None,
+            datapoints: Some(vec![
+                CoverageDatapoint {
+                    session_id: 0,
+                    coverage: cov::Coverage::Hit,
+                    coverage_type: None,
+                    labels: vec!["test_a".to_string()],
+                },
+                CoverageDatapoint {
+                    session_id: 1,
+                    coverage: cov::Coverage::Partial(GenericFraction::new(1, 2)),
+                    coverage_type: Some(CoverageType::Branch),
+                    labels: vec!["test_b".to_string(), "test_c".to_string()],
+                },
+            ]),
+        };
+        let labels =
+            |v: Vec<&str>| -> HashSet<String> { v.iter().map(|x| x.to_string()).collect() };
+        let only_b = a.filter_by_labels(&labels(vec!["test_c"])).unwrap();
+        assert_eq!(
+            only_b.coverage,
+            cov::Coverage::Partial(GenericFraction::new(1, 2))
+        );
+        assert_eq!(only_b.coverage_type, CoverageType::Branch);
+        assert_eq!(only_b.sessions.len(), 1);
+        assert_eq!(only_b.sessions[0].id, 1);
+        assert_eq!(only_b.datapoints.as_ref().unwrap().len(), 1);
+        assert!(only_b.complexity.is_some());
+        let both = a
+            .filter_by_labels(&labels(vec!["test_a", "test_b"]))
+            .unwrap();
+        assert_eq!(both.coverage, cov::Coverage::Hit);
+        assert_eq!(both.sessions.len(), 2);
+        assert!(a.filter_by_labels(&labels(vec!["test_d"])).is_none());
+        assert_eq!(a.get_labels(), vec!["test_a", "test_b", "test_c"]);
+        let only_session_zero = a.filter_by_session_ids(&vec![0]).unwrap();
+        assert_eq!(only_session_zero.datapoints.unwrap().len(), 1);
+        let mut no_datapoints = a.clone();
+        no_datapoints.datapoints = None;
+        assert!(no_datapoints
+            .filter_by_labels(&labels(vec!["test_a"]))
+            .is_none());
+        assert!(no_datapoints.get_labels().is_empty());
+    }
 }
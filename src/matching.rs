@@ -0,0 +1,140 @@
+use std::collections::HashSet;
+
+use regex::RegexSet;
+
+/// Mirrors shared/utils/match.py::match
+///
+/// Patterns are matched from the start of the path (like python's `re.match`),
+/// the ones starting with `!` or `^!` exclude the paths they match, and paths
+/// that are literally in the patterns are always included
+pub struct PathMatcher {
+    literals: HashSet<String>,
+    positives: RegexSet,
+    negatives: RegexSet,
+}
+
+fn anchored(pattern: &str) -> String {
+    format!("^(?:{})", pattern)
+}
+
+/// Whether `pattern` has a character class the regex crate reads differently than
+/// python's `re`: nested classes (like `[[:alpha:]]`) and the `&&`, `--` and `~~`
+/// class operators are set operations for the regex crate, but literal characters
+/// for python
+fn has_class_set_operations(pattern: &str) -> bool {
+    let chars: Vec<char> = pattern.chars().collect();
+    let mut in_class = false;
+    let mut i = 0;
+    while i < chars.len() {
+        let c = chars[i];
+        if c == '\\' {
+            i += 2;
+            continue;
+        }
+        if !in_class {
+            if c == '[' {
+                in_class = true;
+                i += 1;
+                // a `]` right after `[` or `[^` is a literal in both
+                if chars.get(i) == Some(&'^') {
+                    i += 1;
+                }
+                if chars.get(i) == Some(&']') {
+                    i += 1;
+                }
+                continue;
+            }
+        } else if c == '[' {
+            return true;
+        } else if c == ']' {
+            in_class = false;
+        } else if (c == '&' || c == '-' || c == '~') && chars.get(i + 1) == Some(&c) {
+            return true;
+        }
+        i += 1;
+    }
+    false
+}
+
+impl PathMatcher {
+    pub fn new(patterns: &Vec<String>) -> Result<PathMatcher, regex::Error> {
+        let mut positives: Vec<String> = Vec::new();
+        let mut negatives: Vec<String> = Vec::new();
+        for pattern in patterns.iter().filter(|p| !p.is_empty()) {
+            if has_class_set_operations(pattern) {
+                return Err(regex::Error::Syntax(format!(
+                    "{}: character class reads differently in python",
+                    pattern
+                )));
+            }
+            if pattern.starts_with("!") || pattern.starts_with("^!") {
+                negatives.push(anchored(&pattern.replace("!", "")));
+            } else {
+                positives.push(anchored(pattern));
+            }
+        }
+        Ok(PathMatcher {
+            literals: patterns.iter().map(|p| p.to_string()).collect(),
+            positives: RegexSet::new(positives)?,
+            negatives: RegexSet::new(negatives)?,
+        })
+    }
+
+    pub fn matches(&self, path: &str) -> bool {
+        if self.literals.contains(path) {
+            return true;
+        }
+        if self.negatives.is_match(path) {
+            return false;
+        }
+        return self.positives.len() == 0 || self.positives.is_match(path);
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn matcher(patterns: Vec<&str>) -> PathMatcher {
+        PathMatcher::new(&patterns.iter().map(|x| x.to_string()).collect())
+            .expect("Invalid patterns")
+    }
+
+    #[test]
+    fn matches_like_python() {
+        let m = matcher(vec!["src/.*", "!src/vendor/.*", "^!.*_test\\.go", ""]);
+        assert!(m.matches("src/file.py"));
+        assert!(!m.matches("src/vendor/file.py"));
+        assert!(!m.matches("src/file_test.go"));
+        assert!(!m.matches("tests/src/file.py"));
+        let negatives_only = matcher(vec!["!tests/"]);
+        assert!(negatives_only.matches("src/file.py"));
+        assert!(!negatives_only.matches("tests/file.py"));
+        // matched from the start only, like re.match
+        assert!(matcher(vec!["file"]).matches("file.py"));
+        assert!(!matcher(vec!["file"]).matches("src/file.py"));
+        assert!(matcher(vec![]).matches("src/file.py"));
+        // literal paths are always in
+        assert!(matcher(vec!["!src/.*", "src/a.py"]).matches("src/a.py"));
+    }
+
+    #[test]
+    fn rejects_unsupported_patterns() {
+        assert!(PathMatcher::new(&vec!["(?!tests)".to_string()]).is_err());
+        for pattern in vec![
+            "[[:alpha:]]+",
+            "!src/[a[bc]]",
+            "[a-z&&[^x]]",
+            "[a-z--x]",
+            "[a~~b]",
+        ] {
+            assert!(
+                PathMatcher::new(&vec![pattern.to_string()]).is_err(),
+                "{}",
+                pattern
+            );
+        }
+        // the same in both
+        matcher(vec!["[]a-]", "[^]&]", "a&&b--c", "\\[[a\\[]", "[-a]-[~]~"]);
+    }
+}
@@ -0,0 +1,732 @@
+// Port of the line merging in shared/utils/merge.py (merge_line and friends)
+//
+// Lines come in and go out with the same JSON encoding the report chunks use.
+// Only the shapes of lines whose merge we can reproduce exactly are handled here.
+// Anything else (partials, floats, datapoints, ...) makes the merge return
+// `Unsupported`, so the caller falls back to the python implementation.
+use rayon::prelude::*;
+use serde_json::{Number, Value};
+use std::collections::HashSet;
+
+#[derive(Debug, PartialEq)]
+pub struct Unsupported;
+
+#[derive(Clone, Debug, PartialEq)]
+enum Coverage {
+    Null,
+    True,
+    Int(i64),
+    // "hits/total"
+    Branch(i64, i64),
+}
+
+// What `branches_missing` is in merge_coverage: only whether it is a list (and how
+// long it is) matters there
+#[derive(Clone, Copy, Debug, PartialEq)]
+enum MissingBranches {
+    NotList,
+    List(usize),
+}
+
+#[derive(Clone, Debug)]
+struct Session {
+    id: i64,
+    coverage: Coverage,
+    branches: Option<Vec<Value>>,
+    partials: Option<Value>,
+    complexity: Option<Value>,
+}
+
+#[derive(Debug)]
+struct Line {
+    coverage: Coverage,
+    coverage_type: Value,
+    sessions: Vec<Session>,
+    complexity: Value,
+}
+
+fn parse_canonical_number(value: &str) -> Result<i64, Unsupported> {
+    if value.is_empty()
+        || !value.bytes().all(|c| c.is_ascii_digit())
+        || (value.len() > 1 && value.starts_with('0'))
+    {
+        return Err(Unsupported);
+    }
+    value.parse::<i64>().map_err(|_| Unsupported)
+}
+
+fn parse_coverage(value: &Value) -> Result<Coverage, Unsupported> {
+    match value {
+        Value::Null => Ok(Coverage::Null),
+        Value::Bool(true) => Ok(Coverage::True),
+        Value::Number(n) => n.as_i64().map(Coverage::Int).ok_or(Unsupported),
+        Value::String(s) => {
+            let mut parts = s.splitn(2, '/');
+            let hits = parts.next().ok_or(Unsupported)?;
+            let total = parts.next().ok_or(Unsupported)?;
+            Ok(Coverage::Branch(
+                parse_canonical_number(hits)?,
+                parse_canonical_number(total)?,
+            ))
+        }
+        _ => Err(Unsupported),
+    }
+}
+
+fn coverage_to_value(coverage: &Coverage) -> Value {
+    match coverage {
+        Coverage::Null => Value::Null,
+        Coverage::True => Value::Bool(true),
+        Coverage::Int(n) => Value::Number(Number::from(*n)),
+        Coverage::Branch(hits, total) => Value::String(format!("{}/{}", hits, total)),
+    }
+}
+
+// line_type, only telling apart hits (0) from everything else
+fn is_hit(coverage: &Coverage) -> bool {
+    match coverage {
+        Coverage::Int(n) => *n != 0 && *n != -1,
+        Coverage::Branch(hits, total) => hits == total,
+        _ => false,
+    }
+}
+
+fn merge_branch(b1: Coverage, b2: Coverage) -> Result<Coverage, Unsupported> {
+    if b1 == b2 {
+        return Ok(b1);
+    }
+    if let Coverage::Int(n) = b1 {
+        if n > 0 {
+            return Ok(b1);
+        }
+    }
+    if let Coverage::Int(n) = b2 {
+        if n > 0 {
+            return Ok(b2);
+        }
+    }
+    if b1 == Coverage::Int(0) || b1 == Coverage::Null || b1 == Coverage::True {
+        return Ok(b2);
+    }
+    if b2 == Coverage::Int(0) || b2 == Coverage::Null || b2 == Coverage::True {
+        return Ok(b1);
+    }
+    match (&b1, &b2) {
+        (Coverage::Branch(h1, t1), Coverage::Branch(h2, t2)) => {
+            if h1 == t1 {
+                return Ok(b1.clone());
+            }
+            if h2 == t2 {
+                return Ok(b2.clone());
+            }
+            Ok(Coverage::Branch(*h1.max(h2), *t1.max(t2)))
+        }
+        // python would fail splitting a number
+        _ => Err(Unsupported),
+    }
+}
+
+fn merge_coverage(
+    l1: Coverage,
+    l2: Coverage,
+    branches_missing: MissingBranches,
+) -> Result<Coverage, Unsupported> {
+    if l1 == Coverage::Null {
+        return Ok(l2);
+    }
+    if l2 == Coverage::Null {
+        return Ok(l1);
+    }
+    if l1 == Coverage::Int(-1) || l2 == Coverage::Int(-1) {
+        return Ok(Coverage::Int(-1));
+    }
+    match (&l1, &l2) {
+        (Coverage::Int(a), Coverage::Int(b)) => Ok(if a >= b { l1.clone() } else { l2.clone() }),
+        (Coverage::Branch(_, _), _) | (_, Coverage::Branch(_, _)) => {
+            let mut l1 = l1.clone();
+            let mut branches_missing = branches_missing;
+            if let Coverage::Int(a) = l1 {
+                branches_missing = if a != 0 {
+                    MissingBranches::List(0)
+                } else {
+                    MissingBranches::NotList
+                };
+                l1 = l2.clone();
+            } else if let Coverage::Int(b) = l2 {
+                branches_missing = if b != 0 {
+                    MissingBranches::List(0)
+                } else {
+                    MissingBranches::NotList
+                };
+            }
+            match (branches_missing, &l1) {
+                (MissingBranches::List(0), Coverage::Branch(_, total)) => {
+                    Ok(Coverage::Branch(*total, *total))
+                }
+                (MissingBranches::List(missing), Coverage::Branch(_, total)) => {
+                    let found = total - missing as i64;
+                    Ok(Coverage::Branch(if found > 0 { found } else { 0 }, *total))
+                }
+                (MissingBranches::NotList, _) => merge_branch(l1, l2.clone()),
+                // python would fail splitting `True`
+                _ => Err(Unsupported),
+            }
+        }
+        // (l2 or l1) if l1 is a bool else (l1 or l2)
+        (Coverage::True, Coverage::Int(0)) => Ok(l1.clone()),
+        (Coverage::True, _) => Ok(l2.clone()),
+        (Coverage::Int(0), _) => Ok(l2.clone()),
+        _ => Ok(l1.clone()),
+    }
+}
+
+fn branches_key(value: &Value) -> Result<String, Unsupported> {
+    match value {
+        Value::String(_) => Ok(value.to_string()),
+        Value::Number(n) if n.is_i64() || n.is_u64() => Ok(value.to_string()),
+        _ => Err(Unsupported),
+    }
+}
+
+fn branches_intersection(b1: &Vec<Value>, b2: &Vec<Value>) -> Result<Vec<Value>, Unsupported> {
+    let keys: HashSet<String> = b2.iter().map(branches_key).collect::<Result<_, _>>()?;
+    let mut seen: HashSet<String> = HashSet::new();
+    let mut res: Vec<Value> = Vec::new();
+    for value in b1.iter() {
+        let key = branches_key(value)?;
+        if keys.contains(&key) && seen.insert(key) {
+            res.push(value.clone());
+        }
+    }
+    if res.len() > 1 {
+        // python builds this from a set, so we can't know the order it would have
+        return Err(Unsupported);
+    }
+    Ok(res)
+}
+
+fn missing_branches_of(branches: &Option<Vec<Value>>) -> MissingBranches {
+    match branches {
+        Some(values) => MissingBranches::List(values.len()),
+        None => MissingBranches::NotList,
+    }
+}
+
+fn merge_line_session(s1: &Session, s2: &Session) -> Result<Session, Unsupported> {
+    let branches = match (&s1.branches, &s2.branches) {
+        (None, None) => None,
+        (None, Some(b2)) => {
+            if is_hit(&s1.coverage) {
+                Some(Vec::new())
+            } else {
+                Some(b2.clone())
+            }
+        }
+        (Some(b1), None) => {
+            if is_hit(&s2.coverage) {
+                Some(Vec::new())
+            } else {
+                Some(b1.clone())
+            }
+        }
+        (Some(b1), Some(b2)) => Some(branches_intersection(b1, b2)?),
+    };
+    let coverage = merge_coverage(
+        s1.coverage.clone(),
+        s2.coverage.clone(),
+        missing_branches_of(&branches),
+    )?;
+    Ok(Session {
+        id: s1.id,
+        coverage: coverage,
+        branches: branches,
+        partials: None,
+        complexity: None,
+    })
+}
+
+fn merge_sessions(s1: Vec<Session>, s2: Vec<Session>) -> Result<Vec<Session>, Unsupported> {
+    if s1.is_empty() {
+        return Ok(s2);
+    }
+    if s2.is_empty() {
+        return Ok(s1);
+    }
+    let s1_ids: HashSet<i64> = s1.iter().map(|s| s.id).collect();
+    let s2_ids: HashSet<i64> = s2.iter().map(|s| s.id).collect();
+    if s1_ids.is_disjoint(&s2_ids) {
+        let mut res = s1;
+        res.extend(s2);
+        return Ok(res);
+    }
+    if s1_ids.len() != s1.len() || s2_ids.len() != s2.len() {
+        // python goes through dicts keyed by id, repeated ids there get collapsed
+        return Err(Unsupported);
+    }
+    let mut res: Vec<Session> = Vec::with_capacity(s1.len() + s2.len());
+    for session in s1.iter() {
+        match s2.iter().find(|other| other.id == session.id) {
+            Some(other) => res.push(merge_line_session(session, other)?),
+            None => res.push(session.clone()),
+        }
+    }
+    for session in s2.into_iter() {
+        if !s1_ids.contains(&session.id) {
+            res.push(session);
+        }
+    }
+    Ok(res)
+}
+
+fn merge_missed_branches(sessions: &Vec<Session>) -> Result<MissingBranches, Unsupported> {
+    if sessions.iter().all(|s| s.branches.is_none()) {
+        return Ok(MissingBranches::NotList);
+    }
+    let mut missing: Vec<&Vec<Value>> = Vec::new();
+    for session in sessions.iter() {
+        match &session.branches {
+            Some(branches) => {
+                if branches.is_empty() {
+                    return Ok(MissingBranches::List(0));
+                }
+                missing.push(branches);
+            }
+            None => {
+                if is_hit(&session.coverage) {
+                    // one of the sessions collected all the branches
+                    return Ok(MissingBranches::List(0));
+                }
+            }
+        }
+    }
+    if missing.len() == 1 {
+        return Ok(MissingBranches::List(missing[0].len()));
+    }
+    let mut common: HashSet<String> = missing[0]
+        .iter()
+        .map(branches_key)
+        .collect::<Result<_, _>>()?;
+    for branches in missing[1..].iter() {
+        let keys: HashSet<String> = branches
+            .iter()
+            .map(branches_key)
+            .collect::<Result<_, _>>()?;
+        common = common.intersection(&keys).cloned().collect();
+    }
+    Ok(MissingBranches::List(common.len()))
+}
+
+fn coverage_from_sessions(sessions: &Vec<Session>) -> Result<Coverage, Unsupported> {
+    if sessions.is_empty() {
+        return Err(Unsupported);
+    }
+    if sessions.len() == 1 {
+        return Ok(sessions[0].coverage.clone());
+    }
+    let branches_missing = merge_missed_branches(sessions)?;
+    let mut coverage = sessions[0].coverage.clone();
+    for session in sessions[1..].iter() {
+        coverage = merge_coverage(coverage, session.coverage.clone(), branches_missing)?;
+    }
+    Ok(coverage)
+}
+
+fn complexity_pair(value: &Option<Value>) -> Result<Option<(i64, i64)>, Unsupported> {
+    match value {
+        None => Ok(None),
+        Some(Value::Array(values)) if values.len() == 2 => {
+            match (values[0].as_i64(), values[1].as_i64()) {
+                (Some(a), Some(b)) => Ok(Some((a, b))),
+                _ => Err(Unsupported),
+            }
+        }
+        _ => Err(Unsupported),
+    }
+}
+
+fn complexity_from_sessions(sessions: &Vec<Session>) -> Result<Value, Unsupported> {
+    match &sessions[0].complexity {
+        None => Ok(Value::Null),
+        Some(Value::Number(_)) => {
+            let mut res: Option<i64> = None;
+            for session in sessions.iter() {
+                // `s.complexity or 0`
+                let value = match &session.complexity {
+                    None => 0,
+                    Some(v) => v.as_i64().ok_or(Unsupported)?,
+                };
+                res = Some(res.map_or(value, |current| current.max(value)));
+            }
+            Ok(Value::Number(Number::from(res.unwrap_or(0))))
+        }
+        Some(Value::Array(_)) => {
+            let mut res: Option<(i64, i64)> = None;
+            for session in sessions.iter() {
+                // `s.complexity or (0, 0)`
+                let (a, b) = match &session.complexity {
+                    Some(Value::Number(n)) if n.as_i64() == Some(0) => (0, 0),
+                    other => complexity_pair(other)?.unwrap_or((0, 0)),
+                };
+                res = Some(match res {
+                    None => (a, b),
+                    Some((hit, total)) => (hit.max(a), total.max(b)),
+                });
+            }
+            let (hit, total) = res.unwrap_or((0, 0));
+            Ok(Value::Array(vec![
+                Value::Number(Number::from(hit)),
+                Value::Number(Number::from(total)),
+            ]))
+        }
+        _ => Err(Unsupported),
+    }
+}
+
+fn optional_value(values: &Vec<Value>, index: usize) -> Option<Value> {
+    match values.get(index) {
+        None | Some(Value::Null) => None,
+        Some(v) => Some(v.clone()),
+    }
+}
+
+fn parse_session(value: &Value) -> Result<Option<Session>, Unsupported> {
+    let values = match value {
+        // falsy sessions get dropped when loading the line
+        Value::Null => return Ok(None),
+        Value::Array(values) if values.is_empty() => return Ok(None),
+        Value::Array(values) => values,
+        _ => return Err(Unsupported),
+    };
+    if values.len() < 2 || values.len() > 5 {
+        return Err(Unsupported);
+    }
+    let branches = match optional_value(values, 2) {
+        None => None,
+        Some(Value::Array(b)) => Some(b),
+        Some(_) => return Err(Unsupported),
+    };
+    let partials = optional_value(values, 3);
+    match &partials {
+        None => {}
+        Some(Value::Array(p)) if p.is_empty() => {}
+        Some(_) => return Err(Unsupported),
+    }
+    let complexity = optional_value(values, 4);
+    match &complexity {
+        None => {}
+        Some(Value::Number(n)) if n.is_i64() => {}
+        Some(_) => {
+            complexity_pair(&complexity)?;
+        }
+    }
+    Ok(Some(Session {
+        id: values[0].as_i64().ok_or(Unsupported)?,
+        coverage: parse_coverage(&values[1])?,
+        branches: branches,
+        partials: partials,
+        complexity: complexity,
+    }))
+}
+
+fn parse_line(encoded: &str) -> Result<Line, Unsupported> {
+    let value: Value = serde_json::from_str(encoded).map_err(|_| Unsupported)?;
+    let values = match value {
+        Value::Array(values) => values,
+        _ => return Err(Unsupported),
+    };
+    if values.len() > 6 {
+        return Err(Unsupported);
+    }
+    let coverage_type = optional_value(&values, 1).unwrap_or(Value::Null);
+    match coverage_type {
+        Value::Null | Value::String(_) => {}
+        _ => return Err(Unsupported),
+    }
+    let mut sessions: Vec<Session> = Vec::new();
+    match optional_value(&values, 2) {
+        None => {}
+        Some(Value::Array(raw_sessions)) => {
+            for raw_session in raw_sessions.iter() {
+                if let Some(session) = parse_session(raw_session)? {
+                    sessions.push(session);
+                }
+            }
+        }
+        Some(_) => return Err(Unsupported),
+    }
+    match optional_value(&values, 5) {
+        None => {}
+        Some(Value::Array(datapoints)) if datapoints.is_empty() => {}
+        Some(_) => return Err(Unsupported),
+    }
+    Ok(Line {
+        coverage: parse_coverage(values.get(0).unwrap_or(&Value::Null))?,
+        coverage_type: coverage_type,
+        sessions: sessions,
+        complexity: optional_value(&values, 4).unwrap_or(Value::Null),
+    })
+}
+
+fn session_to_value(session: &Session) -> Value {
+    let mut values = vec![
+        Value::Number(Number::from(session.id)),
+        coverage_to_value(&session.coverage),
+    ];
+    if session.branches.is_some() || session.partials.is_some() || session.complexity.is_some() {
+        values.push(match &session.branches {
+            Some(b) => Value::Array(b.clone()),
+            None => Value::Null,
+        });
+        values.push(session.partials.clone().unwrap_or(Value::Null));
+        values.push(session.complexity.clone().unwrap_or(Value::Null));
+    }
+    Value::Array(values)
+}
+
+fn is_truthy_type(value: &Value) -> bool {
+    match value {
+        Value::String(s) => !s.is_empty(),
+        _ => false,
+    }
+}
+
+/// Merges two encoded lines, the same way `merge_line` does
+///
+/// Empty lines are `None`. The result is encoded the same way as the inputs
+pub fn merge_line(
+    l1: Option<&str>,
+    l2: Option<&str>,
+    joined: bool,
+) -> Result<Option<String>, Unsupported> {
+    let (l1, l2) = match (l1, l2) {
+        (None, None) => return Ok(None),
+        (Some(l1), None) => return Ok(Some(l1.to_string())),
+        (None, Some(l2)) => return Ok(Some(l2.to_string())),
+        (Some(l1), Some(l2)) => (parse_line(l1)?, parse_line(l2)?),
+    };
+    let coverage_type = if is_truthy_type(&l1.coverage_type) {
+        l1.coverage_type.clone()
+    } else {
+        l2.coverage_type.clone()
+    };
+    let sessions = merge_sessions(l1.sessions, l2.sessions)?;
+    let (coverage, complexity) = if joined {
+        (
+            coverage_from_sessions(&sessions)?,
+            complexity_from_sessions(&sessions)?,
+        )
+    } else {
+        (l1.coverage, l1.complexity)
+    };
+    let mut values = vec![
+        coverage_to_value(&coverage),
+        coverage_type,
+        if sessions.is_empty() {
+            Value::Null
+        } else {
+            Value::Array(sessions.iter().map(session_to_value).collect())
+        },
+        // messages never survive a merge
+        Value::Null,
+        complexity,
+    ];
+    while values.last() == Some(&Value::Null) {
+        values.pop();
+    }
+    if values.is_empty() {
+        // python can't encode a line without anything in it
+        return Err(Unsupported);
+    }
+    match serde_json::to_string(&Value::Array(values)) {
+        Ok(encoded) => Ok(Some(encoded)),
+        Err(_) => Err(Unsupported),
+    }
+}
+
+fn non_empty(line: &Option<String>) -> Option<&str> {
+    match line {
+        Some(s) if !s.is_empty() => Some(s.as_str()),
+        _ => None,
+    }
+}
+
+/// Merges two lists of encoded lines, line by line
+///
+/// Returns the merged lines and the indexes of the ones that need to be merged
+/// by the python implementation instead (those are `None` in the merged lines)
+pub fn merge_line_lists(
+    lines1: &Vec<Option<String>>,
+    lines2: &Vec<Option<String>>,
+    joined: bool,
+) -> (Vec<Option<String>>, Vec<usize>) {
+    let length = lines1.len().max(lines2.len());
+    let empty: Option<String> = None;
+    let results: Vec<Result<Option<String>, Unsupported>> = (0..length)
+        .into_par_iter()
+        .map(|i| {
+            merge_line(
+                non_empty(lines1.get(i).unwrap_or(&empty)),
+                non_empty(lines2.get(i).unwrap_or(&empty)),
+                joined,
+            )
+        })
+        .collect();
+    let mut merged: Vec<Option<String>> = Vec::with_capacity(length);
+    let mut unsupported: Vec<usize> = Vec::new();
+    for (i, result) in results.into_iter().enumerate() {
+        match result {
+            Ok(line) => merged.push(line),
+            Err(_) => {
+                merged.push(None);
+                unsupported.push(i);
+            }
+        }
+    }
+    (merged, unsupported)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn merged(l1: &str, l2: &str) -> Result<Option<String>, Unsupported> {
+        merge_line(Some(l1), Some(l2), true)
+    }
+
+    #[test]
+    fn merges_hits_and_misses() {
+        assert_eq!(
+            merged("[1, null, [[0, 1]]]", "[0, null, [[1, 0]]]"),
+            Ok(Some("[1,null,[[0,1],[1,0]]]".to_string()))
+        );
+        assert_eq!(
+            merged("[0, null, [[0, 0]]]", "[2, null, [[0, 2]]]"),
+            Ok(Some("[2,null,[[0,2]]]".to_string()))
+        );
+    }
+
+    #[test]
+    fn merges_branches() {
+        assert_eq!(
+            merged(
+                "[\"1/2\", \"b\", [[0, \"1/2\"]]]",
+                "[\"1/3\", null, [[1, \"1/3\"]]]"
+            ),
+            Ok(Some(
+                "[\"1/3\",\"b\",[[0,\"1/2\"],[1,\"1/3\"]]]".to_string()
+            ))
+        );
+        assert_eq!(
+            merged("[\"1/2\", \"b\", [[0, \"1/2\"]]]", "[1, \"b\", [[1, 1]]]"),
+            Ok(Some("[\"2/2\",\"b\",[[0,\"1/2\"],[1,1]]]".to_string()))
+        );
+        assert_eq!(
+            merged(
+                "[\"1/3\", \"b\", [[0, \"1/3\", [\"1\", \"2\"]]]]",
+                "[\"1/3\", \"b\", [[1, \"1/3\", [\"2\", \"3\"]]]]"
+            ),
+            Ok(Some(
+                "[\"2/3\",\"b\",[[0,\"1/3\",[\"1\",\"2\"],null,null],[1,\"1/3\",[\"2\",\"3\"],null,null]]]"
+                    .to_string()
+            ))
+        );
+    }
+
+    #[test]
+    fn merges_same_session() {
+        assert_eq!(
+            merged(
+                "[0, null, [[0, 0, null, null, 2]], null, 2]",
+                "[1, null, [[0, 1]]]"
+            ),
+            Ok(Some("[1,null,[[0,1]]]".to_string()))
+        );
+    }
+
+    #[test]
+    fn merges_complexity() {
+        assert_eq!(
+            merged(
+                "[1, \"m\", [[0, 1, null, null, [1, 2]]], null, [1, 2]]",
+                "[1, \"m\", [[1, 1, null, null, [2, 1]]], null, [2, 1]]"
+            ),
+            Ok(Some(
+                "[1,\"m\",[[0,1,null,null,[1,2]],[1,1,null,null,[2,1]]],null,[2,2]]".to_string()
+            ))
+        );
+    }
+
+    #[test]
+    fn keeps_single_lines() {
+        assert_eq!(
+            merge_line(Some("[1, null, [[0, 1]]]"), None, true),
+            Ok(Some("[1, null, [[0, 1]]]".to_string()))
+        );
+        assert_eq!(merge_line(None, None, true), Ok(None));
+    }
+
+    #[test]
+    fn not_joined_keeps_first_coverage() {
+        assert_eq!(
+            merge_line(
+                Some("[0, null, [[0, 0]]]"),
+                Some("[1, null, [[1, 1]]]"),
+                false
+            ),
+            Ok(Some("[0,null,[[0,0],[1,1]]]".to_string()))
+        );
+    }
+
+    #[test]
+    fn unsupported_lines() {
+        // partials
+        assert_eq!(
+            merged(
+                "[1, null, [[0, 1, null, [[0, 1, 1]]]]]",
+                "[1, null, [[1, 1]]]"
+            ),
+            Err(Unsupported)
+        );
+        // floats
+        assert_eq!(
+            merged("[1.5, null, [[0, 1.5]]]", "[1, null, [[1, 1]]]"),
+            Err(Unsupported)
+        );
+        // datapoints
+        assert_eq!(
+            merged(
+                "[1, null, [[0, 1]], null, null, [[0, 1, null, [\"a\"]]]]",
+                "[1, null, [[1, 1]]]"
+            ),
+            Err(Unsupported)
+        );
+        // no sessions to take the coverage from
+        assert_eq!(merged("[1]", "[1]"), Err(Unsupported));
+    }
+
+    #[test]
+    fn merges_lists() {
+        let lines1 = vec![
+            Some("[1, null, [[0, 1]]]".to_string()),
+            None,
+            Some("[1.5]".to_string()),
+        ];
+        let lines2 = vec![
+            Some("[0, null, [[1, 0]]]".to_string()),
+            Some("".to_string()),
+            Some("[1, null, [[1, 1]]]".to_string()),
+            Some("[1, null, [[1, 1]]]".to_string()),
+        ];
+        let (merged, unsupported) = merge_line_lists(&lines1, &lines2, true);
+        assert_eq!(
+            merged,
+            vec![
+                Some("[1,null,[[0,1],[1,0]]]".to_string()),
+                None,
+                None,
+                Some("[1, null, [[1, 1]]]".to_string())
+            ]
+        );
+        assert_eq!(unsupported, vec![2]);
+    }
+}
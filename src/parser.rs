@@ -1,4 +1,5 @@
 extern crate rayon;
+use crate::columnar;
 use crate::cov;
 use crate::file;
 use crate::line;
@@ -11,8 +12,9 @@ use serde_json::Value;
 use std::collections::HashMap;
 
 #[derive(Debug)]
-enum LineType {
+pub(crate) enum LineType {
     Content(line::ReportLine),
+    Columnar(Vec<(i32, line::ReportLine)>),
     Emptyline,
     Separator,
     Details,
@@ -126,13 +128,59 @@ fn parse_complexity(val: &Value) -> Result<Option<line::Complexity>, ParsingErro
     }
 }
 
-fn parse_line(line: &str) -> Result<LineType, ParsingError> {
+fn parse_datapoints(val: &Value) -> Result<Option<Vec<line::CoverageDatapoint>>, ParsingError> {
+    match val {
+        Value::Null => return Ok(None),
+        Value::Array(a) => {
+            let mut datapoints: Vec<line::CoverageDatapoint> = Vec::with_capacity(a.len());
+            for el in a {
+                // [session_id, coverage, coverage_type, labels]
+                let el_as_array = el.as_array().ok_or(ParsingError::UnexpectedValue)?;
+                if el_as_array.len() < 2 {
+                    return Err(ParsingError::UnexpectedValue);
+                }
+                let labels = match el_as_array.get(3).unwrap_or(&Value::Null) {
+                    Value::Null => Vec::new(),
+                    Value::Array(labels) => labels
+                        .iter()
+                        .map(|label| {
+                            label
+                                .as_str()
+                                .map(|x| x.to_string())
+                                .ok_or(ParsingError::UnexpectedValue)
+                        })
+                        .collect::<Result<Vec<String>, ParsingError>>()?,
+                    _ => return Err(ParsingError::UnexpectedValue),
+                };
+                datapoints.push(line::CoverageDatapoint {
+                    session_id: el_as_array[0]
+                        .as_i64()
+                        .ok_or(ParsingError::UnexpectedValue)?
+                        as i32,
+                    coverage: parse_coverage(&el_as_array[1])?,
+                    coverage_type: match el_as_array.get(2).unwrap_or(&Value::Null) {
+                        Value::Null => None,
+                        v => Some(parse_coverage_type(v)?),
+                    },
+                    labels: labels,
+                })
+            }
+            return Ok(Some(datapoints));
+        }
+        _ => return Err(ParsingError::UnexpectedValue),
+    }
+}
+
+pub(crate) fn parse_line(line: &str) -> Result<LineType, ParsingError> {
     if line.is_empty() {
         return Ok(LineType::Emptyline);
     }
     if line == "<<<<< end_of_chunk >>>>>" {
         return Ok(LineType::Separator);
     }
+    if line.starts_with(columnar::COLUMNAR_CHUNK_PREFIX) {
+        return Ok(LineType::Columnar(columnar::decode_lines(line)?));
+    }
     match serde_json::from_str(&line).unwrap() {
         Value::Number(_) => return Err(ParsingError::UnexpectedValue),
         Value::String(_) => return Err(ParsingError::UnexpectedValue),
@@ -171,6 +219,11 @@ fn parse_line(line: &str) -> Result<LineType, ParsingError> {
                 } else {
                     &Value::Null
                 })?,
+                datapoints: parse_datapoints(if array_data.len() > 5 {
+                    &array_data[5]
+                } else {
+                    &Value::Null
+                })?,
             }));
         }
         Value::Null => return Ok(LineType::NoFile),
@@ -224,6 +277,12 @@ pub fn parse_report_from_str(
                 }
                 line_count += 1;
             }
+            LineType::Columnar(report_lines) => match current_report_lines.as_mut() {
+                Some(lines) => {
+                    lines.extend(report_lines);
+                }
+                None => {}
+            },
         }
     }
     all_report_files.push(match current_report_lines {
@@ -553,6 +612,43 @@ null
         }
     }
 
+    #[test]
+    fn parse_line_with_datapoints() {
+        let res = parse_line(
+            "[\"1/2\", \"b\", [[0, 1], [1, \"1/2\"]], null, null, [[0, 1, null, [\"test_a\"]], [1, \"1/2\", \"b\", [\"test_b\", \"test_c\"]], [1, 0, null, null]]]",
+        )
+        .expect("Unable to parse line");
+        match res {
+            LineType::Content(l) => {
+                let datapoints = l.datapoints.expect("Datapoints are missing");
+                assert_eq!(datapoints.len(), 3);
+                assert_eq!(datapoints[0].session_id, 0);
+                assert_eq!(datapoints[0].coverage, cov::Coverage::Hit);
+                assert!(datapoints[0].coverage_type.is_none());
+                assert_eq!(datapoints[0].labels, vec!["test_a".to_string()]);
+                assert_eq!(
+                    datapoints[1].coverage,
+                    cov::Coverage::Partial(GenericFraction::new(1, 2))
+                );
+                assert_eq!(
+                    datapoints[1].coverage_type,
+                    Some(line::CoverageType::Branch)
+                );
+                assert_eq!(datapoints[1].labels.len(), 2);
+                assert!(datapoints[2].labels.is_empty());
+            }
+            _ => {
+                panic!("Bad res");
+            }
+        }
+        match parse_line("[1, null, [[0, 1]]]").expect("Unable to parse line") {
+            LineType::Content(l) => assert!(l.datapoints.is_none()),
+            _ => panic!("Bad res"),
+        }
+        parse_line("[1, null, [[0, 1]], null, null, [[0, 1, null, [1]]]]")
+            .expect_err("Labels should be strings");
+    }
+
     #[test]
     fn parse_line_bad_line() {
         let _res = parse_line("[1, \"b\", [[null, true, null, null, null]]]")
@@ -234,6 +234,7 @@ mod tests {
                             complexity: None,
                         }],
                         complexity: None,
+                        datapoints: None,
                     },
                 ),
                 (
@@ -254,6 +255,7 @@ mod tests {
                             },
                         ],
                         complexity: None,
+                        datapoints: None,
                     },
                 ),
             ]
@@ -273,6 +275,7 @@ mod tests {
                             complexity: None,
                         }],
                         complexity: None,
+                        datapoints: None,
                     },
                 ),
                 (
@@ -293,6 +296,7 @@ mod tests {
                             },
                         ],
                         complexity: None,
+                        datapoints: None,
                     },
                 ),
             ]
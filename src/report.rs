@@ -1,12 +1,17 @@
 use crate::file;
+use crate::line;
+use crate::matching;
 
+use pyo3::exceptions::PyValueError;
 use pyo3::prelude::*;
 use pyo3::types::PyDict;
 use rayon::prelude::*;
 
 use fraction::GenericFraction;
 use fraction::ToPrimitive;
+use std::collections::BTreeSet;
 use std::collections::HashMap;
+use std::collections::HashSet;
 
 #[pyclass]
 #[derive(Debug)]
@@ -146,6 +151,135 @@ impl Report {
     }
 }
 
+#[pymethods]
+impl Report {
+    /// A copy of the file, or None when the report doesn't have it
+    pub fn get_file(&self, filename: &str) -> Option<file::ReportFile> {
+        self.get_by_filename(filename).map(|x| x.clone())
+    }
+
+    /// Totals for each (flags, path patterns) group, in one pass over the files
+    ///
+    /// Each group gives the same totals as `FilterAnalyzer(files, flags)` on the files
+    /// matching its path patterns (see `matching::PathMatcher`). `None` or empty
+    /// flags/patterns don't filter anything. Raises ValueError when a pattern isn't
+    /// supported by the regex crate, callers can fall back to python then
+    pub fn get_group_totals(
+        &self,
+        groups: Vec<(Option<Vec<String>>, Option<Vec<String>>)>,
+    ) -> PyResult<Vec<ReportTotals>> {
+        let mut filters: Vec<(Option<Vec<i32>>, Option<matching::PathMatcher>)> = Vec::new();
+        for (flags, paths) in groups.iter() {
+            let sessions = match flags {
+                Some(f) if !f.is_empty() => Some(self.get_sessions_from_flags(f)),
+                _ => None,
+            };
+            let matcher = match paths {
+                Some(p) if !p.is_empty() => Some(
+                    matching::PathMatcher::new(p)
+                        .map_err(|e| PyValueError::new_err(e.to_string()))?,
+                ),
+                _ => None,
+            };
+            filters.push((sessions, matcher));
+        }
+        let totals_per_file: Vec<Vec<Option<file::FileTotals>>> = self
+            .report_files
+            .par_iter()
+            .map(|(filename, report_file)| {
+                filters
+                    .iter()
+                    .map(|(sessions, matcher)| match matcher {
+                        Some(m) if !m.matches(filename) => None,
+                        _ => Some(match sessions {
+                            Some(sess) => report_file.get_filtered_totals(sess),
+                            None => report_file.get_totals(),
+                        }),
+                    })
+                    .collect()
+            })
+            .collect();
+        let mut res: Vec<ReportTotals> = filters
+            .iter()
+            .map(|(sessions, _)| {
+                let mut totals = ReportTotals::new();
+                totals.sessions = match sessions {
+                    Some(sess) => sess.len() as i32,
+                    None => self.session_mapping.len() as i32,
+                };
+                totals
+            })
+            .collect();
+        for file_totals in totals_per_file {
+            for (group_totals, totals) in res.iter_mut().zip(file_totals.iter()) {
+                if let Some(t) = totals {
+                    group_totals.add_up(t);
+                }
+            }
+        }
+        return Ok(res);
+    }
+
+    /// All the labels found in the datapoints of the report, sorted
+    pub fn get_labels(&self) -> Vec<String> {
+        let labels: BTreeSet<&String> = self
+            .report_files
+            .values()
+            .flat_map(|f| f.lines.values().flat_map(|l| l.get_labels()))
+            .collect();
+        return labels.into_iter().map(|x| x.to_string()).collect();
+    }
+
+    /// Totals of the report, only counting what the datapoints of `labels` covered
+    pub fn get_label_totals(&self, labels: Vec<String>) -> PyResult<ReportTotals> {
+        let labels: HashSet<String> = labels.into_iter().collect();
+        let mut res = ReportTotals::new();
+        let individual_totals: Vec<file::FileTotals> = self
+            .report_files
+            .par_iter()
+            .map(|(_, x)| x.get_label_filtered_totals(&labels))
+            .collect();
+        for totals in individual_totals {
+            res.add_up(&totals);
+        }
+        res.sessions = self.session_mapping.len() as i32;
+        return Ok(res);
+    }
+
+    /// The datapoints of a line, as (session_id, coverage, coverage_type, labels) tuples
+    ///
+    /// `coverage` is serialized the way the comparisons do ("h", "m", "p" or "i")
+    pub fn get_line_datapoints(
+        &self,
+        filename: &str,
+        line_number: i32,
+    ) -> Option<Vec<(i32, String, Option<String>, Vec<String>)>> {
+        let datapoints = self
+            .get_by_filename(filename)?
+            .lines
+            .get(&line_number)?
+            .datapoints
+            .as_ref()?;
+        Some(
+            datapoints
+                .iter()
+                .map(|d| {
+                    (
+                        d.session_id,
+                        d.coverage.as_char().to_string(),
+                        match d.coverage_type {
+                            Some(line::CoverageType::Branch) => Some("b".to_string()),
+                            Some(line::CoverageType::Method) => Some("m".to_string()),
+                            _ => None,
+                        },
+                        d.labels.clone(),
+                    )
+                })
+                .collect(),
+        )
+    }
+}
+
 impl Report {
     pub fn calculate_per_flag_totals(&self) -> HashMap<String, ReportTotals> {
         let mut book_reviews: HashMap<String, ReportTotals> = HashMap::new();
@@ -234,4 +368,105 @@ mod tests {
         };
         assert_eq!(t.get_coverage().unwrap(), Some("73.52113".to_string()));
     }
+
+    #[test]
+    fn label_totals_and_datapoints() {
+        let content = "{}
+[1, null, [[0, 1], [1, 0]], null, null, [[0, 1, null, [\"test_a\"]], [1, 0, null, [\"test_b\"]]]]
+[0, null, [[1, 0]], null, null, [[1, 0, null, [\"test_b\"]]]]
+[1, null, [[0, 1]]]
+<<<<< end_of_chunk >>>>>
+{}
+[\"1/2\", \"b\", [[0, \"1/2\"]], null, null, [[0, \"1/2\", \"b\", [\"test_c\", \"test_a\"]]]]";
+        let filenames: HashMap<String, i32> =
+            vec![("a.py".to_string(), 0), ("b.py".to_string(), 1)]
+                .into_iter()
+                .collect();
+        let report = crate::parser::parse_report_from_str(
+            filenames,
+            content,
+            vec![(0, vec![]), (1, vec![])].into_iter().collect(),
+        )
+        .expect("Unable to parse report");
+        assert_eq!(report.get_labels(), vec!["test_a", "test_b", "test_c"]);
+        let test_a = report.get_label_totals(vec!["test_a".to_string()]).unwrap();
+        assert_eq!(test_a.files, 2);
+        assert_eq!(test_a.lines, 2);
+        assert_eq!(test_a.hits, 1);
+        assert_eq!(test_a.partials, 1);
+        let test_b = report.get_label_totals(vec!["test_b".to_string()]).unwrap();
+        assert_eq!(test_b.files, 1);
+        assert_eq!(test_b.lines, 2);
+        assert_eq!(test_b.misses, 2);
+        let nothing = report.get_label_totals(vec!["test_d".to_string()]).unwrap();
+        assert_eq!(nothing.files, 0);
+        assert_eq!(
+            report.get_line_datapoints("b.py", 1),
+            Some(vec![(
+                0,
+                "p".to_string(),
+                Some("b".to_string()),
+                vec!["test_c".to_string(), "test_a".to_string()]
+            )])
+        );
+        assert_eq!(report.get_line_datapoints("a.py", 3), None);
+        assert_eq!(report.get_line_datapoints("c.py", 1), None);
+    }
+
+    #[test]
+    fn group_totals() {
+        let content = "{}
+[1, null, [[0, 1], [1, 0]]]
+[0, null, [[1, 0]]]
+<<<<< end_of_chunk >>>>>
+{}
+[1, null, [[1, 1]]]
+[\"1/2\", \"b\", [[0, \"1/2\"]]]";
+        let filenames: HashMap<String, i32> =
+            vec![("src/a.py".to_string(), 0), ("tests/b.py".to_string(), 1)]
+                .into_iter()
+                .collect();
+        let report = crate::parser::parse_report_from_str(
+            filenames,
+            content,
+            vec![
+                (0, vec!["unit".to_string()]),
+                (1, vec!["integration".to_string()]),
+            ]
+            .into_iter()
+            .collect(),
+        )
+        .expect("Unable to parse report");
+        let res = report
+            .get_group_totals(vec![
+                (None, None),
+                (Some(vec!["unit".to_string()]), None),
+                (None, Some(vec!["src/".to_string()])),
+                (
+                    Some(vec!["integration".to_string()]),
+                    Some(vec!["!src/".to_string()]),
+                ),
+                (Some(vec![]), Some(vec![])),
+            ])
+            .unwrap();
+        assert_eq!(res.len(), 5);
+        assert_eq!(
+            (res[0].files, res[0].lines, res[0].hits, res[0].sessions),
+            (2, 4, 2, 2)
+        );
+        // only the lines where the unit session shows up
+        assert_eq!(
+            (res[1].files, res[1].lines, res[1].hits, res[1].partials),
+            (2, 2, 1, 1)
+        );
+        assert_eq!(res[1].sessions, 1);
+        assert_eq!(
+            (res[2].files, res[2].lines, res[2].hits, res[2].misses),
+            (1, 2, 1, 1)
+        );
+        assert_eq!((res[3].files, res[3].lines, res[3].hits), (1, 1, 1));
+        assert_eq!((res[4].files, res[4].lines), (2, 4));
+        let simple = report.get_simple_totals().unwrap();
+        assert_eq!((res[0].hits, res[0].misses), (simple.hits, simple.misses));
+    }
 }
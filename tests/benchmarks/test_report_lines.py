@@ -0,0 +1,84 @@
+"""Allocation and construction time of 500k-line report files
+
+Opt-in, run them with `RUN_BENCHMARKS=1 pytest -s tests/benchmarks`
+"""
+import gc
+import os
+import timeit
+import tracemalloc
+
+import pytest
+
+from shared.reports.resources import ReportFile
+from shared.reports.types import LineSession, ReportLine
+
+NUMBER_LINES = 500_000
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("RUN_BENCHMARKS"), reason="benchmarks are opt-in"
+)
+
+
+def _sessions(ln):
+    return [LineSession(0, 1), LineSession(1, ln % 2)]
+
+
+def _allocated_per_line(build):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        lines = build()
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert len(lines) == NUMBER_LINES
+    return allocated / NUMBER_LINES
+
+
+def _best_time(build, repeat=7):
+    return min(timeit.repeat(build, number=1, repeat=repeat))
+
+
+def test_report_line_create_typed():
+    def create():
+        return [ReportLine.create(1, None, _sessions(ln)) for ln in range(NUMBER_LINES)]
+
+    def create_typed():
+        return [
+            ReportLine.create_typed(1, None, _sessions(ln))
+            for ln in range(NUMBER_LINES)
+        ]
+
+    memory = (_allocated_per_line(create), _allocated_per_line(create_typed))
+    # the construction only, on sessions built beforehand
+    sessions = [_sessions(ln) for ln in range(NUMBER_LINES)]
+    times = (
+        _best_time(lambda: [ReportLine.create(1, None, s) for s in sessions]),
+        _best_time(lambda: [ReportLine.create_typed(1, None, s) for s in sessions]),
+    )
+    print(
+        "\n%d two-session lines: create %.0f bytes/line %.2fs,"
+        " create_typed %.0f bytes/line %.2fs"
+        % (NUMBER_LINES, memory[0], times[0], memory[1], times[1])
+    )
+    # the same objects, built without going through __post_init__
+    assert memory[1] <= memory[0] * 1.05
+    assert times[1] < times[0]
+
+
+def test_report_file_parse_lines():
+    report_file = ReportFile("file.py")
+    for ln in range(1, NUMBER_LINES + 1):
+        report_file.append(ln, ReportLine.create(1, None, _sessions(ln)))
+    chunk = report_file._encode()
+
+    def parse():
+        return list(ReportFile("file.py", lines=chunk).lines)
+
+    allocated = _allocated_per_line(parse)
+    elapsed = _best_time(parse, repeat=3)
+    print(
+        "\nparsing %d encoded lines: %.0f bytes/line %.2fs"
+        % (NUMBER_LINES, allocated, elapsed)
+    )
@@ -1,5 +1,6 @@
 import os
 
+from shared.reports.editable import EditableReport, EditableReportFile
 from shared.reports.filtered import FilteredReport, FilteredReportFile
 from shared.reports.resources import (
     LineSession,
@@ -9,7 +10,7 @@ from shared.reports.resources import (
     ReportTotals,
     Session,
 )
-from shared.reports.types import CoverageDatapoint, NetworkFile
+from shared.reports.types import CoverageDatapoint, NetworkFile, SessionTotalsArray
 from shared.utils.sessions import SessionType
 
 
@@ -196,6 +197,35 @@ class TestFilteredReportFile(object):
         )
         assert res == ""
 
+    def test_line_modifier_all_sessions_included(self):
+        file = FilteredReportFile(ReportFile("file_1.py"), {0, 1, 5})
+        line = ReportLine.create(
+            1,
+            sessions=[LineSession(0, 1), LineSession(5, 0)],
+            datapoints=[CoverageDatapoint(1, 1, None, ["simpletest"])],
+        )
+        assert file.line_modifier(line) is line
+
+    def test_line_modifier_datapoints_excluded(self):
+        file = FilteredReportFile(ReportFile("file_1.py"), {0})
+        res = file.line_modifier(
+            ReportLine.create(
+                1,
+                sessions=[LineSession(0, 1)],
+                datapoints=[CoverageDatapoint(1, 1, None, ["simpletest"])],
+            )
+        )
+        assert res.sessions == [LineSession(0, 1)]
+        assert res.datapoints == []
+
+    def test_line_modifier_ids_not_bits(self):
+        file = FilteredReportFile(ReportFile("file_1.py"), {"0", -1})
+        res = file.line_modifier(
+            ReportLine.create(1, sessions=[LineSession("0", 1), LineSession(1, 0)])
+        )
+        assert res.sessions == [LineSession("0", 1)]
+        assert res.coverage == 1
+
 
 class TestFilteredReport(object):
     def test_no_real_filter(self, sample_report):
@@ -640,6 +670,153 @@ class TestFilteredReport(object):
         assert report.filter(flags=["unit"])._can_use_session_totals() is False
         assert report.filter(flags=["notime"])._can_use_session_totals() is False
 
+    def test_stored_session_totals(self, mocker, mock_configuration):
+        report = Report()
+        first_file = ReportFile("file_1.py")
+        first_file.append(1, ReportLine.create(1, sessions=[LineSession(0, 1)]))
+        first_file.append(2, ReportLine.create(0, sessions=[LineSession(1, 0)]))
+        report.append(first_file)
+        report._files["file_1.py"].session_totals = SessionTotalsArray(
+            session_count=2,
+            non_null_items={0: ReportTotals(1, 1, 1), 1: ReportTotals(1, 1, 0, 1)},
+        )
+        report.add_session(Session(time=20000, flags=["unit"]))
+        report.add_session(
+            Session(time=20000, flags=["integration"], totals=ReportTotals(1, 10, 5))
+        )
+        report.add_session(Session(time=1, flags=["old"], totals=ReportTotals(1, 3)))
+        mocker.patch.dict(os.environ, {"CORRECT_SESSION_TOTALS_SINCE": "12345"})
+        mock_configuration._params["setup"]["use_stored_session_totals"] = True
+        incr = mocker.patch("shared.reports.filtered.metrics.incr")
+        # from the session
+        assert report.filter(flags=["integration"]).totals == ReportTotals(
+            1, 10, 5, sessions=1
+        )
+        # computed from the lines
+        assert report.filter(flags=["unit"]).totals.lines == 1
+        assert report.filter(flags=["old"]).totals.lines == 0
+        assert report.filter(paths=["file"], flags=["unit"]).totals.lines == 1
+        assert [c.args[0] for c in incr.call_args_list] == [
+            "shared.reports.filtered.stored_session_totals.hits",
+            "shared.reports.filtered.stored_session_totals.misses",
+            "shared.reports.filtered.stored_session_totals.misses",
+            "shared.reports.filtered.stored_session_totals.misses",
+        ]
+
+    def test_stored_session_totals_upload_skips_file(self, mocker, mock_configuration):
+        def build_report():
+            report = Report()
+            uploads = [("a", ["A.py", "B.py"]), ("b", ["B.py"]), ("c", ["A.py"])]
+            for sessionid, (flag, filenames) in enumerate(uploads):
+                report.add_session(Session(flags=[flag], time=20000))
+                for filename in filenames:
+                    report_file = ReportFile(filename)
+                    report_file.append(
+                        1, ReportLine.create(1, sessions=[LineSession(sessionid, 1)])
+                    )
+                    report.append(report_file)
+            return report
+
+        mocker.patch.dict(os.environ, {"CORRECT_SESSION_TOTALS_SINCE": "12345"})
+        expected = build_report().filter(flags=["b"]).totals
+        assert (expected.files, expected.lines) == (1, 1)
+        mock_configuration._params["setup"]["use_stored_session_totals"] = True
+        report = build_report()
+        # "c" didn't upload B.py, so its totals are stored where "b"'s would be
+        assert report._files["A.py"].session_totals.non_null_items.keys() == {0, 1}
+        assert report.filter(flags=["b"]).totals == expected
+
+    def test_stored_session_totals_disabled(self, mocker):
+        report = Report()
+        report.add_session(
+            Session(time=20000, flags=["integration"], totals=ReportTotals(1, 10, 5))
+        )
+        mocker.patch.dict(os.environ, {"CORRECT_SESSION_TOTALS_SINCE": "12345"})
+        assert report.filter(flags=["integration"]).totals.lines == 0
+
+    def test_flag_totals_from_file_summaries(self, mocker, mock_configuration):
+        def build_report():
+            report = EditableReport()
+            for sessionid, flag in enumerate(["unit", "integration", "e2e"]):
+                report.add_session(Session(flags=[flag], time=20000 + sessionid))
+                only_file = EditableReportFile("only_%s.py" % flag)
+                only_file.append(1, ReportLine.create(1, sessions=[[sessionid, 1]]))
+                only_file.calculate_present_sessions()
+                shared_file = EditableReportFile("shared.py")
+                shared_file.append(
+                    sessionid + 1, ReportLine.create(0, sessions=[[sessionid, 0]])
+                )
+                shared_file.append(4, ReportLine.create(1, sessions=[[sessionid, 1]]))
+                new_report = EditableReport()
+                new_report.append(only_file)
+                new_report.append(shared_file)
+                report.merge(new_report)
+            return EditableReport.from_chunks(
+                chunks=report.to_archive(),
+                files=report._files,
+                sessions=report.sessions,
+            )
+
+        mocker.patch.dict(os.environ, {"CORRECT_SESSION_TOTALS_SINCE": "12345"})
+        report = build_report()
+        groups = [["unit"], ["unit", "integration"], ["e2e", "unit", "integration"]]
+        expected = [report.filter(flags=flags).totals for flags in groups]
+        mock_configuration._params["setup"]["use_stored_session_totals"] = True
+        report = build_report()
+        line_modifier = mocker.spy(FilteredReportFile, "line_modifier")
+        assert [report.filter(flags=flags).totals for flags in groups] == expected
+        # only shared.py has sessions of the flags and other sessions, for ["unit"]
+        # and for ["unit", "integration"]
+        assert line_modifier.call_count == 8
+        assert expected[0].files == 2
+        assert expected[2].files == 4
+
+    def test_flag_totals_from_file_summaries_not_trusted(
+        self, mocker, mock_configuration
+    ):
+        mock_configuration._params["setup"]["use_stored_session_totals"] = True
+        mocker.patch.dict(os.environ, {"CORRECT_SESSION_TOTALS_SINCE": "12345"})
+
+        def build_report(time):
+            report = EditableReport()
+            for sessionid, flag in enumerate(["unit", "integration"]):
+                report.add_session(Session(flags=[flag], time=time))
+                upload = EditableReport()
+                upload_file = EditableReportFile("file.py")
+                upload_file.append(
+                    sessionid + 1,
+                    ReportLine.create(1, sessions=[[sessionid, 1]]),
+                )
+                upload.append(upload_file)
+                report.merge(upload)
+            return report
+
+        line_modifier = mocker.spy(FilteredReportFile, "line_modifier")
+        report = build_report(20000)
+        assert report.get("file.py").details == {"present_sessions": [0, 1]}
+        assert report.filter(flags=["unit", "integration"]).totals.lines == 2
+        assert line_modifier.call_count == 0
+        # sessions processed before CORRECT_SESSION_TOTALS_SINCE
+        report = build_report(10000)
+        assert report.filter(flags=["unit", "integration"]).totals.lines == 2
+        assert line_modifier.call_count == 2
+        # present_sessions left stale by a merge that doesn't update them
+        editable_report = build_report(20000)
+        report = Report.from_chunks(
+            chunks=editable_report.to_archive(),
+            files=editable_report._files,
+            sessions=editable_report.sessions,
+        )
+        report.add_session(Session(flags=["e2e"], time=20000))
+        upload = Report()
+        upload_file = ReportFile("file.py")
+        upload_file.append(3, ReportLine.create(1, sessions=[[2, 1]]))
+        upload.append(upload_file)
+        report.merge(upload)
+        assert report.get("file.py").details == {"present_sessions": [0, 1]}
+        totals = report.filter(flags=["unit", "integration"]).totals
+        assert (totals.lines, totals.hits) == (2, 2)
+
     def test_calculate_diff(self, sample_report):
         diff = {
             "files": {
@@ -1186,3 +1363,26 @@ class TestFilteredReport(object):
             complexity_total=0,
             diff=0,
         )
+
+    def test_session_ids_memoized_by_flags(self, mocker):
+        report = EditableReport()
+        report.add_session(Session(id=0, flags=["unit"]))
+        report.add_session(Session(id=1, flags=["integration"]))
+        calculate = mocker.spy(FilteredReport, "_calculate_sessionids_to_include")
+        assert report.filter(flags=["unit"]).session_ids_to_include == {0}
+        assert report.filter(flags=["unit"]).session_ids_to_include == {0}
+        assert calculate.call_count == 1
+        report.add_session(Session(id=2, flags=["unit"]))
+        assert report.filter(flags=["unit"]).session_ids_to_include == {0, 2}
+        report.delete_session(0)
+        assert report.filter(flags=["unit"]).session_ids_to_include == {2}
+        assert report.filter(flags=["integration"]).session_ids_to_include == {1}
+        assert calculate.call_count == 4
+        # sessions replaced or with their flags changed in place
+        report.sessions[1] = Session(id=1, flags=["unit"])
+        assert report.filter(flags=["unit"]).session_ids_to_include == {1, 2}
+        report.sessions[2].flags = ["integration"]
+        assert report.filter(flags=["unit"]).session_ids_to_include == {1}
+        report.sessions = {3: Session(id=3, flags=["unit"])}
+        assert report.filter(flags=["unit"]).session_ids_to_include == {3}
+        assert calculate.call_count == 7
@@ -4,12 +4,14 @@ import pytest
 
 from shared.reports.changes import (
     _get_changes_from_comparison,
+    compare_reports_using_rust,
     get_changes_using_rust,
     run_comparison_using_rust,
 )
 from shared.reports.readonly import ReadOnlyReport
 from shared.reports.types import Change
-from shared.ribs import rustify_diff
+from shared.ribs import parse_unified_diff, rustify_diff
+from shared.torngit.base import TorngitBaseAdapter
 
 current_file = Path(__file__)
 
@@ -130,6 +132,54 @@ def test_run_comparison_using_rust(sample_rust_report):
     }
 
 
+def test_compare_reports_using_rust(sample_rust_report):
+    base_report, head_report = sample_rust_report, sample_rust_report
+    diff = {
+        "files": {
+            "tests/__init__.py": {
+                "type": "modified",
+                "before": None,
+                "segments": [
+                    {
+                        "header": ["1", "3", "1", "5"],
+                        "lines": ["+sudo: false", "+", " language: python"],
+                    }
+                ],
+            }
+        }
+    }
+    expected = run_comparison_using_rust(base_report, head_report, diff)
+    res = compare_reports_using_rust(base_report, head_report, diff)
+    assert len(res.files) == 1
+    file_analysis = res.files[0]
+    expected_file = expected["files"][0]
+    for attribute in [
+        "base_name",
+        "head_name",
+        "file_was_added_by_diff",
+        "file_was_removed_by_diff",
+        "lines_only_on_base",
+        "lines_only_on_head",
+    ]:
+        assert getattr(file_analysis, attribute) == expected_file[attribute]
+    assert file_analysis.added_diff_coverage == [(1, "h")]
+    assert file_analysis.removed_diff_coverage == []
+    assert [
+        [list(base), list(head)]
+        for (base, head) in file_analysis.unexpected_line_changes
+    ] == expected_file["unexpected_line_changes"]
+    assert file_analysis.head_coverage.hits == 2
+    assert file_analysis.head_coverage.lines == 3
+    assert res.changes_summary.patch_totals.hits == 1
+    report_file = head_report.rust_report.get_report().get_file("tests/__init__.py")
+    assert report_file.totals.lines == 3
+    assert report_file.get_lines() == [(1, "h"), (4, "h"), (5, "m")]
+    assert report_file.get_line_coverage(5) == "m"
+    assert report_file.get_line_coverage(2) is None
+    assert report_file.eof == 6
+    assert head_report.rust_report.get_report().get_file("missing.py") is None
+
+
 def test_get_changes_using_rust(sample_rust_report):
     base_report, head_report = sample_rust_report, sample_rust_report
     diff = {
@@ -534,3 +584,80 @@ class TestRustifyDiff(object):
         }
         print(rustify_diff(user_input))
         assert rustify_diff(user_input) == expected_result
+
+
+class TestParseUnifiedDiff(object):
+    diff = "\n".join(
+        [
+            "diff --git a/a.py b/a.py",
+            "index 8695aedf2b..e0d2b1e89d 100644",
+            "--- a/a.py",
+            "+++ b/a.py",
+            "@@ -2,3 +2,4 @@ def f():",
+            " first line",
+            "-before",
+            "+after",
+            "+more",
+            "\\ No newline at end of file",
+            "@@ -20 +21,0 @@",
+            "-gone",
+            "diff --git a/removed.py b/removed.py",
+            "deleted file mode 100644",
+            "--- a/removed.py",
+            "+++ /dev/null",
+            "@@ -1 +0,0 @@",
+            "-removed",
+            "diff --git a/added.py b/added.py",
+            "new file mode 100644",
+            "--- /dev/null",
+            "+++ b/added.py",
+            "@@ -0,0 +1 @@",
+            "+added",
+            "diff --git a/image.png b/image.png",
+            "Binary files a/image.png and b/image.png differ",
+            "",
+        ]
+    )
+
+    def test_parse_unified_diff(self):
+        res, rust_diff = parse_unified_diff(self.diff)
+        assert res == TorngitBaseAdapter().diff_to_json(self.diff)
+        assert parse_unified_diff(self.diff.encode()) == (res, rust_diff)
+        assert rust_diff == rustify_diff(res)
+        assert parse_unified_diff("") == (None, {})
+
+    def test_diff_to_json_rust_diff_parser(self, mock_configuration):
+        mock_configuration._params["setup"] = {"rust_diff_parser": True}
+        res = TorngitBaseAdapter().diff_to_json(self.diff)
+        assert type(res) is dict
+        assert res == parse_unified_diff(self.diff)[0]
+        assert TorngitBaseAdapter().diff_to_json("") is None
+
+    def test_compare_with_parsed_diff(self, sample_rust_report):
+        diff, rust_diff = parse_unified_diff(
+            "\n".join(
+                [
+                    "diff --git a/tests/__init__.py b/tests/__init__.py",
+                    "@@ -1,3 +1,4 @@",
+                    "+added",
+                    " first",
+                    " second",
+                    " third",
+                ]
+            )
+        )
+        res = run_comparison_using_rust(sample_rust_report, sample_rust_report, diff)
+        assert [f["head_name"] for f in res["files"]] == ["tests/__init__.py"]
+        assert (
+            run_comparison_using_rust(
+                sample_rust_report, sample_rust_report, diff, rust_diff
+            )
+            == res
+        )
+        assert get_changes_using_rust(
+            sample_rust_report, sample_rust_report, diff, rust_diff
+        ) == get_changes_using_rust(sample_rust_report, sample_rust_report, diff)
+        # the comparison follows changes made to the diff after parsing it
+        del diff["files"]["tests/__init__.py"]
+        res = run_comparison_using_rust(sample_rust_report, sample_rust_report, diff)
+        assert res["files"] == []
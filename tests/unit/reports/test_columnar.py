@@ -0,0 +1,152 @@
+from pathlib import Path
+
+import pytest
+
+from shared.reports.columnar import (
+    COLUMNAR_CHUNK_PREFIX,
+    decode_columnar_lines,
+    encode_columnar_lines,
+)
+from shared.reports.editable import EditableReport
+from shared.reports.resources import END_OF_CHUNK, Report, ReportFile, Session
+from shared.reports.types import CoverageDatapoint, LineSession, ReportLine
+
+current_file = Path(__file__)
+
+files_dict = {
+    "awesome/__init__.py": [
+        2,
+        [0, 10, 8, 2, 0, "80.00000", 0, 0, 0, 0, 0, 0, 0],
+        [[0, 10, 8, 2, 0, "80.00000", 0, 0, 0, 0, 0, 0, 0]],
+        [0, 2, 1, 1, 0, "50.00000", 0, 0, 0, 0, 0, 0, 0],
+    ],
+    "tests/__init__.py": [
+        0,
+        [0, 3, 2, 1, 0, "66.66667", 0, 0, 0, 0, 0, 0, 0],
+        [[0, 3, 2, 1, 0, "66.66667", 0, 0, 0, 0, 0, 0, 0]],
+        None,
+    ],
+    "tests/test_sample.py": [
+        1,
+        [0, 7, 7, 0, 0, "100", 0, 0, 0, 0, 0, 0, 0],
+        [[0, 7, 7, 0, 0, "100", 0, 0, 0, 0, 0, 0, 0]],
+        None,
+    ],
+}
+
+
+@pytest.fixture
+def sample_chunks():
+    with open(current_file.parent / "samples" / "chunks_01.txt", "r") as f:
+        return f.read()
+
+
+def sample_lines():
+    return [
+        ReportLine.create(1, None, [LineSession(0, 1), LineSession(1, 0)]),
+        "",
+        ReportLine.create(
+            "1/2", "b", [LineSession(0, "1/2"), LineSession(1, "0/2")], None, None
+        ),
+        ReportLine.create(
+            0, "m", [LineSession(1, 0, complexity=[2, 3])], complexity=[2, 3]
+        ),
+        ReportLine.create(True, "b", [LineSession(0, True)], complexity=4),
+        None,
+        ReportLine.create(
+            1,
+            None,
+            [LineSession(0, 1)],
+            datapoints=[CoverageDatapoint(0, 1, None, ["label_1"])],
+        ),
+        ReportLine.create(
+            "1/3", "b", [LineSession(0, "1/3", ["exit"], None, None)], None, None
+        ),
+        ReportLine.create(2**70, None, [LineSession(0, 2**70)]),
+        ReportLine.create(None, None, [LineSession(0, None)]),
+    ]
+
+
+def test_encode_decode_roundtrip():
+    encoded = encode_columnar_lines(sample_lines())
+    assert encoded.startswith(COLUMNAR_CHUNK_PREFIX)
+    assert "\n" not in encoded
+    decoded = ReportFile("file.py", lines="{}\n" + encoded)
+    legacy = ReportFile(
+        "file.py", lines=ReportFile("file.py", lines=sample_lines())._encode()
+    )
+    assert list(decoded.lines) == list(legacy.lines)
+    assert decoded.totals == legacy.totals
+    assert decoded.eof == legacy.eof
+
+
+def test_decode_keeps_unpackable_lines_as_legacy_json():
+    decoded = decode_columnar_lines(encode_columnar_lines(sample_lines()))
+    assert len(decoded) == 10
+    assert decoded[1] == ""
+    assert decoded[5] == ""
+    assert isinstance(decoded[0], ReportLine)
+    # labels, missing branches and numbers out of the packed range
+    assert isinstance(decoded[6], str)
+    assert isinstance(decoded[7], str)
+    assert isinstance(decoded[8], str)
+    assert decoded[3] == ReportLine.create(
+        0, "m", [LineSession(1, 0, complexity=[2, 3])], complexity=[2, 3]
+    )
+
+
+def test_encode_empty_lines():
+    encoded = encode_columnar_lines([])
+    assert decode_columnar_lines(encoded) == []
+    report_file = ReportFile("file.py", lines="{}\n" + encoded)
+    assert list(report_file.lines) == []
+
+
+def test_decode_not_columnar():
+    with pytest.raises(ValueError):
+        decode_columnar_lines("[1, null, [[0, 1]]]")
+
+
+def test_report_file_encode_columnar():
+    report_file = ReportFile("file.py", lines=sample_lines())
+    report_file._details = {"present_sessions": [0, 1]}
+    encoded = report_file._encode(columnar=True)
+    details, lines = encoded.split("\n")
+    assert details == '{"present_sessions":[0,1]}'
+    assert lines.startswith(COLUMNAR_CHUNK_PREFIX)
+    new_report_file = ReportFile("file.py", lines=encoded)
+    assert new_report_file.details == {"present_sessions": [0, 1]}
+    assert list(new_report_file.lines) == list(report_file.lines)
+
+
+def test_report_to_archive_columnar(sample_chunks):
+    report = Report(files=files_dict, chunks=sample_chunks)
+    archive = report.to_archive(columnar=True)
+    for chunk in archive.split(END_OF_CHUNK):
+        assert chunk.split("\n")[1].startswith(COLUMNAR_CHUNK_PREFIX)
+    new_report = Report(files=files_dict, chunks=archive)
+    for filename in files_dict:
+        assert list(new_report.get(filename).lines) == list(report.get(filename).lines)
+        assert new_report.get(filename).totals == report.get(filename).totals
+    # converting back to the legacy format
+    assert new_report.to_archive(columnar=False) == report.to_archive(columnar=False)
+
+
+def test_report_to_archive_uses_config(sample_chunks, mock_configuration):
+    report = Report(files=files_dict, chunks=sample_chunks)
+    assert report.to_archive() == sample_chunks
+    mock_configuration._params["setup"]["columnar_report_chunks"] = True
+    assert COLUMNAR_CHUNK_PREFIX in report.to_archive()
+
+
+def test_editable_report_columnar_chunks(sample_chunks):
+    archive = Report(files=files_dict, chunks=sample_chunks).to_archive(columnar=True)
+    sessions = {0: Session(), 1: Session()}
+    report = EditableReport(files=files_dict, chunks=archive, sessions=sessions)
+    legacy_report = EditableReport(
+        files=files_dict, chunks=sample_chunks, sessions=dict(sessions)
+    )
+    assert report.totals == legacy_report.totals
+    report.delete_session(0)
+    legacy_report.delete_session(0)
+    assert report.to_archive(columnar=False) == legacy_report.to_archive(columnar=False)
@@ -2115,3 +2115,41 @@ class TestEditableReport(object):
         )
         assert res["report"]["files"] == expected_result["report"]["files"]
         assert res == expected_result
+
+    def test_delete_session_after_parallel_merge(self, mock_configuration):
+        def make_report(session_id, files):
+            report = EditableReport()
+            report.add_session(Session(flags=["flag_%s" % session_id]))
+            for filename, line_numbers in files.items():
+                report_file = EditableReportFile(filename)
+                for ln in line_numbers:
+                    report_file.append(
+                        ln, ReportLine.create(1, None, [LineSession(session_id, 1)])
+                    )
+                report.append(report_file)
+            return report
+
+        def merged_report():
+            report = make_report(0, {"a.py": [1], "b.py": [1]})
+            report.add_session(Session(flags=["flag_1"]))
+            report.merge(make_report(1, {"a.py": [1, 2], "b.py": [2]}))
+            return report
+
+        serial_report = merged_report()
+        mock_configuration._params["setup"]["parallel_report_merge"] = {
+            "workers": 2,
+            "threshold": 1,
+        }
+        parallel_report = merged_report()
+        for filename in ["a.py", "b.py"]:
+            assert parallel_report.get(filename).details == {"present_sessions": [0, 1]}
+        assert parallel_report.to_archive() == serial_report.to_archive()
+        for report in [serial_report, parallel_report]:
+            report.delete_session(1)
+            assert [
+                (ln, [s.id for s in line.sessions])
+                for ln, line in report.get("a.py").lines
+            ] == [(1, [0])]
+            assert report.get("a.py").totals.lines == 1
+        assert parallel_report.to_archive() == serial_report.to_archive()
+        assert parallel_report.totals == serial_report.totals
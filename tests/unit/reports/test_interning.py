@@ -0,0 +1,75 @@
+import pytest
+
+from shared.reports.interning import InterningPool
+from shared.reports.resources import Report, ReportFile
+from shared.reports.types import LineSession, ReportLine
+
+chunks = "\n".join(
+    [
+        "{}",
+        '[1, null, [[0, 1], [1, "1/2"]]]',
+        '["1/2", "b", [[1, "1/2"], [0, 1, null, null, null]]]',
+        "",
+        '[true, "b", [[0, true], [1, 1.0]]]',
+        "[0, null, [[0, 0, null, null, 3]], null, 3]",
+        '["1/3", "b", [[0, "1/3", ["exit"]]]]',
+    ]
+)
+
+
+def test_pool_reuses_sessions():
+    pool = InterningPool()
+    session = pool.session([0, 1])
+    assert session == LineSession(0, 1)
+    assert pool.session([0, 1, None, None, None]) is session
+    assert pool.session([0, True]) == LineSession(0, True)
+    assert pool.session([0, True]) is not session
+    assert pool.session([0, 1.0]) is not session
+    assert len(pool) == 3
+
+
+def test_pool_does_not_share_sessions_with_details():
+    pool = InterningPool()
+    branches = pool.session([0, "1/3", ["exit"]])
+    assert branches == LineSession(0, "1/3", ["exit"])
+    assert pool.session([0, "1/3", ["exit"]]) is not branches
+    assert pool.session([0, 0, None, None, 3]) == LineSession(0, 0, complexity=3)
+    assert len(pool) == 0
+
+
+def test_pool_reuses_coverage_strings():
+    pool = InterningPool()
+    coverage = pool.coverage("".join(["1", "/2"]))
+    assert pool.coverage("".join(["1/", "2"])) is coverage
+    assert pool.session([2, "".join(["1", "/2"])]).coverage is coverage
+    assert pool.coverage(1) == 1
+
+
+def test_report_file_lines_with_pool():
+    pooled = ReportFile("file.py", lines=chunks, pool=InterningPool())
+    plain = ReportFile("file.py", lines=chunks)
+    assert list(pooled.lines) == list(plain.lines)
+    assert pooled.totals == plain.totals
+    first, second = pooled.get(1), pooled.get(2)
+    assert first.sessions[0] is second.sessions[1]
+    assert first.sessions[1] is second.sessions[0]
+    assert first.sessions[1].coverage is second.coverage
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_report_shares_pool_between_files(mock_configuration, enabled):
+    mock_configuration._params["setup"]["intern_report_lines"] = enabled
+    report = Report(
+        files={
+            "a.py": [0, [0, 2, 1, 1, 0, "50.00000", 0, 0, 0, 0, 0, 0, 0]],
+            "b.py": [1, [0, 2, 1, 1, 0, "50.00000", 0, 0, 0, 0, 0, 0, 0]],
+        },
+        chunks=chunks + "\n<<<<< end_of_chunk >>>>>\n" + chunks,
+    )
+    line_a, line_b = report.get("a.py").get(1), report.get("b.py").get(1)
+    assert (
+        line_a
+        == line_b
+        == ReportLine.create(1, None, [LineSession(0, 1), LineSession(1, "1/2")])
+    )
+    assert (line_a.sessions[0] is line_b.sessions[0]) == enabled
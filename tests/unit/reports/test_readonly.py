@@ -1,10 +1,13 @@
+import mmap
 from pathlib import Path
 
 import pytest
 
-from shared.reports.readonly import LazyRustReport, ReadOnlyReport
+from shared.reports.readonly import LazyRustReport, ReadOnlyReport, mmap_chunks
 from shared.reports.resources import ReportFile
 from shared.reports.types import LineSession, ReportLine, ReportTotals
+from shared.ribs import SimpleAnalyzer
+from shared.utils.match import match
 from shared.utils.sessions import Session, SessionType
 
 current_file = Path(__file__)
@@ -102,6 +105,68 @@ class TestLazyRustReport(object):
         assert r is not None
         assert r.get_report() is not None
 
+    def test_get_report_from_mmap(self):
+        with open(current_file.parent / "samples" / "chunks_01.txt", "r") as f:
+            chunks = f.read()
+        filename_mapping = {
+            "awesome/__init__.py": 2,
+            "tests/__init__.py": 0,
+            "tests/test_sample.py": 1,
+        }
+        session_mapping = {0: ["unit"]}
+        from_str = LazyRustReport(filename_mapping, chunks, session_mapping)
+        from_mmap = LazyRustReport(
+            filename_mapping, mmap_chunks(chunks), session_mapping
+        )
+        assert from_mmap.get_report() is not None
+        assert from_mmap._chunks is None
+        analyzer = SimpleAnalyzer()
+        assert (
+            analyzer.get_totals(from_mmap.get_report()).asdict()
+            == analyzer.get_totals(from_str.get_report()).asdict()
+        )
+
+    def test_get_report_from_writable_buffer(self):
+        with open(current_file.parent / "samples" / "chunks_01.txt", "r") as f:
+            chunks = f.read()
+        filename_mapping = {
+            "awesome/__init__.py": 2,
+            "tests/__init__.py": 0,
+            "tests/test_sample.py": 1,
+        }
+        session_mapping = {0: ["unit"]}
+        from_str = LazyRustReport(filename_mapping, chunks, session_mapping)
+        from_bytearray = LazyRustReport(
+            filename_mapping, bytearray(chunks.encode()), session_mapping
+        )
+        analyzer = SimpleAnalyzer()
+        assert (
+            analyzer.get_totals(from_bytearray.get_report()).asdict()
+            == analyzer.get_totals(from_str.get_report()).asdict()
+        )
+
+    def test_get_report_datapoints(self):
+        chunks = "\n".join(
+            [
+                "{}",
+                '[1, null, [[0, 1], [1, 0]], null, null, [[0, 1, null, ["test_a"]], [1, 0, null, ["test_b"]]]]',
+                '[0, null, [[1, 0]], null, null, [[1, 0, null, ["test_b"]]]]',
+                "[1, null, [[0, 1]]]",
+            ]
+        )
+        r = LazyRustReport({"a.py": 0}, chunks, {0: ["unit"], 1: []}).get_report()
+        assert r.get_labels() == ["test_a", "test_b"]
+        assert r.get_line_datapoints("a.py", 1) == [
+            (0, "h", None, ["test_a"]),
+            (1, "m", None, ["test_b"]),
+        ]
+        assert r.get_line_datapoints("a.py", 3) is None
+        assert r.get_line_datapoints("b.py", 1) is None
+        totals = r.get_label_totals(["test_b"])
+        assert totals.lines == 2
+        assert totals.misses == 2
+        assert totals.sessions == 2
+
 
 class TestReadOnly(object):
     def test_create_from_report(self, sample_report, mocker):
@@ -326,6 +391,28 @@ class TestReadOnly(object):
             "diff": 0,
         }
 
+    def test_filter_totals_negated_paths(self, sample_report):
+        r = ReadOnlyReport.create_from_report(sample_report)
+        # patterns are matched in rust, a tuple works as well
+        res = r.filter(paths=("!.*.py", "file_")).totals
+        assert res == r.filter(paths=[".*.go"]).totals
+        assert res.files == 2
+
+    def test_filter_totals_unsupported_regex(self, sample_report):
+        r = ReadOnlyReport.create_from_report(sample_report)
+        assert r.filter(paths=["(?!location)"]).totals.files == 2
+
+    @pytest.mark.parametrize(
+        "paths", [["[[:alpha:]]+_1"], ["[a-z--f]ile"], ["!location/", "[a-z--f]ile"]]
+    )
+    def test_filter_totals_class_set_operations(self, sample_report, paths):
+        # these compile in both, but the rust regex crate reads the classes as sets
+        r = ReadOnlyReport.create_from_report(sample_report)
+        expected = [f for f in sample_report.files if match(paths, f)]
+        res = r.filter(paths=paths).totals
+        assert res.files == len(expected)
+        assert res.lines == sum(sample_report.get(f).totals.lines for f in expected)
+
     def test_filter_none(self, sample_rust_report):
         assert sample_rust_report.rust_report is not None
         assert sample_rust_report.rust_report.get_report() is not None
@@ -421,6 +508,34 @@ class TestReadOnly(object):
             "tests/test_sample.py",
         ]
 
+    def test_init_mmap_chunks(self, sample_rust_report, mocker):
+        mocker.patch.dict("os.environ", {"RUST_MMAP_CHUNKS_THRESHOLD": "1"})
+        mocker.patch.object(
+            ReadOnlyReport, "should_load_rust_version", return_value=True
+        )
+        with open(current_file.parent / "samples" / "chunks_01.txt", "r") as f:
+            chunks = f.read()
+        report = ReadOnlyReport.from_chunks(
+            chunks=chunks,
+            files=sample_rust_report.inner_report._files,
+            sessions=sample_rust_report.sessions,
+        )
+        assert isinstance(report.inner_report._chunks.archive, mmap.mmap)
+        assert isinstance(report.rust_report._chunks, mmap.mmap)
+        assert report.totals == sample_rust_report.totals
+        assert report.files == sample_rust_report.files
+        assert list(report.get("tests/__init__.py").lines) == list(
+            sample_rust_report.get("tests/__init__.py").lines
+        )
+        assert report.inner_report.to_archive(columnar=False) == chunks
+
+    def test_should_mmap_chunks(self, mocker):
+        assert not ReadOnlyReport.should_mmap_chunks("a" * 100)
+        mocker.patch.dict("os.environ", {"RUST_MMAP_CHUNKS_THRESHOLD": "50"})
+        assert ReadOnlyReport.should_mmap_chunks("a" * 100)
+        assert not ReadOnlyReport.should_mmap_chunks("a" * 10)
+        assert not ReadOnlyReport.should_mmap_chunks(None)
+
     def test_get(self, sample_rust_report):
         assert sample_rust_report.get("awesome/__init__.py").totals == ReportTotals(
             files=0,
@@ -627,3 +742,93 @@ class TestReadOnly(object):
         assert r.get_uploaded_flags() == set(
             ["complex", "simple", "apple", "chocolate"]
         )
+
+    def test_get_group_totals(self, sample_rust_report):
+        groups = [
+            (None, None),
+            (["unit"], None),
+            (None, ["tests/"]),
+            (["unit"], ["!tests/"]),
+            (["unknown"], ["awesome/.*"]),
+        ]
+        res = sample_rust_report.get_group_totals(groups)
+        assert res == [
+            sample_rust_report.filter(paths=paths, flags=flags).totals
+            for (flags, paths) in groups
+        ]
+        assert res[2].files == 2
+        assert res[3].files == 1
+
+    def test_get_group_totals_unsupported_regex(self, sample_rust_report):
+        groups = [(None, ["(?!tests)"])]
+        assert sample_rust_report.get_group_totals(groups) == [
+            sample_rust_report.filter(paths=["(?!tests)"]).totals
+        ]
+
+    def test_get_group_totals_no_rust(self, sample_report):
+        r = ReadOnlyReport.create_from_report(sample_report)
+        r.rust_report = None
+        assert r.get_group_totals([(["simple"], None), (None, ["file_1"])]) == [
+            r.filter(flags=["simple"]).totals,
+            r.filter(paths=["file_1"]).totals,
+        ]
+
+    def test_flag_totals(self, sample_report, mocker):
+        mocker.patch.object(
+            ReadOnlyReport, "should_load_rust_version", return_value=True
+        )
+        r = ReadOnlyReport.create_from_report(sample_report)
+        get_group_totals = mocker.spy(r, "get_group_totals")
+        flags = r.flags
+        assert flags["simple"].totals == r.filter(flags=["simple"]).totals
+        assert flags["complex"].totals == r.filter(flags=["complex"]).totals
+        # all the flags at once
+        assert get_group_totals.call_count == 1
+
+    def test_calculate_diff_in_rust(self, sample_report, mocker):
+        mocker.patch.object(
+            ReadOnlyReport, "should_load_rust_version", return_value=True
+        )
+        r = ReadOnlyReport.create_from_report(sample_report)
+        diff = {
+            "files": {
+                "location/file_1.py": {
+                    "type": "modified",
+                    "segments": [
+                        {"header": ["100", "3", "100", "3"], "lines": list("-+-+-+")}
+                    ],
+                },
+                "file_1.go": {
+                    "type": "new",
+                    "segments": [{"header": list("1313"), "lines": list("---+++")}],
+                },
+                "file_2.go": {"type": "deleted"},
+                "unknown.py": {
+                    "type": "new",
+                    "segments": [{"header": list("0012"), "lines": list("++")}],
+                },
+            }
+        }
+        calculate_diff = mocker.spy(r.inner_report, "calculate_diff")
+        res = r.calculate_diff(diff)
+        assert calculate_diff.call_count == 0
+        assert res == sample_report.calculate_diff(diff)
+        assert list(res["files"].keys()) == ["location/file_1.py", "file_1.go"]
+        for flags, paths in [(["simple"], None), (["complex"], ["location/"])]:
+            assert r.filter(flags=flags, paths=paths).calculate_diff(
+                diff
+            ) == sample_report.filter(flags=flags, paths=paths).calculate_diff(diff)
+        assert r.calculate_diff({"files": {}}) is None
+
+    def test_calculate_diff_no_rust(self, sample_report):
+        r = ReadOnlyReport.create_from_report(sample_report)
+        r.rust_report = None
+        diff = {
+            "files": {
+                "file_1.go": {
+                    "type": "modified",
+                    "segments": [{"header": list("1313"), "lines": list("---+++")}],
+                }
+            }
+        }
+        assert r.calculate_diff(diff) == sample_report.calculate_diff(diff)
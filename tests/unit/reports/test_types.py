@@ -93,6 +93,21 @@ def test_reportline_as_tuple():
     )
 
 
+def test_reportline_create_typed():
+    sessions = [LineSession(1, 0), LineSession(2, "1/2", 1)]
+    datapoints = [CoverageDatapoint(1, 0, None, ["label"])]
+    report_line = ReportLine.create_typed(
+        0, "b", sessions, complexity=3, datapoints=datapoints
+    )
+    assert report_line == ReportLine.create(
+        0, "b", list(sessions), complexity=3, datapoints=list(datapoints)
+    )
+    assert report_line.sessions is sessions
+    assert report_line.datapoints is datapoints
+    assert report_line.messages is None
+    assert ReportLine.create_typed() == ReportLine.create()
+
+
 def test_coverage_datapoint_as_tuple():
     cd = CoverageDatapoint(
         sessionid=3,
@@ -1,7 +1,14 @@
+import gzip
+import mmap
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import mock
 import pytest
 from mock import PropertyMock
 
-from shared.reports.resources import Report, ReportFile, _encode_chunk
+from shared.reports import resources
+from shared.reports.resources import ArchiveChunks, Report, ReportFile, _encode_chunk
 from shared.reports.types import (
     LineSession,
     NetworkFile,
@@ -683,6 +690,24 @@ def test_does_diff_adjust_tracked_lines(diff, future, future_diff, res):
     assert r.does_diff_adjust_tracked_lines(diff, future_r, future_diff) == res
 
 
+@pytest.mark.unit
+def test_calculate_diff_report_file():
+    report_file = ReportFile("file.py")
+    for ln, coverage in [(1, 1), (2, 0), (4, "1/2"), (5, 1), (9, 0)]:
+        report_file.append(ln, ReportLine.create(coverage=coverage))
+    segments = [
+        {"header": ["1", "2", "1", "3"], "lines": ["+a", "+b", "-c", " d"]},
+        {"header": ["4", "1", "4", "3"], "lines": list("+ +")},
+        {"header": ["8", "1", "8", "30"], "lines": list("+" * 30)},
+    ]
+    assert report_file.calculate_diff(segments) == ReportTotals(
+        files=0, lines=4, hits=1, misses=2, partials=1, coverage="25.00000"
+    )
+    assert report_file.calculate_diff([]) == ReportTotals(
+        files=0, lines=0, hits=0, misses=0, partials=0, coverage=None
+    )
+
+
 @pytest.mark.unit
 def test_calculate_diff():
     v3 = {
@@ -1387,3 +1412,247 @@ def test_shift_lines_by_diff():
             diff_totals=None,
         )
     }
+
+
+def test_archive_chunks():
+    archive = END_OF_CHUNK.join(["{}\n[1]", "null", "", "{}\n[0]\n\n[1]"])
+    chunks = ArchiveChunks(archive)
+    assert chunks
+    assert chunks[1] == "null"
+    # only what was needed to find the second chunk was looked at
+    assert chunks._offsets == [0, 6 + len(END_OF_CHUNK), 10 + 2 * len(END_OF_CHUNK)]
+    assert chunks._length is None
+    assert chunks[3] == "{}\n[0]\n\n[1]"
+    assert chunks[-2] == ""
+    assert len(chunks) == 4
+    assert list(chunks) == archive.split(END_OF_CHUNK)
+    assert chunks == archive.split(END_OF_CHUNK)
+    assert chunks[1:3] == ["null", ""]
+    with pytest.raises(IndexError):
+        chunks[4]
+    with pytest.raises(IndexError):
+        ArchiveChunks(archive)[4]
+    with pytest.raises(IndexError):
+        chunks[4] = None
+
+
+def test_archive_chunks_mutations():
+    archive = END_OF_CHUNK.join(["{}\n[1]", "null", "{}\n[0]"])
+    chunks = ArchiveChunks(archive)
+    chunks[2] = None
+    chunks.append("{}\n[1]\n[1]")
+    assert len(chunks) == 4
+    assert chunks[3] == "{}\n[1]\n[1]"
+    del chunks[1]
+    assert list(chunks) == ["{}\n[1]", None, "{}\n[1]\n[1]"]
+    chunks.insert(0, "null")
+    assert list(chunks) == ["null", "{}\n[1]", None, "{}\n[1]\n[1]"]
+    assert END_OF_CHUNK.join(map(_encode_chunk, chunks)) == END_OF_CHUNK.join(
+        ["null", "{}\n[1]", "null", "{}\n[1]\n[1]"]
+    )
+
+
+def test_report_get_only_slices_requested_chunk():
+    archive = END_OF_CHUNK.join(
+        ["{}\n[1, null, [[0, 1]]]", "{}\n[0, null, [[0, 0]]]\n[1, null, [[0, 1]]]"]
+    )
+    report = Report(
+        files={
+            "a.py": ReportFileSummary(0, ReportTotals(1, 1, 1)),
+            "b.py": ReportFileSummary(1, ReportTotals(1, 2, 1)),
+        },
+        chunks=archive,
+    )
+    assert report._chunks._items == {}
+    assert list(report.get("a.py").lines) == [
+        (1, ReportLine.create(1, None, [LineSession(0, 1)]))
+    ]
+    assert list(report._chunks._items) == [0]
+    assert len(list(report.get("b.py").lines)) == 2
+    assert report.to_archive(columnar=False) == archive
+
+
+def test_archive_chunks_from_bytes_and_mmap(tmp_path):
+    archive = END_OF_CHUNK.join(["{}\n[1]", "null", '{}\n["\u00e9"]'])
+    path = tmp_path / "archive.txt"
+    path.write_bytes(archive.encode())
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    for source in (archive.encode(), mapped):
+        chunks = ArchiveChunks(source)
+        assert chunks[2] == '{}\n["\u00e9"]'
+        assert len(chunks) == 3
+        assert list(chunks) == archive.split(END_OF_CHUNK)
+    report = Report(files={"a.py": ReportFileSummary(0)}, chunks=mapped)
+    assert report.to_archive(columnar=False) == archive
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_iter_chunks_from_stream(compress):
+    archive = END_OF_CHUNK.join(
+        [
+            '{}\n["1/2", "b", [[0, "1/2", ["é"]]]]',
+            "null",
+            "{}\n[0, null, [[0, 0]]]\n\n[1, null, [[0, 1]]]",
+            "{}\n[1, null, [[0, 1]]]",
+        ]
+    ).encode()
+    if compress:
+        archive = gzip.compress(archive)
+    files = {
+        "a.py": ReportFileSummary(0, ReportTotals(1, 1, 1)),
+        "b.py": ReportFileSummary(1),
+        "c.py": [2, ReportTotals(1, 2, 1)],
+    }
+    # small reads so separators and characters get split between them
+    res = list(Report.iter_chunks_from_stream(BytesIO(archive), files, read_size=5))
+    assert [filename for filename, _ in res] == ["a.py", "c.py"]
+    full_report = Report(
+        files=files, chunks=gzip.decompress(archive) if compress else archive
+    )
+    for filename, report_file in res:
+        assert isinstance(report_file, ReportFile)
+        assert report_file.name == filename
+        assert list(report_file.lines) == list(full_report.get(filename).lines)
+        assert report_file.totals == full_report.get(filename).totals
+
+
+def test_iter_chunks_from_stream_empty():
+    assert list(Report.iter_chunks_from_stream(BytesIO(b""), {})) == []
+
+
+def test_merge_keeps_totals_up_to_date():
+    def make_report(session_id, files):
+        report = Report()
+        report.add_session(Session(flags=["flag_%s" % session_id]))
+        for filename, lines in files.items():
+            report_file = ReportFile(filename)
+            for ln, coverage, line_type, complexity in lines:
+                report_file.append(
+                    ln,
+                    ReportLine.create(
+                        coverage,
+                        line_type,
+                        [LineSession(session_id, coverage)],
+                        complexity=complexity,
+                    ),
+                )
+            report.append(report_file)
+        return report
+
+    report = make_report(0, {"a.py": [(1, 1, None, None), (2, 0, "m", [1, 2])]})
+    report.totals
+    uploads = [
+        {
+            "a.py": [(2, 1, "m", [2, 2]), (3, "1/2", "b", None)],
+            "b.py": [(1, 0, None, 3)],
+        },
+        {
+            "b.py": [(1, 1, None, None), (5, 0, None, None)],
+            "c.rb": [(1, 0, None, None)],
+        },
+        {"c.rb": [(1, 1, None, None)], "d.py": [(10, True, "b", None)]},
+    ]
+    for session_id, upload in enumerate(uploads, start=1):
+        session_id, _ = report.add_session(Session(flags=["flag_%s" % session_id]))
+        new_report = make_report(session_id, upload)
+        mocked = mock.patch.object(
+            Report, "_process_totals", wraps=report._process_totals
+        )
+        with mocked as process_totals:
+            report.merge(new_report)
+        # only the changed files were looked at
+        assert not process_totals.called
+        assert report._totals is not None
+        expected = report._process_totals()
+        assert report.totals == expected
+    assert report.totals.files == 4
+    assert report.totals.sessions == 4
+
+
+def test_append_drops_totals_not_aggregated_from_files():
+    report = Report(totals=ReportTotals(files=10, lines=100, hits=50))
+    report_file = ReportFile("a.py")
+    report_file.append(1, ReportLine.create(1, None, [LineSession(0, 1)]))
+    report.append(report_file)
+    assert report._totals is None
+    assert report.totals == report._process_totals()
+    assert report.totals.files == 1
+
+
+@pytest.mark.parametrize("threshold", [1, 100])
+def test_merge_in_process_pool(mock_configuration, threshold):
+    def make_report(session_id, files):
+        report = Report()
+        report.add_session(Session(flags=["flag_%s" % session_id]))
+        for filename, lines in files.items():
+            report_file = ReportFile(filename)
+            for ln, coverage in lines:
+                report_file.append(
+                    ln, ReportLine.create(coverage, None, [LineSession(0, coverage)])
+                )
+            report.append(report_file)
+        return report
+
+    base = {"a.py": [(1, 1), (2, 0)], "b.py": [(1, 0)], "c.rb": [(1, 0), (2, 0)]}
+    upload = {
+        "b.py": [(1, 1), (3, "1/2")],
+        "c.rb": [(1, 1)],
+        "a.py": [(2, 1), (5, 0)],
+        "d.py": [(1, 1)],
+    }
+    serial_report = make_report(0, base)
+    serial_report.merge(make_report(1, upload))
+    mock_configuration._params["setup"]["parallel_report_merge"] = {
+        "workers": 2,
+        "threshold": threshold,
+    }
+    parallel_report = make_report(0, base)
+    with mock.patch(
+        "shared.reports.resources._get_merge_executor",
+        wraps=resources._get_merge_executor,
+    ) as executor:
+        parallel_report.merge(make_report(1, upload))
+    assert executor.called == (threshold == 1)
+    assert list(parallel_report.files) == ["a.py", "b.py", "c.rb", "d.py"]
+    assert parallel_report.to_archive() == serial_report.to_archive()
+    assert parallel_report._files == serial_report._files
+    assert parallel_report.totals == serial_report.totals
+    if threshold == 1:
+        # the process pool is kept around for the next merges
+        used_executor = resources._merge_executor[1]
+        make_report(0, base).merge(make_report(1, upload))
+        assert resources._merge_executor[1] is used_executor
+
+
+def test_merge_in_process_pool_falls_back_to_serial(mock_configuration):
+    def make_report(session_id):
+        report = Report()
+        report.add_session(Session(flags=["flag_%s" % session_id]))
+        for filename in ["a.py", "b.py"]:
+            report_file = ReportFile(filename)
+            report_file.append(
+                session_id + 1,
+                ReportLine.create(1, None, [LineSession(session_id, 1)]),
+            )
+            report.append(report_file)
+        return report
+
+    serial_report = make_report(0)
+    serial_report.merge(make_report(1))
+    mock_configuration._params["setup"]["parallel_report_merge"] = {
+        "workers": 2,
+        "threshold": 1,
+    }
+    executor = mock.MagicMock()
+    executor.map.side_effect = BrokenProcessPool("A child process terminated")
+    parallel_report = make_report(0)
+    with mock.patch(
+        "shared.reports.resources.ProcessPoolExecutor", return_value=executor
+    ):
+        resources._shutdown_merge_executor()
+        parallel_report.merge(make_report(1))
+        assert resources._merge_executor is None
+    executor.shutdown.assert_called_once_with(wait=False)
+    assert parallel_report.to_archive() == serial_report.to_archive()
+    assert parallel_report.totals == serial_report.totals
@@ -502,6 +502,55 @@ def test_shift_lines_by_diff_only_removals():
     ]
 
 
+@pytest.mark.unit
+def test_shift_lines_by_diff_unordered_segments_and_past_the_end():
+    file = ReportFile("file_1.go")
+    for i in range(1, 6):
+        file.append(i, ReportLine.create(coverage=(i)))
+    lines = file._lines
+    fake_diff = {
+        "type": "modified",
+        "before": None,
+        "segments": [
+            {"header": [4, 1, 4, 1], "lines": ["-removed", "+added"]},
+            {"header": [1, 1, 1, 2], "lines": ["+added", " "]},
+            # past the end of the file, removals are ignored and additions appended
+            {"header": [20, 1, 20, 2], "lines": ["-removed", "+added", "+added"]},
+        ],
+    }
+    file.shift_lines_by_diff(fake_diff)
+    assert file._lines is lines
+    assert format_lines_idx_and_coverage_only(file._lines) == [
+        (1, ""),
+        (2, "ReportLine(coverage=1)"),
+        (3, "ReportLine(coverage=2)"),
+        (4, "ReportLine(coverage=3)"),
+        (5, ""),
+        (6, "ReportLine(coverage=5)"),
+        (7, ""),
+        (8, ""),
+    ]
+
+
+@pytest.mark.unit
+def test_shift_lines_by_diff_keeps_changes_before_error():
+    file = ReportFile("file_1.go")
+    for i in range(1, 4):
+        file.append(i, ReportLine.create(coverage=(i)))
+    fake_diff = {
+        "segments": [
+            {"header": [1, 1, 1, 1], "lines": ["-removed", "+added"]},
+            {"header": [3, 1, "not a number", 1], "lines": ["-removed"]},
+        ],
+    }
+    file.shift_lines_by_diff(fake_diff)
+    assert format_lines_idx_and_coverage_only(file._lines) == [
+        (1, ""),
+        (2, "ReportLine(coverage=2)"),
+        (3, "ReportLine(coverage=3)"),
+    ]
+
+
 @pytest.mark.unit
 def test_shift_lines_by_diff_wiki_example():
     file = ReportFile("file")
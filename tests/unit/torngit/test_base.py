@@ -1,5 +1,7 @@
 import textwrap
 
+import pytest
+
 from shared.torngit.base import TokenType, TorngitBaseAdapter
 
 
@@ -76,6 +78,65 @@ class TestTorngitBaseAdapter(object):
             }
         }
 
+    def test_diff_to_json_compact_lines(self):
+        instance = TorngitBaseAdapter()
+        diff = textwrap.dedent(
+            """
+            diff --git a/test/file.txt b/test/file.txt
+            index 8695aedf2b..e0d2b1e89d 100644
+            --- a/test/file.txt
+            +++ b/test/file.txt
+            @@ -2,3 +2,3 @@
+             first line
+            -before
+            +after
+            +more
+             last line
+            @@ -20 +21,0 @@
+            -gone
+            diff --git a/removed.txt b/removed.txt
+            deleted file mode 100644
+            --- a/removed.txt
+            +++ /dev/null
+            @@ -1 +0,0 @@
+            -removed
+            """
+        ).replace("\n", "\r\n")
+
+        res = instance.diff_to_json(diff, full_lines=False)
+        assert res == {
+            "files": {
+                "test/file.txt": {
+                    "before": None,
+                    "segments": [
+                        {"header": ["2", "3", "2", "3"], "lines": " -++ "},
+                        {"header": ["20", "", "21", "0"], "lines": "-"},
+                    ],
+                    "stats": {"added": 2, "removed": 2},
+                    "type": "modified",
+                },
+                "removed.txt": {
+                    "before": "removed.txt",
+                    "stats": {"added": 0, "removed": 0},
+                    "type": "deleted",
+                },
+            }
+        }
+        full = instance.diff_to_json(diff)
+        assert full["files"]["test/file.txt"]["segments"][0]["lines"] == [
+            " first line",
+            "-before",
+            "+after",
+            "+more",
+            " last line",
+        ]
+        assert full["files"]["test/file.txt"]["stats"] == {"added": 2, "removed": 2}
+
+    def test_diff_to_json_malformed_file_header(self):
+        instance = TorngitBaseAdapter()
+        with pytest.raises(ValueError):
+            instance.diff_to_json("diff --git a/file.txt\n@@ -1 +1 @@\n-a\n+b\n")
+
     def test_diff_to_json_unicode_line_separator(self):
         instance = TorngitBaseAdapter()
         diff = textwrap.dedent(
@@ -35,6 +35,38 @@ class TestBitbucketServer(object):
             BitbucketServer.get_service_url() == "https://bitbucketserver.codecov.dev"
         )
 
+    def test_diff_to_json_compact_lines(self):
+        diff = [
+            {
+                "source": {"toString": "a.py"},
+                "destination": {"toString": "a.py"},
+                "hunks": [
+                    {
+                        "sourceLine": 1,
+                        "sourceSpan": 2,
+                        "destinationLine": 1,
+                        "destinationSpan": 2,
+                        "segments": [
+                            {"type": "CONTEXT", "lines": [{"line": "same"}]},
+                            {"type": "REMOVED", "lines": [{"line": "before"}]},
+                            {"type": "ADDED", "lines": [{"line": "after"}]},
+                        ],
+                    }
+                ],
+            }
+        ]
+        res = BitbucketServer().diff_to_json(diff, full_lines=False)
+        assert res["files"]["a.py"]["segments"] == [
+            {"header": ["1", "2", "1", "2"], "lines": " -+"}
+        ]
+        assert res["files"]["a.py"]["stats"] == {"added": 1, "removed": 1}
+        full = BitbucketServer().diff_to_json(diff)
+        assert full["files"]["a.py"]["segments"][0]["lines"] == [
+            " same",
+            "-before",
+            "+after",
+        ]
+
     @pytest.mark.asyncio
     async def test_fetch_uses_proper_endpoint(
         self, valid_handler, mocker, mock_configuration
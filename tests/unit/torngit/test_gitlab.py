@@ -160,6 +160,27 @@ class TestUnitGitlab(object):
         res = await valid_handler.find_pull_request(commit_sha)
         assert res == 986
 
+    def test_diff_to_json_compact_lines(self):
+        diff = [
+            {
+                "old_path": "a.py",
+                "new_path": "a.py",
+                "deleted_file": False,
+                "diff": "@@ -1,2 +1,2 @@\n same\n-before\n+after\n",
+            }
+        ]
+        res = Gitlab().diff_to_json(diff, full_lines=False)
+        assert res["files"]["a.py"]["segments"] == [
+            {"header": ["1", "2", "1", "2"], "lines": " -+"}
+        ]
+        res = Gitlab().diff_to_json(
+            "diff --git a/a.py b/a.py\n@@ -1 +1 @@\n-before\n+after\n",
+            full_lines=False,
+        )
+        assert res["files"]["a.py"]["segments"] == [
+            {"header": ["1", "", "1", ""], "lines": "-+"}
+        ]
+
     def test_get_token_by_type_if_none(self):
         instance = Gitlab(
             token="token",
@@ -0,0 +1,30 @@
+import pytest
+
+from shared.utils.diff import get_added_line_intervals
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "segments, intervals",
+    [
+        ([], []),
+        ([{"header": ["1", "3", "1", "3"], "lines": list("---+++")}], [(1, 3)]),
+        ([{"header": ["0", "0", "0", "2"], "lines": list("++")}], [(1, 2)]),
+        (
+            [{"header": ["10", "6", "10", "7"], "lines": list(" +-+ - ++ ")}],
+            [(11, 12), (15, 16)],
+        ),
+        # compact lines, as in diff_to_json(full_lines=False)
+        ([{"header": ["5", "2", "5", "3"], "lines": " + "}], [(6, 6)]),
+        (
+            [
+                {"header": ["20", "1", "20", "2"], "lines": ["+a", " b"]},
+                {"header": ["1", "1", "1", "3"], "lines": ["+a", "+b", " c"]},
+                {"header": ["3", "1", "3", "2"], "lines": ["+a", " b"]},
+            ],
+            [(1, 3), (20, 20)],
+        ),
+    ],
+)
+def test_get_added_line_intervals(segments, intervals):
+    assert get_added_line_intervals(segments) == intervals
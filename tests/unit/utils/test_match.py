@@ -1,3 +1,5 @@
+import re
+
 import pytest
 
 from shared.utils.match import *
@@ -45,3 +47,28 @@ def test_match(patterns, string, boolean):
 )
 def test_match_any(patterns, match_any_of_these, boolean):
     assert match_any(patterns, match_any_of_these) is boolean
+
+
+def test_path_matcher():
+    matcher = PathMatcher([".*\\.py", "(?i)docs/.*", r"(\w+)/\1\.go", "!tests/", ""])
+    assert matcher.match("src/file.py")
+    assert matcher.match("DOCS/index.md")
+    assert matcher.match("pkg/pkg.go")
+    assert not matcher.match("pkg/other.go")
+    assert not matcher.match("tests/file.py")
+    assert PathMatcher(["!tests/"]).match("src/file.go")
+    assert PathMatcher(["!tests/", "tests/a.py"]).match("tests/a.py")
+
+
+def test_path_matcher_for_patterns_is_cached():
+    matcher = PathMatcher.for_patterns(["src/.*", "!src/vendor/.*"])
+    assert PathMatcher.for_patterns(("src/.*", "!src/vendor/.*")) is matcher
+    assert PathMatcher.for_patterns(["src/.*"]) is not matcher
+
+
+def test_path_matcher_literal_path_invalid_regex():
+    patterns = ["src/[legacy.py", "!tests/"]
+    assert match(patterns, "src/[legacy.py")
+    assert PathMatcher(patterns).match("src/[legacy.py")
+    with pytest.raises(re.error):
+        PathMatcher(patterns).match("src/other.py")
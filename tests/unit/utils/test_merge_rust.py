@@ -0,0 +1,139 @@
+import random
+from fractions import Fraction
+from json import dumps
+
+import pytest
+
+from shared.reports.resources import ReportFile, _dumps_not_none
+from shared.reports.types import CoverageDatapoint, LineSession, ReportLine
+from shared.ribs import merge_report_lines
+from shared.utils.merge import merge_line
+
+COVERAGES = [0, 1, 2, 5, -1, True, None, "0/2", "1/2", "2/2", "1/3", "3/3", "2/4"]
+BRANCHES = [None, None, [], ["1"], ["1", "2"], ["2"], [1], ["1", "3"]]
+COMPLEXITIES = [None, None, 0, 1, 3, [1, 2], [0, 3], [2, 2]]
+
+
+def random_line(rand):
+    sessions = []
+    for _ in range(rand.randint(0, 3)):
+        session = [rand.randint(0, 3), rand.choice(COVERAGES)]
+        if rand.random() < 0.5:
+            session += [
+                rand.choice(BRANCHES),
+                rand.choice([None, []]),
+                rand.choice(COMPLEXITIES),
+            ]
+        sessions.append(session)
+    return dumps(
+        [
+            rand.choice(COVERAGES),
+            rand.choice([None, "b", "m"]),
+            sessions or None,
+            rand.choice([None, ["message"]]),
+            rand.choice(COMPLEXITIES),
+        ]
+    )
+
+
+def encoded(line):
+    return _dumps_not_none(line) if line else None
+
+
+def python_merge(line, other_line, joined):
+    report_file = ReportFile("file.py")
+    return merge_line(
+        report_file._line(line) if line else None,
+        report_file._line(other_line) if other_line else None,
+        joined,
+    )
+
+
+@pytest.mark.parametrize("joined", [True, False])
+def test_merge_report_lines_parity(joined):
+    rand = random.Random(1234)
+    lines = [random_line(rand) if rand.random() > 0.1 else None for _ in range(3000)]
+    other_lines = [
+        random_line(rand) if rand.random() > 0.1 else None for _ in range(3000)
+    ]
+    merged, unmerged_indexes = merge_report_lines(lines, other_lines, joined)
+    assert len(merged) == len(lines)
+    # most of them should not need python
+    assert len(unmerged_indexes) < len(lines) / 2
+    report_file = ReportFile("file.py")
+    for index, line in enumerate(merged):
+        if index in unmerged_indexes:
+            assert line is None
+            continue
+        expected = python_merge(lines[index], other_lines[index], joined)
+        assert encoded(report_file._line(line) if line else None) == encoded(
+            expected
+        ), (lines[index], other_lines[index])
+
+
+@pytest.mark.parametrize(
+    "line, other_line",
+    [
+        # partials
+        ("[1, null, [[0, 1, null, [[0, 1, 1]]]]]", "[1, null, [[1, 1]]]"),
+        # floats
+        ("[1.5, null, [[0, 1.5]]]", "[1, null, [[1, 1]]]"),
+        # datapoints
+        ('[1, null, [[0, 1]], null, null, [[0, 1, null, ["a"]]]]', "[1,null,[[1,1]]]"),
+        # branches missing in both sessions, python picks them out of a set
+        (
+            '["1/3", "b", [[0, "1/3", ["1", "2"]]]]',
+            '["1/3", "b", [[0, "1/3", ["1", "2"]]]]',
+        ),
+        ("null", "[1, null, [[1, 1]]]"),
+    ],
+)
+def test_merge_report_lines_unsupported(line, other_line):
+    merged, unmerged_indexes = merge_report_lines([line], [other_line], True)
+    assert merged == [None]
+    assert unmerged_indexes == [0]
+
+
+def test_merge_report_lines_lengths():
+    merged, unmerged_indexes = merge_report_lines(
+        ["[1, null, [[0, 1]]]", None], [None, None, "[0, null, [[1, 0]]]"], True
+    )
+    assert merged == ["[1, null, [[0, 1]]]", None, "[0, null, [[1, 0]]]"]
+    assert unmerged_indexes == []
+
+
+def test_report_file_merge_with_rust(mock_configuration):
+    def build_file(session_id, with_fraction):
+        report_file = ReportFile("file.py")
+        report_file.append(1, ReportLine.create(1, None, [LineSession(session_id, 1)]))
+        report_file.append(
+            2, ReportLine.create("1/2", "b", [LineSession(session_id, "1/2")])
+        )
+        report_file.append(
+            4,
+            ReportLine.create(
+                Fraction(1, 2) if with_fraction else 0,
+                None,
+                [LineSession(session_id, 0)],
+            ),
+        )
+        report_file.append(
+            5,
+            ReportLine.create(
+                1,
+                None,
+                [LineSession(session_id, 1)],
+                datapoints=[CoverageDatapoint(session_id, 1, None, ["label"])],
+            ),
+        )
+        return report_file
+
+    python_file = build_file(0, True)
+    python_file.merge(build_file(1, False))
+    mock_configuration._params["setup"]["rust_merge_lines"] = True
+    rust_file = build_file(0, True)
+    rust_file.merge(build_file(1, False))
+    assert [encoded(line) for line in rust_file] == [
+        encoded(line) for line in python_file
+    ]
+    assert rust_file.totals == python_file.totals
@@ -0,0 +1,54 @@
+from fractions import Fraction
+
+import pytest
+
+from shared.reports.types import LineSession, ReportLine, ReportTotals
+from shared.utils.totals import totals_from_lines
+
+
+@pytest.mark.unit
+def test_totals_from_lines():
+    lines = [
+        (1, ReportLine.create(1)),
+        (2, ReportLine.create(True, "b")),
+        (3, ReportLine.create(0, "m", complexity=[1, 3])),
+        (4, ReportLine.create("1/2", "b", messages=["a", "b"])),
+        (5, ReportLine.create("2/2", "b", complexity=2)),
+        (6, ReportLine.create(-1)),
+        (7, ReportLine.create(None, sessions=[LineSession(0, None)])),
+        (8, ReportLine.create(Fraction(1, 3))),
+        (9, ReportLine.create(1, complexity=[2, 4])),
+        (10, ReportLine.create(False)),
+    ]
+    assert totals_from_lines(lines) == ReportTotals(
+        files=0,
+        lines=7,
+        hits=3,
+        misses=1,
+        partials=3,
+        coverage="42.85714",
+        branches=3,
+        methods=1,
+        messages=2,
+        sessions=0,
+        complexity=5,
+        complexity_total=7,
+    )
+
+
+@pytest.mark.unit
+def test_totals_from_lines_empty():
+    assert totals_from_lines([]) == ReportTotals(
+        files=0,
+        lines=0,
+        hits=0,
+        misses=0,
+        partials=0,
+        coverage=None,
+        branches=0,
+        methods=0,
+        messages=0,
+        sessions=0,
+        complexity=0,
+        complexity_total=0,
+    )